@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
 import time
 import random
 
@@ -79,64 +80,80 @@ def on_message(client, userdata, msg):
 
 
 
-# using MQTT version 5 here, for 3.1.1: MQTTv311, 3.1: MQTTv31
-# userdata is user defined data of any type, updated by user_data_set()
-# client_id is the given name of the client
-client1 = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="", userdata=None, protocol=paho.MQTTv5)
-client1.on_connect = on_connect
-
-client2 = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="", userdata=None, protocol=paho.MQTTv5)
-client2.on_connect = on_connect
-
-client3 = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="", userdata=None, protocol=paho.MQTTv5)
-client3.on_connect = on_connect
-
-
-# enable TLS for secure connection
-client1.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
-# set username and password
-client1.username_pw_set("client1", "Password1")
-# connect to HiveMQ Cloud on port 8883 (default for MQTT)
-client1.connect("777630be8b4a40a182440428578a0533.s1.eu.hivemq.cloud", 8883)
-
-# enable TLS for secure connection
-client2.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
-# set username and password
-client2.username_pw_set("client2", "Password1")
-# connect to HiveMQ Cloud on port 8883 (default for MQTT)
-client2.connect("777630be8b4a40a182440428578a0533.s1.eu.hivemq.cloud", 8883)
-
-# setting callbacks, use separate functions like above for better visibility
-client1.on_subscribe = on_subscribe
-client1.on_message = on_message
-client1.on_publish = on_publish
-
-# setting callbacks, use separate functions like above for better visibility
-client2.on_subscribe = on_subscribe
-client2.on_message = on_message
-client2.on_publish = on_publish
-
-# subscribe to all topics of encyclopedia by using the wildcard "#"
-client1.subscribe("encyclopedia/#", qos=1)
-client2.subscribe("encyclopedia/#", qos=1)
-
-# try:
-#     while True:
-#         # a single publish, this can also be done in loops, etc.
-#         client1.publish("encyclopedia/temperature", payload="hot", qos=1)
-#         client2.publish("encyclopedia/temperature", payload="hot", qos=1)
-#         time.sleep(3)
-# except KeyboardInterrupt:
-#     print("Program stopped by user.")
-
-for i in range(10):
-    num = random.randint(0,100)
-    # a single publish, this can also be done in loops, etc.
-    client1.publish("encyclopedia/temperature", payload= num, qos=1)
-    client2.publish("encyclopedia/temperature", payload=num+1, qos=1)
-    time.sleep(3)
-
-
-# loop_forever for simplicity, here you need to stop the loop manually
-# you can also use loop_start and loop_stop
-#client1.loop_forever()
+def connect_example_client(username, password="Password1"):
+    """
+        Creates a paho client connected to the example HiveMQ Cloud cluster
+        :param username: credentials of the client on the cluster
+    """
+    # using MQTT version 5 here, for 3.1.1: MQTTv311, 3.1: MQTTv31
+    # userdata is user defined data of any type, updated by user_data_set()
+    # client_id is the given name of the client
+    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="", userdata=None, protocol=paho.MQTTv5)
+    client.on_connect = on_connect
+
+    # enable TLS for secure connection
+    client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    # set username and password
+    client.username_pw_set(username, password)
+    # connect to HiveMQ Cloud on port 8883 (default for MQTT)
+    client.connect("777630be8b4a40a182440428578a0533.s1.eu.hivemq.cloud", 8883)
+    return client
+
+
+def run_example(client1, client2):
+    """
+        Both clients subscribe to encyclopedia/# and publish ten temperatures each, three seconds apart
+        :param client1: a connected paho client, or a fakeBroker.FakeMqttClient
+        :param client2: same as client1
+    """
+    # setting callbacks, use separate functions like above for better visibility
+    client1.on_subscribe = on_subscribe
+    client1.on_message = on_message
+    client1.on_publish = on_publish
+
+    # setting callbacks, use separate functions like above for better visibility
+    client2.on_subscribe = on_subscribe
+    client2.on_message = on_message
+    client2.on_publish = on_publish
+
+    # subscribe to all topics of encyclopedia by using the wildcard "#"
+    client1.subscribe("encyclopedia/#", qos=1)
+    client2.subscribe("encyclopedia/#", qos=1)
+
+    # try:
+    #     while True:
+    #         # a single publish, this can also be done in loops, etc.
+    #         client1.publish("encyclopedia/temperature", payload="hot", qos=1)
+    #         client2.publish("encyclopedia/temperature", payload="hot", qos=1)
+    #         time.sleep(3)
+    # except KeyboardInterrupt:
+    #     print("Program stopped by user.")
+
+    for i in range(10):
+        num = random.randint(0,100)
+        # a single publish, this can also be done in loops, etc.
+        client1.publish("encyclopedia/temperature", payload= num, qos=1)
+        client2.publish("encyclopedia/temperature", payload=num+1, qos=1)
+        time.sleep(3)
+
+
+if __name__ == '__main__':
+    if os.environ.get('LOCAL_BROKER') == '1':
+        # No network: both clients talk through an in-process broker
+        from fakeBroker import FakeBroker
+
+        broker = FakeBroker()
+        client1 = broker.client()
+        client2 = broker.client()
+        for client in (client1, client2):
+            client.on_connect = on_connect
+            client.connect()
+    else:
+        client1 = connect_example_client("client1")
+        client2 = connect_example_client("client2")
+
+    run_example(client1, client2)
+
+    # loop_forever for simplicity, here you need to stop the loop manually
+    # you can also use loop_start and loop_stop
+    #client1.loop_forever()
@@ -1,7 +1,10 @@
 import os
 import json
+import math
 import copy
+import time
 from collections import OrderedDict
+from types import SimpleNamespace
 
 import paho.mqtt.client as paho
 from paho import mqtt
@@ -9,7 +12,14 @@ from dotenv import load_dotenv
 
 from InputTypes import NewPlayer
 from game import Game
-from moveset import Moveset
+from stateDelta import DeltaEncoder
+from moveLog import MoveLog
+from lobbyExecutor import LobbyExecutor
+from tickScheduler import TickScheduler
+from stateCache import StateCache
+from metrics import Registry, estimateSize
+from profiler import SamplingProfiler
+import wireFormat
 
 # setting callbacks for different events to see if it works, print the message etc.
 def on_connect(client, userdata, flags, rc, properties=None):
@@ -62,7 +72,50 @@ def on_message(client, userdata, msg):
 
     # Validate it is input we can deal with
     if topic_list[-1] in dispatch.keys(): 
-        dispatch[topic_list[-1]](client, topic_list, msg.payload)
+        route = topic_list[-1]
+        client.metrics.messages.inc(route)
+        start, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            dispatch[route](client, topic_list, msg.payload)
+        finally:
+            client.metrics.dispatch_seconds.observe(time.perf_counter() - start, route)
+            client.metrics.dispatch_cpu_seconds.observe(time.thread_time() - start_cpu, route)
+    else:
+        client.metrics.messages.inc('other')
+
+
+# network thread callback when game logic runs on client.executor
+def enqueue_message(client, userdata, msg):
+    """
+        Queues the message behind earlier messages of its lobby and returns straight away, so the
+        network loop keeps reading sockets and sending keepalives while games are resolved
+        :param client: the client itself, with an executor attribute
+        :param userdata: userdata is set when initiating the client, here it is userdata=None
+        :param msg: the message with topic and payload
+    """
+    client.executor.submit(lobby_of(msg.topic, msg.payload), client, userdata, msg)
+
+
+def tick_message(lobby_name, tick):
+    """
+        Internal message delivered through the lobby's queue when a tick deadline passes
+    """
+    return SimpleNamespace(topic=f'games/{lobby_name}/tick', payload=str(tick).encode(), qos=0)
+
+
+def lobby_of(topic, payload):
+    """
+        Lobby a message belongs to: from the payload for new_game, otherwise games/{lobby}/...
+    """
+    topic_list = topic.split("/")
+    if topic_list[0] == "games" and len(topic_list) > 1:
+        return topic_list[1]
+    if topic_list[-1] == "new_game":
+        try:
+            return json.loads(payload)["lobby_name"]
+        except (ValueError, TypeError, KeyError):
+            return None
+    return None
 
 
 # Dispatched function, adds player to a lobby & team
@@ -84,6 +137,11 @@ def add_player(client, topic_list, msg_payload):
 
     add_team(client, player)
 
+    if player.format != wireFormat.JSON:
+        client.format_dict.setdefault(player.lobby_name, {})[player.player_name] = player.format
+    elif player.delta:
+        client.delta_dict.setdefault(player.lobby_name, {})[player.player_name] = DeltaEncoder()
+
     print(f'Added Player: {player.player_name} to Team: {player.team_name}')
 
 
@@ -95,43 +153,19 @@ def add_team(client, player):
     else:
         client.team_dict[player.lobby_name][player.team_name].append(player.player_name)
 
-move_to_Moveset = {
-    'UP' : Moveset.UP,
-    'DOWN' : Moveset.DOWN,
-    'LEFT' : Moveset.LEFT,
-    'RIGHT' : Moveset.RIGHT
-}
-
 # Dispatched Function: handles player movement commands
 def player_move(client, topic_list, msg_payload):
     lobby_name = topic_list[1]
     player_name = topic_list[2]
     if lobby_name in client.team_dict.keys():
         try:
-            new_move = msg_payload.decode()
-
-            client.move_dict[lobby_name][player_name] = (player_name, move_to_Moveset[new_move])
+            # Plain move names and one byte packed moves are both accepted
+            client.move_dict[lobby_name][player_name] = (player_name, wireFormat.decodeMove(msg_payload))
             game: Game = client.game_dict[lobby_name]
 
-            # If all players made a move, resolve movement
-            if len(game.all_players) == len(client.move_dict[lobby_name]):
-                for player, move in client.move_dict[lobby_name].values():
-                    game.movePlayer(player, move)
-
-                # Publish player states after all movement is resolved
-                for player, _ in client.move_dict[lobby_name].values():
-                    client.publish(f'games/{lobby_name}/{player}/game_state', json.dumps(game.getGameData(player)))
-
-                # Clear move list
-                client.move_dict[lobby_name].clear()
-                print(game.map)
-                client.publish(f'games/{lobby_name}/scores', json.dumps(game.getScores()))
-                if game.gameOver():
-                    # Publish game over, remove game
-                    publish_to_lobby(client, lobby_name, "Game Over: All coins have been collected")
-                    client.team_dict.pop(lobby_name)
-                    client.move_dict.pop(lobby_name)
-                    client.game_dict.pop(lobby_name)
+            # If all players made a move, resolve movement (in fixed tick rate mode only the deadline does)
+            if len(game.all_players) == len(client.move_dict[lobby_name]) and not client.fixed_tick_rate:
+                resolve_tick(client, lobby_name)
 
         except Exception as e:
             raise e
@@ -140,6 +174,71 @@ def player_move(client, topic_list, msg_payload):
         publish_error_to_lobby(client, lobby_name, "Lobby name not found.")
 
 
+# Dispatched function: the tick deadline passed, resolve with whatever moves arrived
+def tick_deadline(client, topic_list, msg_payload):
+    lobby_name = topic_list[1]
+    game = client.game_dict.get(lobby_name)
+    # Ignore deadlines of ticks that were already resolved because every player moved
+    if game is not None and game.ticks == int(msg_payload):
+        resolve_tick(client, lobby_name)
+
+
+def resolve_tick(client, lobby_name):
+    """
+        Applies the moves collected for the lobby's current tick, players without a move stay put
+    """
+    start = time.perf_counter()
+    game: Game = client.game_dict[lobby_name]
+    moves = {player: move for player, move in client.move_dict[lobby_name].values()}
+    move_log = client.log_dict.get(lobby_name)
+    if move_log is not None:
+        move_log.logMoves(game.ticks, moves)
+    game.applyMoves(moves)
+    game.endTick()
+    if move_log is not None:
+        move_log.endTick(game)
+
+    # Publish player states after all movement is resolved
+    publish_game_states(client, lobby_name, movers=moves)
+
+    # Clear move list
+    client.move_dict[lobby_name].clear()
+    print(game.map)
+    publish_scores(client, lobby_name, game.getScores())
+    record_tick(client, lobby_name, time.perf_counter() - start)
+    if game.gameOver():
+        # Publish game over, remove game
+        publish_to_lobby(client, lobby_name, "Game Over: All coins have been collected")
+        end_game(client, lobby_name)
+    else:
+        schedule_tick(client, lobby_name, game)
+
+
+def record_tick(client, lobby_name, seconds):
+    client.metrics.tick_seconds.observe(seconds)
+    client.metrics.lobby_ticks.inc(lobby_name)
+    client.metrics.lobby_tick_seconds.inc(lobby_name, amount=seconds)
+
+
+def schedule_tick(client, lobby_name, game):
+    if client.scheduler is not None and client.tick_timeout > 0:
+        client.scheduler.schedule(lobby_name, game.ticks, client.tick_timeout)
+
+
+def end_game(client, lobby_name):
+    client.team_dict.pop(lobby_name, None)
+    client.move_dict.pop(lobby_name, None)
+    client.game_dict.pop(lobby_name, None)
+    client.delta_dict.pop(lobby_name, None)
+    client.format_dict.pop(lobby_name, None)
+    client.cache_dict.pop(lobby_name, None)
+    close_move_log(client, lobby_name)
+    if client.scheduler is not None:
+        client.scheduler.cancel(lobby_name)
+    client.metrics.lobby_ticks.remove(lobby_name)
+    client.metrics.lobby_tick_seconds.remove(lobby_name)
+
+
 # Dispatched function: Instantiates Game object
 def start_game(client, topic_list, msg_payload):
     lobby_name = topic_list[1]
@@ -150,21 +249,134 @@ def start_game(client, topic_list, msg_payload):
                 dict_copy = copy.deepcopy(client.team_dict[lobby_name])
                 dict_copy.pop('started')
 
-                game = Game(dict_copy)
+                game = Game(dict_copy, coinRespawnInterval=getattr(client, 'coin_respawn_interval', 0))
                 client.game_dict[lobby_name] = game
                 client.move_dict[lobby_name] = OrderedDict()
+                client.cache_dict[lobby_name] = StateCache(game)
                 client.team_dict[lobby_name]["started"] = True
 
-                for player in game.all_players.keys():
-                    client.publish(f'games/{lobby_name}/{player}/game_state', json.dumps(game.getGameData(player)))
+                if getattr(client, 'log_dir', None):
+                    path = os.path.join(client.log_dir, f'{lobby_name}-{int(time.time())}.movelog')
+                    client.log_dict[lobby_name] = MoveLog(path, lobby_name, game, seed=game.seed)
+
+                publish_to_lobby(client, lobby_name, f"Game Started: seed {game.seed}")
 
+                publish_game_states(client, lobby_name, force=True)
+                schedule_tick(client, lobby_name, game)
 
                 print(game.map)
     elif isinstance(msg_payload, bytes) and msg_payload.decode() == "STOP":
         publish_to_lobby(client, lobby_name, "Game Over: Game has been stopped")
-        client.team_dict.pop(lobby_name, None)
-        client.move_dict.pop(lobby_name, None)
-        client.game_dict.pop(lobby_name, None)
+        end_game(client, lobby_name)
+
+
+def close_move_log(client, lobby_name):
+    move_log = client.log_dict.pop(lobby_name, None)
+    if move_log is not None:
+        move_log.close()
+
+
+# Dispatched function: a delta client missed a message, send it a keyframe next
+def resync_player(client, topic_list, msg_payload):
+    lobby_name = topic_list[1]
+    player_name = topic_list[2]
+    encoder = client.delta_dict.get(lobby_name, {}).get(player_name)
+    if encoder is not None:
+        encoder.requestKeyframe()
+
+
+def publish_game_states(client, lobby_name, force=False, movers=()):
+    """
+        Publishes game_state to every player of the lobby, only rebuilding the ones whose view changed
+        :param force: publish to every player even when unchanged ones are suppressed
+        :param movers: players that sent a move this tick, they wait for an answer so they always get one
+    """
+    cache = client.cache_dict[lobby_name]
+    changed = cache.refresh()
+    for player in client.game_dict[lobby_name].all_players:
+        if force or player in changed or player in movers or not client.suppress_unchanged:
+            publish_game_state(client, lobby_name, player, cache)
+
+
+def publish_game_state(client, lobby_name, player_name, cache):
+    start = time.perf_counter()
+    encoder = client.delta_dict.get(lobby_name, {}).get(player_name)
+    if client.format_dict.get(lobby_name, {}).get(player_name) == wireFormat.PACKED:
+        encoding = wireFormat.PACKED
+        payload = cache.payload(player_name, wireFormat.encodeGameState, wireFormat.PACKED)
+    elif encoder is not None:
+        # Every delta depends on the previous one sent, so these are not cached
+        encoding = 'delta'
+        payload = json.dumps(encoder.encode(cache.gameData(player_name)))
+    else:
+        encoding = wireFormat.JSON
+        payload = cache.payload(player_name, json.dumps, wireFormat.JSON)
+    client.metrics.encode_seconds.observe(time.perf_counter() - start, encoding)
+    client.publish(f'games/{lobby_name}/{player_name}/game_state', payload)
+
+
+def publish_scores(client, lobby_name, scores):
+    client.publish(f'games/{lobby_name}/scores', json.dumps(scores))
+    # Packed copy only for lobbies where someone asked for it
+    if client.format_dict.get(lobby_name):
+        client.publish(f'games/{lobby_name}/scores/packed', wireFormat.encodeScores(scores))
+
+
+# Dispatched function: admin/profile, samples the server's threads for a while and writes the profile to disk
+def profile_server(client, topic_list, msg_payload):
+    """
+        Payload is the number of seconds to profile for (default 30, at most PROFILE_MAX_SECONDS), or STOP
+    """
+    if client.profile_dir is None:
+        # Profiling is off unless PROFILE_DIR is set
+        return
+    command = msg_payload.decode().strip() if isinstance(msg_payload, bytes) else ''
+    if command == "STOP":
+        client.profiler.stop()
+        return
+    try:
+        seconds = float(command) if command else 30.0
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds):
+        publish_profile_status(client, f"Error: {command} is not a number of seconds")
+        return
+    seconds = min(max(seconds, 0.1), client.profile_max_seconds)
+    if not os.path.isdir(client.profile_dir):
+        publish_profile_status(client, f"Error: profile directory {client.profile_dir} does not exist")
+        return
+
+    path = os.path.join(client.profile_dir, f'profile-{os.getpid()}-{int(time.time())}.stacks')
+    before = dispatch_totals(client)
+    report = lambda: format_dispatch_report(before, dispatch_totals(client))
+    done = lambda written: publish_profile_status(client, f"Profile written to {written}")
+    failed = lambda error: publish_profile_status(client, f"Error: could not write the profile: {error}")
+    if client.profiler.start(seconds, path, report, done, failed):
+        publish_profile_status(client, f"Profiling for {seconds:g}s into {path}")
+    else:
+        publish_profile_status(client, "Error: a profile is already running")
+
+
+def dispatch_totals(client):
+    """
+        {route: (calls, wall seconds, cpu seconds)} since the server started
+    """
+    wall, cpu = client.metrics.dispatch_seconds, client.metrics.dispatch_cpu_seconds
+    return {route: (wall.count(route), wall.sum(route), cpu.sum(route)) for (route,) in wall.labelValues()}
+
+
+def format_dispatch_report(before, after):
+    lines = ['Dispatch handlers during the window', f"{'route':>10} {'calls':>8} {'wall ms':>10} {'cpu ms':>10} {'wall us/call':>13}"]
+    for route, (calls, wall, cpu) in sorted(after.items()):
+        calls0, wall0, cpu0 = before.get(route, (0, 0.0, 0.0))
+        calls, wall, cpu = calls - calls0, wall - wall0, cpu - cpu0
+        if calls:
+            lines.append(f'{route:>10} {calls:8d} {wall * 1e3:10.1f} {cpu * 1e3:10.1f} {wall / calls * 1e6:13.1f}')
+    return '\n'.join(lines) + '\n'
+
+
+def publish_profile_status(client, msg):
+    client.publish("admin/profile/status", msg)
 
 
 def publish_error_to_lobby(client, lobby_name, error):
@@ -179,39 +391,165 @@ dispatch = {
     'new_game' : add_player,
     'move' : player_move,
     'start' : start_game,
+    'resync' : resync_player,
+    'tick' : tick_deadline,
+    'profile' : profile_server,
 }
 
 
-if __name__ == '__main__':
+def connect_client(client_id):
+    """
+        Creates a paho client connected to the broker in credentials.env
+        :param client_id: MQTT client id, must be unique per connection
+    """
     load_dotenv(dotenv_path='credentials.env')
-    
+
     broker_address = os.environ.get('BROKER_ADDRESS')
     broker_port = int(os.environ.get('BROKER_PORT'))
     username = os.environ.get('USER_NAME')
     password = os.environ.get('PASSWORD')
 
-    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="GameClient2", userdata=None, protocol=paho.MQTTv5)
-    
+    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id=client_id, userdata=None, protocol=paho.MQTTv5)
+
     # enable TLS for secure connection
     client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
     # set username and password
     client.username_pw_set(username, password)
     # connect to HiveMQ Cloud on port 8883 (default for MQTT)
     client.connect(broker_address, broker_port)
+    return client
 
-    # setting callbacks, use separate functions like above for better visibility
-    client.on_subscribe = on_subscribe # Can comment out to not print when subscribing to new topics
-    client.on_message = on_message
-    client.on_publish = on_publish # Can comment out to not print when publishing to topics
-    
+
+def tick_settings():
+    """
+        TICK_TIMEOUT and FIXED_TICK_RATE from the environment
+        :return: (tick timeout in seconds, fixed tick rate on)
+    """
+    tick_timeout = float(os.environ.get('TICK_TIMEOUT', 0))
+    fixed_tick_rate = os.environ.get('FIXED_TICK_RATE') == '1'
+    if fixed_tick_rate and tick_timeout <= 0:
+        # Neither moves nor deadlines would ever resolve a tick
+        raise ValueError("FIXED_TICK_RATE=1 needs TICK_TIMEOUT set to the tick length in seconds")
+    return tick_timeout, fixed_tick_rate
+
+
+def init_server_state(client):
+    """
+        Attaches the per-lobby dictionaries and settings the dispatched functions work on
+        :param client: the client the dispatched functions will be called with
+    """
     # custom dictionary to track players
     client.team_dict = {} # Keeps tracks of players before a game starts {'lobby_name' : {'team_name' : [player_name, ...]}}
     client.game_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
     client.move_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
-
+    client.delta_dict = {} # Encoders for players that opted in to delta game states {'lobby_name' : {'player_name' : DeltaEncoder}}
+    client.format_dict = {} # Players that picked a non-JSON wire format {'lobby_name' : {'player_name' : format}}
+    client.cache_dict = {} # Cached game states of running games {'lobby_name' : StateCache}
+    client.suppress_unchanged = os.environ.get('SUPPRESS_UNCHANGED') == '1' # Skip game_state for players that did not move this tick and whose view did not change
+    client.coin_respawn_interval = int(os.environ.get('COIN_RESPAWN_INTERVAL', 0)) # Coin respawn mode, 0 disables
+    client.log_dict = {} # Move logs of running games {'lobby_name' : MoveLog}
+    client.log_dir = os.environ.get('MOVE_LOG_DIR') # Directory for move logs, unset disables logging
+    # Seconds before a tick resolves without every move (0 waits forever), and whether to resolve only on that deadline
+    client.tick_timeout, client.fixed_tick_rate = tick_settings()
+    client.scheduler = None # TickScheduler, set by whoever runs the message loop
+    client.metrics = server_metrics(client) # Counters and histograms, exported by start_metrics
+    client.profiler = SamplingProfiler() # Started from the admin/profile topic
+    client.profile_dir = os.environ.get('PROFILE_DIR') # Where profiles are written, unset disables admin/profile
+    client.profile_max_seconds = float(os.environ.get('PROFILE_MAX_SECONDS', 300)) # Longest profile admin/profile can ask for
+
+
+def server_metrics(client):
+    """
+        Registers the server's metrics; gauges read the client's dictionaries when rendered
+        :return: namespace with the registry and the metrics the dispatched functions update
+    """
+    registry = Registry()
+
+    def lobby_memory():
+        sizes = {}
+        for lobby_name, game in list(client.game_dict.items()):
+            state = (game, client.move_dict.get(lobby_name), client.cache_dict.get(lobby_name),
+                     client.delta_dict.get(lobby_name))
+            try:
+                sizes[(lobby_name,)] = estimateSize(state)
+            except RuntimeError:
+                # The lobby's worker changed a container mid walk, it is measured again next scrape
+                pass
+        return sizes
+
+    registry.gauge('gameclient_active_lobbies', 'Lobbies with a running game', lambda: len(client.game_dict))
+    registry.gauge('gameclient_active_players', 'Players in running games',
+                   lambda: sum(len(game.all_players) for game in list(client.game_dict.values())))
+    # paho keeps messages that are not fully sent in _out_messages
+    registry.gauge('gameclient_publish_queue_depth', 'Outgoing messages not yet sent by the MQTT client',
+                   lambda: len(getattr(client, '_out_messages', ())))
+    registry.gauge('gameclient_lobby_queue_depth', 'Received messages waiting for their lobby worker',
+                   lambda: client.executor.pending if getattr(client, 'executor', None) else 0)
+    registry.gauge('gameclient_lobby_memory_bytes', 'Estimated memory held by a running game',
+                   lobby_memory, ('lobby',))
+    return SimpleNamespace(
+        registry=registry,
+        messages=registry.counter('gameclient_messages_total', 'Messages received per route', ('route',)),
+        tick_seconds=registry.histogram('gameclient_tick_seconds', 'Time to resolve and publish a tick'),
+        encode_seconds=registry.histogram('gameclient_game_state_encode_seconds', 'Time to build one game_state payload',
+                                          ('format',), buckets=(0.000005, 0.00001, 0.000025, 0.00005, 0.0001,
+                                                                0.00025, 0.0005, 0.001, 0.0025, 0.01)),
+        dispatch_seconds=registry.histogram('gameclient_dispatch_seconds', 'Wall time of a dispatched handler', ('route',)),
+        dispatch_cpu_seconds=registry.histogram('gameclient_dispatch_cpu_seconds', 'CPU time of a dispatched handler',
+                                                ('route',)),
+        lobby_ticks=registry.counter('gameclient_lobby_ticks_total', 'Ticks resolved per lobby', ('lobby',)),
+        lobby_tick_seconds=registry.counter('gameclient_lobby_tick_seconds_total', 'Time spent resolving ticks per lobby',
+                                            ('lobby',)),
+    )
+
+
+def start_metrics(client, shard_id=None):
+    """
+        Exports client.metrics over HTTP at METRICS_PORT and to the file METRICS_FILE, both optional
+        :param shard_id: workers of a sharded server each use METRICS_PORT+1+shard_id and their own file
+    """
+    registry = client.metrics.registry
+    port = int(os.environ.get('METRICS_PORT', 0))
+    if port:
+        registry.serve(port if shard_id is None else port + 1 + shard_id)
+    path = os.environ.get('METRICS_FILE')
+    if path:
+        if shard_id is not None:
+            path = f'{path}.shard{shard_id}'
+        registry.dumpEvery(path, float(os.environ.get('METRICS_DUMP_INTERVAL', 15)))
+
+
+def subscribe_server_topics(client):
     client.subscribe("new_game")
     client.subscribe('games/+/start')
     client.subscribe('games/+/+/move')
+    client.subscribe('games/+/+/resync')
+    # Every player has the broker credentials, so profiling the server has to be switched on
+    if os.environ.get('PROFILE_DIR'):
+        client.subscribe('admin/profile')
+
 
+def setup_server(client):
+    """
+        Makes a connected client (paho, or fakeBroker.FakeMqttClient for local runs) into the game server;
+        start its network loop afterwards
+    """
+    # setting callbacks, use separate functions like above for better visibility
+    client.on_subscribe = on_subscribe # Can comment out to not print when subscribing to new topics
+    client.on_message = enqueue_message
+    client.on_publish = on_publish # Can comment out to not print when publishing to topics
+
+    init_server_state(client)
+    client.executor = LobbyExecutor(on_message, int(os.environ.get('WORKER_THREADS', 4))) # Runs on_message per lobby off the network thread
+    if client.tick_timeout > 0:
+        client.scheduler = TickScheduler(lambda lobby_name, tick: client.executor.submit(
+            lobby_name, client, None, tick_message(lobby_name, tick)))
+    subscribe_server_topics(client)
+    start_metrics(client)
+
+
+if __name__ == '__main__':
+    client = connect_client("GameClient2")
+    setup_server(client)
 
     client.loop_forever()
@@ -4,6 +4,8 @@ class NewPlayer(BaseModel):
     lobby_name: str = Field(..., min_length=1, max_length=20)
     team_name: str = Field(..., min_length=1, max_length=20)
     player_name: str = Field(..., min_length=1, max_length=20)
+    delta: bool = False # Opt in to delta encoded game_state messages, JSON format only
+    format: str = Field('json', pattern=r'^(json|packed)$') # Wire format of game_state and scores, see wireFormat.py
 
 class Move(BaseModel):
     move: str = Field(..., pattern=r'^(UP|DOWN|LEFT|RIGHT)$')
@@ -1,9 +1,5 @@
 import os
 import json
-from dotenv import load_dotenv
-
-import paho.mqtt.client as paho
-from paho import mqtt
 import time
 
 from enum import Enum
@@ -78,34 +74,22 @@ def on_message(client, userdata, msg):
     print("message: " + msg.topic + " " + str(msg.qos) + " " + str(msg.payload))
 
 
-if __name__ == '__main__':
-    load_dotenv(dotenv_path='credentials.env')
-
-    broker_address = os.environ.get('BROKER_ADDRESS')
-    broker_port = int(os.environ.get('BROKER_PORT'))
-    username = os.environ.get('USER_NAME')
-    password = os.environ.get('PASSWORD')
-
-    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="Player1", userdata=None,
-                         protocol=paho.MQTTv5)
+lobby_name = "TestLobby"
+player_1 = "Player1"
+# player_2 = "Player2"
+# player_3 = "Player3"
 
-    # enable TLS for secure connection
-    client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
-    # set username and password
-    client.username_pw_set(username, password)
-    # connect to HiveMQ Cloud on port 8883 (default for MQTT)
-    client.connect(broker_address, broker_port)
 
+def join_test_lobby(client):
+    """
+        Registers Player1 in TestLobby and starts the game, moves are then read from stdin through on_message
+        :param client: a connected paho client, or a fakeBroker.FakeMqttClient
+    """
     # setting callbacks, use separate functions like above for better visibility
     client.on_subscribe = on_subscribe  # Can comment out to not print when subscribing to new topics
     client.on_message = on_message
     client.on_publish = on_publish  # Can comment out to not print when publishing to topics
 
-    lobby_name = "TestLobby"
-    player_1 = "Player1"
-    # player_2 = "Player2"
-    # player_3 = "Player3"
-
     client.subscribe(f"games/{lobby_name}/lobby")
     client.subscribe(f'games/{lobby_name}/+/game_state')
     client.subscribe(f'games/{lobby_name}/scores')
@@ -129,4 +113,20 @@ if __name__ == '__main__':
     # client.publish(f"games/{lobby_name}/{player_3}/move", "DOWN")
     # client.publish(f"games/{lobby_name}/start", "STOP")
 
-    client.loop_forever()
\ No newline at end of file
+
+if __name__ == '__main__':
+    import GameClient
+
+    if os.environ.get('LOCAL_BROKER') == '1':
+        # No network: the game server runs in this process on an in-process broker
+        from fakeBroker import FakeBroker, local_server
+
+        broker = FakeBroker()
+        local_server(broker)
+        client = broker.client("Player1")
+    else:
+        client = GameClient.connect_client("Player1")
+
+    join_test_lobby(client)
+
+    client.loop_forever()
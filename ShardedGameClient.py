@@ -0,0 +1,109 @@
+"""
+Sharded game server: one front process reads every message from the broker and hands each lobby
+to one of N worker processes, picked by a stable hash of the lobby name. Each worker runs the
+normal GameClient dispatch on its own lobbies and publishes with its own broker connection.
+A lobby always lands on the same worker and every worker reads its queue in order, so the
+messages of one lobby are handled in the order they arrived.
+
+    NUM_SHARDS=8 python ShardedGameClient.py
+"""
+
+import os
+import zlib
+import multiprocessing
+import traceback
+from types import SimpleNamespace
+
+import GameClient
+from tickScheduler import TickScheduler
+
+
+def shard_for(lobby_name, num_shards):
+    """
+        Stable across processes and restarts, unlike hash()
+    """
+    if lobby_name is None:
+        return 0
+    return zlib.crc32(str(lobby_name).encode()) % num_shards
+
+
+def run_shard(shard_id, inbox, client_factory=GameClient.connect_client, client_id="GameClient2"):
+    """
+        Worker process: owns the games of its lobbies and publishes their results
+        :param inbox: queue of (topic, payload) in arrival order, None stops the worker
+        :param client_factory: called with a client id, returns a connected client to publish with
+    """
+    client = client_factory(f"{client_id}-shard{shard_id}")
+    GameClient.init_server_state(client)
+    if client.tick_timeout > 0:
+        # Deadlines go through the inbox so they stay in order with the lobby's messages
+        client.scheduler = TickScheduler(lambda lobby_name, tick: inbox.put(
+            (f'games/{lobby_name}/tick', str(tick).encode())))
+    GameClient.start_metrics(client, shard_id)
+    client.loop_start()
+    try:
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            topic, payload = item
+            try:
+                GameClient.on_message(client, None, SimpleNamespace(topic=topic, payload=payload, qos=0))
+            except Exception:
+                # A bad message must not take down every other lobby of this worker
+                traceback.print_exc()
+    finally:
+        if client.scheduler is not None:
+            client.scheduler.stop()
+        client.loop_stop()
+
+
+class ShardRouter:
+    """
+        Front side: starts the workers and forwards each message to the worker owning its lobby
+    """
+    def __init__(self, num_shards, client_factory=GameClient.connect_client, client_id="GameClient2"):
+        self.num_shards = num_shards
+        self.inboxes = [multiprocessing.Queue() for _ in range(num_shards)]
+        self.workers = [multiprocessing.Process(target=run_shard, args=(i, self.inboxes[i], client_factory, client_id),
+                                                name=f"shard{i}", daemon=True)
+                        for i in range(num_shards)]
+        for worker in self.workers:
+            worker.start()
+
+    def on_message(self, client, userdata, msg):
+        """
+            paho on_message callback for the front client
+        """
+        if msg.topic.startswith('admin/'):
+            # Admin commands are for the whole server, every worker gets them
+            for inbox in self.inboxes:
+                inbox.put((msg.topic, msg.payload))
+            return
+        shard = shard_for(GameClient.lobby_of(msg.topic, msg.payload), self.num_shards)
+        self.inboxes[shard].put((msg.topic, msg.payload))
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+if __name__ == '__main__':
+    num_shards = int(os.environ.get('NUM_SHARDS', os.cpu_count() or 1))
+    # Fail here rather than in every worker
+    GameClient.tick_settings()
+
+    # Workers are started before the front connects so they do not inherit its socket
+    router = ShardRouter(num_shards)
+
+    client = GameClient.connect_client("GameClient2")
+    client.on_subscribe = GameClient.on_subscribe
+    client.on_message = router.on_message
+    GameClient.subscribe_server_topics(client)
+
+    try:
+        client.loop_forever()
+    finally:
+        router.stop()
@@ -0,0 +1,230 @@
+"""
+Benchmarks for the engine and server dispatch hot paths
+
+    python benchmarks.py --output bench.json
+    python benchmarks.py --only getGameData --quick
+
+Every benchmark is seeded, so two runs on the same code play out the same boards and moves.
+Results are written as JSON: {'meta': {...}, 'results': [{'name', 'params', 'ops', 'best_us', 'median_us'}, ...]}
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+from game import Game
+from map import Map
+from moveset import Moveset
+from player import Player
+import wireFormat
+
+SIZES = (10, 50, 200)
+WALL_DENSITIES = (0.1, 0.3)
+VISION_RADII = (1, 2, 5, 10)
+
+
+def measure(func, ops: int, repeat: int) -> dict:
+    """
+    Times func() ops times per round for repeat rounds
+    :return: best and median time per call in microseconds
+    """
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(ops):
+            func()
+        rounds.append((time.perf_counter() - start) / ops * 1e6)
+    return {'ops': ops, 'best_us': min(rounds), 'median_us': statistics.median(rounds)}
+
+
+def make_teams(num_players: int) -> dict[str, list[str]]:
+    teams = {'ATeam': [], 'BTeam': []}
+    for i in range(num_players):
+        teams['ATeam' if i % 2 == 0 else 'BTeam'].append(f'Player{i + 1}')
+    return teams
+
+
+def make_game(size: int, num_players: int = 4, seed: int = 0) -> Game:
+    return Game(make_teams(num_players), size, size, seed=seed)
+
+
+def bench_map_init(scale: float):
+    for size in SIZES:
+        for density in WALL_DENSITIES:
+            # Walls may go anywhere, the density is the share of cells offered as wall choices
+            cells = [(x, y) for x in range(size) for y in range(size)]
+            choices = random.Random(0).sample(cells, int(density * len(cells)))
+            players = [Player(f'Player{i}', None) for i in range(4)]
+
+            def build():
+                Map(size, size, players, wallChoices=choices, rng=random.Random(1))
+
+            ops = max(1, int(2000 / size * scale))
+            yield 'Map.__init__', {'size': size, 'wall_density': density}, measure(build, ops, 5)
+
+
+def bench_move_player(scale: float):
+    for size in SIZES:
+        game = make_game(size)
+        names = list(game.all_players)
+        rng = random.Random(2)
+        moves = [(rng.choice(names), rng.choice(list(Moveset))) for _ in range(4096)]
+        step = iter(range(1 << 62))
+
+        def move():
+            name, direction = moves[next(step) & 4095]
+            game.movePlayer(name, direction)
+
+        yield 'Game.movePlayer', {'size': size}, measure(move, int(20000 * scale), 5)
+
+
+def bench_apply_moves(scale: float):
+    for num_players in (4, 32):
+        game = make_game(50, num_players)
+        rng = random.Random(3)
+        batches = [{name: rng.choice(list(Moveset)) for name in game.all_players} for _ in range(256)]
+        step = iter(range(1 << 62))
+
+        def apply():
+            game.applyMoves(batches[next(step) & 255])
+
+        yield 'Game.applyMoves', {'size': 50, 'players': num_players}, measure(apply, int(2000 * scale), 5)
+
+
+def bench_game_data(scale: float):
+    for size in (10, 50):
+        game = make_game(size, 8)
+        for radius in VISION_RADII:
+            yield ('Game.getGameData', {'size': size, 'radius': radius},
+                   measure(lambda: game.getGameData('Player1', radius), int(5000 * scale), 5))
+            yield ('Game.getAllGameData', {'size': size, 'radius': radius, 'players': 8},
+                   measure(lambda: game.getAllGameData(radius), int(1000 * scale), 5))
+
+
+def bench_map_copy(scale: float):
+    for size in SIZES:
+        game = make_game(size)
+        ops = max(1, int(20000 / size * scale))
+        # Taking the snapshot alone, then walking every cell of it as the old deepcopy callers did
+        yield 'Map.map', {'size': size}, measure(lambda: game.map.map, ops, 5)
+        yield 'Map.map+materialize', {'size': size}, measure(lambda: list(game.map.map), max(1, ops // 10), 5)
+
+
+def bench_wire_format(scale: float):
+    for radius in (2, 10):
+        game = make_game(50, 8)
+        game_data = game.getGameData('Player1', radius)
+        ops = int(5000 * scale)
+        encoded = json.dumps(game_data)
+        packed = wireFormat.encodeGameState(game_data)
+        yield 'json.dumps(game_state)', {'radius': radius, 'bytes': len(encoded)}, \
+            measure(lambda: json.dumps(game_data), ops, 5)
+        yield 'wireFormat.encodeGameState', {'radius': radius, 'bytes': len(packed)}, \
+            measure(lambda: wireFormat.encodeGameState(game_data), ops, 5)
+        yield 'json.loads(game_state)', {'radius': radius}, measure(lambda: json.loads(encoded), ops, 5)
+        yield 'wireFormat.decodeGameState', {'radius': radius}, \
+            measure(lambda: wireFormat.decodeGameState(packed), ops, 5)
+
+
+class FakeClient:
+    """
+    Stands in for the paho client: keeps what GameClient publishes in memory
+    """
+    def __init__(self):
+        import GameClient
+
+        GameClient.init_server_state(self)
+        self.log_dir = None
+        self.published = 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published += 1
+
+
+def message(topic: str, payload) -> SimpleNamespace:
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return SimpleNamespace(topic=topic, payload=payload, qos=0)
+
+
+def start_lobby(client, lobby: str, teams: dict[str, list[str]]):
+    import GameClient
+
+    for team, players in teams.items():
+        for player in players:
+            GameClient.on_message(client, None, message('new_game', json.dumps(
+                {'lobby_name': lobby, 'team_name': team, 'player_name': player})))
+    GameClient.on_message(client, None, message(f'games/{lobby}/start', 'START'))
+
+
+def bench_dispatch(scale: float):
+    import GameClient
+
+    for num_players in (4, 16):
+        client = FakeClient()
+        lobby = 'BenchLobby'
+        teams = make_teams(num_players)
+        players = [player for members in teams.values() for player in members]
+        rng = random.Random(5)
+        moves = [message(f'games/{lobby}/{player}/move', rng.choice(('UP', 'DOWN', 'LEFT', 'RIGHT')))
+                 for _ in range(64) for player in players]
+        step = iter(range(1 << 62))
+        # Games started by GameClient draw their seeds from the random module
+        random.seed(4)
+
+        # GameClient prints every message, which is part of the real cost but not worth flooding the terminal with
+        with contextlib.redirect_stdout(io.StringIO()) as sink:
+            def dispatch():
+                # A game that ends is started again so every call hits a live lobby
+                if lobby not in client.game_dict:
+                    start_lobby(client, lobby, teams)
+                GameClient.on_message(client, None, moves[next(step) % len(moves)])
+                sink.seek(0)
+                sink.truncate()
+
+            result = measure(dispatch, int(2000 * scale), 5)
+        yield 'GameClient.on_message(move)', {'players': num_players}, result
+
+
+BENCHMARKS = {
+    'mapInit': bench_map_init,
+    'movePlayer': bench_move_player,
+    'applyMoves': bench_apply_moves,
+    'getGameData': bench_game_data,
+    'mapCopy': bench_map_copy,
+    'wireFormat': bench_wire_format,
+    'dispatch': bench_dispatch,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the engine and dispatch benchmarks')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write results to')
+    parser.add_argument('--only', action='append', choices=BENCHMARKS.keys(), help='run only these, may be repeated')
+    parser.add_argument('--quick', action='store_true', help='a tenth of the iterations, for smoke runs')
+    args = parser.parse_args()
+
+    scale = 0.1 if args.quick else 1.0
+    results = []
+    for key in args.only or BENCHMARKS:
+        for name, params, timing in BENCHMARKS[key](scale):
+            results.append(dict(name=name, params=params, **timing))
+            print(f"{name:32} {json.dumps(params):48} best {timing['best_us']:10.2f}us "
+                  f"median {timing['median_us']:10.2f}us")
+
+    meta = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'quick': args.quick,
+    }
+    with open(args.output, 'w') as file:
+        json.dump({'meta': meta, 'results': results}, file, indent=2)
+    print(f'Wrote {len(results)} results to {args.output}')
@@ -0,0 +1,283 @@
+"""
+Asyncio host for many bot players in one process
+
+    python botRuntime.py --lobbies 50 --teams 2 --players 2 --strategy planner
+    python botRuntime.py --config bots.json
+    LOCAL_BROKER=1 python botRuntime.py ...     # with the game server in-process on the fake broker
+
+Config file:
+    {"move_deadline": 0.5, "move_interval": 0.0, "repeat": true,
+     "lobbies": [{"lobby_name": "Lobby1", "strategy": "greedy", "format": "json", "start": true,
+                  "teams": {"ATeam": ["Player1", "Player2"], "BTeam": ["Player3"]}}]}
+
+game_state messages are routed to their bot through a topic -> bot dict. Decisions run on a thread
+pool so a slow bot never holds up the others; a bot that has not decided within move_deadline sends
+a random open move instead. move_interval paces a bot's moves without blocking anyone. Teammates
+share one strategy instance, so a team has at most one decision running. Teammates wait their turn on
+the event loop, and while a decision that missed its deadline is still running the team only sends
+fallback moves, so a slow team holds one pool thread and never starves the other bots.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import wireFormat
+from planner import MOVES
+from strategies import STRATEGIES
+
+
+class TeamStrategy:
+    """
+    A strategy shared by a team's bots and the one decision it may have running. Only touched on the event loop.
+    """
+    __slots__ = ('strategy', 'decision', 'deadline')
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        # Pool future of the newest decision, still running if not done
+        self.decision: Optional[asyncio.Future] = None
+        # Event loop time by which the newest decision was due
+        self.deadline = 0.0
+
+    @property
+    def deciding(self) -> bool:
+        return self.decision is not None and not self.decision.done()
+
+
+class Bot:
+    __slots__ = ('lobby_name', 'team_name', 'player_name', 'team', 'wire_format', 'latest', 'busy', 'next_move_at')
+
+    def __init__(self, lobby_name: str, team_name: str, player_name: str, team: TeamStrategy, wire_format: str):
+        """
+        :param team: shared by the bots of one team
+        """
+        self.lobby_name = lobby_name
+        self.team_name = team_name
+        self.player_name = player_name
+        self.team = team
+        self.wire_format = wire_format
+        # Newest game_state payload not handled yet, older ones are skipped
+        self.latest: Optional[bytes] = None
+        self.busy = False
+        self.next_move_at = 0.0
+
+    @property
+    def state_topic(self) -> str:
+        return f'games/{self.lobby_name}/{self.player_name}/game_state'
+
+    @property
+    def move_topic(self) -> str:
+        return f'games/{self.lobby_name}/{self.player_name}/move'
+
+
+class BotRuntime:
+    MOVE_DEADLINE = 0.5
+    MAX_WORKERS = 8
+
+    def __init__(self, client, lobbies: list[dict], move_deadline: float = MOVE_DEADLINE, move_interval: float = 0.0,
+                 repeat: bool = True, max_workers: int = MAX_WORKERS):
+        """
+        :param client: connected paho client (or fakeBroker.FakeMqttClient) the bots share
+        :param lobbies: lobby entries as in the config file
+        :param move_deadline: seconds a decision may take before a fallback move is sent
+        :param move_interval: least seconds between two moves of one bot
+        :param repeat: register and start a lobby again when its game ends
+        """
+        assert move_deadline > 0 and move_interval >= 0
+        self.client = client
+        self.lobbies = {lobby['lobby_name']: lobby for lobby in lobbies}
+        self.move_deadline = move_deadline
+        self.move_interval = move_interval
+        self.repeat = repeat
+        # game_state topic -> bot, replaced by fresh bots whenever a lobby is joined again
+        self.bots: dict[str, Bot] = {}
+        self.moves = 0
+        self.missed_deadlines = 0
+        self.strategy_errors = 0
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bot')
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__tasks: set[asyncio.Task] = set()
+        self.__stopping = False
+        client.on_message = self.on_message
+
+    def __make_bots(self, lobby_name: str):
+        lobby = self.lobbies[lobby_name]
+        strategy = STRATEGIES[lobby.get('strategy', 'greedy')]
+        for team_name, players in lobby['teams'].items():
+            # Stateful strategies are shared by a team, with a fresh instance every game
+            team = TeamStrategy(strategy() if isinstance(strategy, type) else strategy)
+            for player_name in players:
+                bot = Bot(lobby_name, team_name, player_name, team, lobby.get('format', wireFormat.JSON))
+                self.bots[bot.state_topic] = bot
+
+    def join(self, lobby_name: str):
+        lobby = self.lobbies[lobby_name]
+        self.__make_bots(lobby_name)
+        for team_name, players in lobby['teams'].items():
+            for player_name in players:
+                self.client.publish('new_game', json.dumps({'lobby_name': lobby_name, 'team_name': team_name,
+                                                            'player_name': player_name,
+                                                            'format': lobby.get('format', wireFormat.JSON)}))
+        if lobby.get('start', True):
+            self.client.publish(f'games/{lobby_name}/start', 'START')
+
+    def on_message(self, client, userdata, msg):
+        """
+        paho callback on the network thread, hands the message to the event loop
+        """
+        self.__loop.call_soon_threadsafe(self.__route, msg.topic, msg.payload)
+
+    def __route(self, topic: str, payload: bytes):
+        if self.__stopping:
+            return
+        bot = self.bots.get(topic)
+        if bot is not None:
+            bot.latest = payload
+            if not bot.busy:
+                bot.busy = True
+                task = asyncio.ensure_future(self.__play(bot))
+                self.__tasks.add(task)
+                task.add_done_callback(self.__tasks.discard)
+        elif topic.endswith('/lobby') and payload.startswith(b'Game Over') and self.repeat:
+            self.join(topic.split('/')[1])
+
+    async def __play(self, bot: Bot):
+        try:
+            while bot.latest is not None:
+                payload, bot.latest = bot.latest, None
+                wait = bot.next_move_at - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    # A newer state arrived while pacing, decide on that one
+                    if bot.latest is not None:
+                        continue
+                move = await self.__decide(bot, payload)
+                if move is not None:
+                    self.client.publish(bot.move_topic, wireFormat.encodeMove(move)
+                                        if bot.wire_format == wireFormat.PACKED else move)
+                    self.moves += 1
+                bot.next_move_at = time.monotonic() + self.move_interval
+        finally:
+            bot.busy = False
+
+    async def __decide(self, bot: Bot, payload: bytes) -> Optional[str]:
+        if bot.wire_format == wireFormat.PACKED:
+            game_state = wireFormat.decodeGameState(payload)
+        else:
+            game_state = json.loads(payload)
+        team = bot.team
+        deadline = self.__loop.time() + self.move_deadline
+        try:
+            # Wait for a teammate's decision to finish, unless it is already late: then the thread may run
+            # for a long time yet and nothing new is started for the team until it is done
+            while team.deciding:
+                remaining = deadline - self.__loop.time()
+                if team.deadline <= self.__loop.time() or remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait((team.decision,), timeout=remaining)
+            team.decision = self.__loop.run_in_executor(self.__pool, team.strategy, game_state)
+            team.deadline = deadline
+            # Shielded, so the decision stays running and the team stays busy after a timeout
+            return await asyncio.wait_for(asyncio.shield(team.decision), deadline - self.__loop.time())
+        except asyncio.TimeoutError:
+            # A late answer is dropped
+            self.missed_deadlines += 1
+        except Exception:
+            traceback.print_exc()
+            self.strategy_errors += 1
+        return self.__fallback_move(game_state)
+
+    def __fallback_move(self, game_state: dict) -> Optional[str]:
+        position = game_state['currentPosition']
+        walls = {tuple(wall) for wall in game_state.get('walls', [])}
+        moves = [name for name, dx, dy in MOVES if (position[0] + dx, position[1] + dy) not in walls]
+        return random.choice(moves) if moves else None
+
+    def stats(self) -> dict:
+        return {'bots': len(self.bots), 'moves': self.moves, 'missed_deadlines': self.missed_deadlines,
+                'strategy_errors': self.strategy_errors}
+
+    async def run(self, duration: Optional[float] = None):
+        """
+        Registers every lobby and plays until duration seconds have passed, or forever
+        """
+        self.__loop = asyncio.get_running_loop()
+        for lobby_name, lobby in self.lobbies.items():
+            self.client.subscribe(f'games/{lobby_name}/lobby')
+            for players in lobby['teams'].values():
+                for player_name in players:
+                    self.client.subscribe(f'games/{lobby_name}/{player_name}/game_state')
+        self.client.loop_start()
+        for lobby_name in self.lobbies:
+            self.join(lobby_name)
+        try:
+            if duration is None:
+                await asyncio.Event().wait()
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            self.__stopping = True
+            self.client.loop_stop()
+            for task in list(self.__tasks):
+                task.cancel()
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+            self.__pool.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_lobbies(num_lobbies: int, num_teams: int, players_per_team: int, strategy: str,
+                     wire_format: str = wireFormat.JSON, prefix: str = 'Bots') -> list[dict]:
+    return [{'lobby_name': f'{prefix}{i}', 'strategy': strategy, 'format': wire_format,
+             'teams': {f'T{t}': [f'B{i}T{t}P{p}' for p in range(players_per_team)] for t in range(num_teams)}}
+            for i in range(num_lobbies)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Host many bot players in one process')
+    parser.add_argument('--config', help='JSON config file, see the module docstring')
+    parser.add_argument('--lobbies', type=int, default=10, help='lobbies to generate without a config')
+    parser.add_argument('--teams', type=int, default=2)
+    parser.add_argument('--players', type=int, default=2, help='players per team')
+    parser.add_argument('--strategy', choices=STRATEGIES.keys(), default='greedy')
+    parser.add_argument('--format', choices=wireFormat.FORMATS, default=wireFormat.JSON)
+    parser.add_argument('--move-deadline', type=float, default=BotRuntime.MOVE_DEADLINE)
+    parser.add_argument('--move-interval', type=float, default=0.0)
+    parser.add_argument('--duration', type=float, default=None, help='seconds to play, forever if not given')
+    args = parser.parse_args()
+
+    if args.config:
+        with open(args.config) as file:
+            config = json.load(file)
+    else:
+        config = {'lobbies': generate_lobbies(args.lobbies, args.teams, args.players, args.strategy, args.format),
+                  'move_deadline': args.move_deadline, 'move_interval': args.move_interval}
+
+    import GameClient
+
+    server = None
+    if os.environ.get('LOCAL_BROKER') == '1':
+        # No network: the game server runs in this process on an in-process broker
+        from fakeBroker import FakeBroker, local_server
+
+        broker = FakeBroker()
+        server = local_server(broker)
+        client = broker.client("BotRuntime")
+    else:
+        client = GameClient.connect_client("BotRuntime")
+
+    runtime = BotRuntime(client, config['lobbies'], config.get('move_deadline', BotRuntime.MOVE_DEADLINE),
+                         config.get('move_interval', 0.0), config.get('repeat', True))
+    try:
+        asyncio.run(runtime.run(args.duration))
+    except KeyboardInterrupt:
+        pass
+    if server is not None:
+        # Otherwise its thread may still hand moves to the lobby workers while the interpreter shuts down
+        server.loop_stop()
+    print(runtime.stats())
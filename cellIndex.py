@@ -0,0 +1,197 @@
+"""
+Incrementally maintained cell indexes for Map
+"""
+
+import random
+from typing import Optional
+import numpy as np
+
+
+class FreeCellIndex:
+    """
+    Set of empty cells with O(1) add, remove and uniform random sampling.
+    Cells are kept densely in the first len() entries of a preallocated array of flat indexes (x*width + y);
+    a position array maps each cell back to its slot so removal can swap the last entry into the hole.
+    """
+    def __init__(self, height: int, width: int, full: bool = False):
+        """
+        :param full: start with every cell free instead of none
+        """
+        self.__width = width
+        if full:
+            self.__cells = np.arange(height * width, dtype=np.int32)
+            self.__slots = np.arange(height * width, dtype=np.int32)
+            self.__len = height * width
+        else:
+            self.__cells = np.zeros(height * width, dtype=np.int32)
+            self.__slots = np.full(height * width, -1, dtype=np.int32)
+            self.__len = 0
+        # Single entries are read and written through memoryviews, which deal in plain ints and skip
+        # the cost of NumPy scalar indexing
+        self.__cellView = memoryview(self.__cells)
+        self.__slotView = memoryview(self.__slots)
+
+    @classmethod
+    def fromMask(cls, mask: np.ndarray) -> 'FreeCellIndex':
+        """
+        Index of the cells that are True in a (height, width) boolean mask
+        """
+        height, width = mask.shape
+        return cls.fromCells(height, width, np.flatnonzero(mask))
+
+    @classmethod
+    def fromCells(cls, height: int, width: int, cells: np.ndarray) -> 'FreeCellIndex':
+        """
+        Index holding the given flat cell indexes in exactly that order, see cells
+        """
+        index = cls(height, width)
+        index.__cells[:len(cells)] = cells
+        index.__slots[cells] = np.arange(len(cells), dtype=np.int32)
+        index.__len = len(cells)
+        return index
+
+    @property
+    def cells(self) -> np.ndarray:
+        """
+        Flat indexes of the free cells in internal order. Sampling depends on this order, so it has to be
+        kept to reproduce a game exactly after a restore
+        """
+        return self.__cells[:self.__len].copy()
+
+    def __len__(self):
+        return self.__len
+
+    def __contains__(self, loc: tuple[int, int]):
+        return self.__slotView[loc[0] * self.__width + loc[1]] >= 0
+
+    def add(self, loc: tuple[int, int]):
+        cell = loc[0] * self.__width + loc[1]
+        if self.__slotView[cell] >= 0:
+            return
+        self.__slotView[cell] = self.__len
+        self.__cellView[self.__len] = cell
+        self.__len += 1
+
+    def remove(self, loc: tuple[int, int]):
+        cell = loc[0] * self.__width + loc[1]
+        slot = self.__slotView[cell]
+        if slot < 0:
+            return
+        self.__len -= 1
+        last = self.__cellView[self.__len]
+        if last != cell:
+            self.__cellView[slot] = last
+            self.__slotView[last] = slot
+        self.__slotView[cell] = -1
+
+    def sample(self, rng=random) -> tuple[int, int]:
+        """
+        Uniformly random free cell, the cell stays in the index
+        """
+        if not self.__len:
+            raise ValueError('No free cells left on the map')
+        return divmod(self.__cellView[rng.randrange(self.__len)], self.__width)
+
+
+class SpatialIndex:
+    """
+    Where a group of cell codes is on the board, kept as a count per BUCKET_SIZE x BUCKET_SIZE block.
+    A nearest query only scans the grid inside occupied blocks near the start, searched ring by ring,
+    and the index is one small int32 array however many items there are.
+    """
+    BUCKET_SIZE = 8
+
+    def __init__(self, grid: np.ndarray, codes: tuple[int, ...], bucketSize: int = BUCKET_SIZE):
+        """
+        Counts the cells of grid holding any of codes; keep it current with add and remove from then on
+        """
+        assert isinstance(bucketSize, int) and bucketSize > 0
+        self.codes = frozenset(codes)
+        self.__bucketSize = bucketSize
+        self.__height, self.__width = grid.shape
+        # Lookup by cell code, one fancy index turns a block of the grid into a mask
+        self.__member = np.zeros(256, dtype=bool)
+        self.__member[list(self.codes)] = True
+        rows, cols = -(-self.__height // bucketSize), -(-self.__width // bucketSize)
+        padded = np.zeros((rows * bucketSize, cols * bucketSize), dtype=np.int32)
+        padded[:self.__height, :self.__width] = self.__member[grid]
+        self.__counts = padded.reshape(rows, bucketSize, cols, bucketSize).sum(axis=(1, 3), dtype=np.int32)
+        self.__countView = memoryview(self.__counts)
+        self.__count = int(self.__counts.sum())
+
+    def __len__(self):
+        return self.__count
+
+    def add(self, loc: tuple[int, int]):
+        """
+        Call when loc starts holding one of the codes
+        """
+        self.__countView[loc[0] // self.__bucketSize, loc[1] // self.__bucketSize] += 1
+        self.__count += 1
+
+    def remove(self, loc: tuple[int, int]):
+        """
+        Call when loc stops holding one of the codes
+        """
+        self.__countView[loc[0] // self.__bucketSize, loc[1] // self.__bucketSize] -= 1
+        self.__count -= 1
+
+    def nearest(self, grid: np.ndarray, loc: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """
+        Closest location by Manhattan distance (ties go to the first in row-major order), None if empty
+        :param grid: the cell code layer this index counts
+        """
+        if not self.__count:
+            return None
+        x, y = loc
+        size = self.__bucketSize
+        row, col = x // size, y // size
+        best, bestDist = None, None
+        for ring in range(max(self.__counts.shape)):
+            for r, c in self.__ring(row, col, ring):
+                if not self.__countView[r, c]:
+                    continue
+                top, left = r * size, c * size
+                block = self.__member[grid[top:top + size, left:left + size]]
+                # Row-major, so the first of equally close cells wins
+                for cell in np.flatnonzero(block).tolist():
+                    bx, by = divmod(cell, block.shape[1])
+                    candidate = (top + bx, left + by)
+                    dist = abs(candidate[0] - x) + abs(candidate[1] - y)
+                    if bestDist is None or (dist, candidate) < (bestDist, best):
+                        best, bestDist = candidate, dist
+            # Strictly closer, a cell further out at the same distance may still win the tie
+            if bestDist is not None and bestDist < self.__unscanned(x, y, row, col, ring):
+                break
+        return best
+
+    def __unscanned(self, x: int, y: int, row: int, col: int, ring: int) -> float:
+        """
+        Lower bound on the distance from (x, y) to any cell outside the rings searched so far
+        """
+        size = self.__bucketSize
+        top, bottom = (row - ring) * size, (row + ring + 1) * size
+        left, right = (col - ring) * size, (col + ring + 1) * size
+        bound = float('inf')
+        if top > 0:
+            bound = min(bound, x - top + 1)
+        if bottom < self.__height:
+            bound = min(bound, bottom - x)
+        if left > 0:
+            bound = min(bound, y - left + 1)
+        if right < self.__width:
+            bound = min(bound, right - y)
+        return bound
+
+    def __ring(self, row: int, col: int, ring: int):
+        rows, cols = self.__counts.shape
+        for r in range(row - ring, row + ring + 1):
+            if not 0 <= r < rows:
+                continue
+            if r in (row - ring, row + ring):
+                ringCols = range(col - ring, col + ring + 1)
+            else:
+                ringCols = (col - ring, col + ring)
+            for c in ringCols:
+                if 0 <= c < cols:
+                    yield r, c
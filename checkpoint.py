@@ -0,0 +1,120 @@
+"""
+Compact binary format for Game checkpoints
+
+Layout (little endian):
+    header   magic 'GCKP', format version, height, width, coins left, ticks, coin respawn interval,
+             max coins, number of teams, RNG state flag
+    roster   per team: name, score, number of players, then per player: name, x, y
+    grid     height*width int8 cell codes
+    free     number of free cells, then their flat indexes in sampling order (uint16, uint32 on big maps)
+    rng      (if flagged) 624 Mersenne Twister words, position, gauss_next (NaN for None)
+"""
+
+import math
+import struct
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+MAGIC = b'GCKP'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<4sBHHiIIiHB')
+TEAM = struct.Struct('<iH')
+COUNT = struct.Struct('<I')
+LOCATION = struct.Struct('<HH')
+RNG_WORDS = 625
+RNG = struct.Struct(f'<{RNG_WORDS}Id')
+
+
+class GameState(NamedTuple):
+    height: int
+    width: int
+    numCoins: int
+    ticks: int
+    coinRespawnInterval: int
+    maxCoins: int
+    # [(teamName, score, [(playerName, (x, y)), ...]), ...]
+    teams: list[tuple[str, int, list[tuple[str, tuple[int, int]]]]]
+    grid: np.ndarray
+    # Map.freeCells
+    freeCells: np.ndarray
+    # As returned by random.Random.getstate(), None if not saved
+    rngState: Optional[tuple]
+
+
+def packName(name: str) -> bytes:
+    """
+    Name length (uint8) followed by the utf-8 name
+    """
+    encoded = name.encode()
+    assert len(encoded) < 256
+    return bytes((len(encoded),)) + encoded
+
+
+def unpackName(view: memoryview, offset: int) -> tuple[str, int]:
+    """
+    :return: the name packed at offset and the offset after it
+    """
+    length = view[offset]
+    return bytes(view[offset + 1:offset + 1 + length]).decode(), offset + 1 + length
+
+
+def _cellType(height: int, width: int) -> type:
+    return np.uint16 if height * width <= 0xFFFF else np.uint32
+
+
+def encode(state: GameState) -> bytes:
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, state.height, state.width, state.numCoins, state.ticks,
+                         state.coinRespawnInterval, state.maxCoins, len(state.teams), state.rngState is not None)]
+    for teamName, score, players in state.teams:
+        parts.append(packName(teamName))
+        parts.append(TEAM.pack(score, len(players)))
+        for playerName, loc in players:
+            parts.append(packName(playerName))
+            parts.append(LOCATION.pack(*loc))
+    parts.append(np.ascontiguousarray(state.grid, dtype=np.int8).tobytes())
+    parts.append(COUNT.pack(len(state.freeCells)))
+    parts.append(np.asarray(state.freeCells, dtype=_cellType(state.height, state.width)).tobytes())
+    if state.rngState is not None:
+        _, words, gauss = state.rngState
+        parts.append(RNG.pack(*words, math.nan if gauss is None else gauss))
+    return b''.join(parts)
+
+
+def decode(data: bytes) -> GameState:
+    view = memoryview(data)
+    (magic, version, height, width, numCoins, ticks, coinRespawnInterval, maxCoins,
+     numTeams, hasRng) = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('Not a game checkpoint or unsupported checkpoint version')
+    offset = HEADER.size
+
+    teams = []
+    for _ in range(numTeams):
+        teamName, offset = unpackName(view, offset)
+        score, numPlayers = TEAM.unpack_from(view, offset)
+        offset += TEAM.size
+        players = []
+        for _ in range(numPlayers):
+            playerName, offset = unpackName(view, offset)
+            players.append((playerName, LOCATION.unpack_from(view, offset)))
+            offset += LOCATION.size
+        teams.append((teamName, score, players))
+
+    grid = np.frombuffer(view, dtype=np.int8, count=height * width, offset=offset).reshape(height, width).copy()
+    offset += height * width
+
+    numFree, = COUNT.unpack_from(view, offset)
+    offset += COUNT.size
+    cellType = _cellType(height, width)
+    freeCells = np.frombuffer(view, dtype=cellType, count=numFree, offset=offset).astype(np.int32)
+    offset += numFree * np.dtype(cellType).itemsize
+
+    rngState = None
+    if hasRng:
+        values = RNG.unpack_from(view, offset)
+        gauss = values[-1]
+        rngState = (3, tuple(values[:-1]), None if math.isnan(gauss) else gauss)
+
+    return GameState(height, width, numCoins, ticks, coinRespawnInterval, maxCoins, teams, grid, freeCells, rngState)
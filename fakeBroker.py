@@ -0,0 +1,346 @@
+"""
+In-process stand-in for an MQTT broker and the paho clients connected to it, for running the server
+and bots on one machine without a network
+
+    broker = FakeBroker()
+    server = local_server(broker)
+
+    bot = broker.client("Player1")
+    bot.on_message = ...
+    bot.subscribe('games/TestLobby/+/game_state')
+    bot.loop_start()
+
+Each client has its own bounded inbox, drained by its loop methods like paho's network loop
+calls on_message. As with QoS 0 on a real broker, a message for a full inbox is dropped and counted.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Default inbox size per client
+MAX_QUEUE = 10000
+
+
+def _toBytes(payload) -> bytes:
+    """
+    Same conversion paho applies to publish payloads
+    """
+    if payload is None:
+        return b''
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode()
+    if isinstance(payload, (int, float)):
+        return str(payload).encode()
+    raise TypeError('payload must be a string, bytearray, int, float or None.')
+
+
+class FakeMessage:
+    __slots__ = ('topic', 'payload', 'qos', 'retain', 'mid', 'timestamp')
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False, mid: int = 0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+        # When the broker accepted it, for measuring delivery latency
+        self.timestamp = time.perf_counter()
+
+
+class FakeMessageInfo:
+    """
+    What publish returns, like paho's MQTTMessageInfo; delivery to the broker is immediate
+    """
+    def __init__(self, mid: int, rc: int = 0):
+        self.mid = mid
+        self.rc = rc
+
+    def wait_for_publish(self, timeout: Optional[float] = None):
+        pass
+
+    def is_published(self) -> bool:
+        return True
+
+
+class _TopicNode:
+    __slots__ = ('children', 'subscribers')
+
+    def __init__(self):
+        self.children: dict[str, '_TopicNode'] = {}
+        # client -> qos
+        self.subscribers: dict['FakeMqttClient', int] = {}
+
+
+class FakeBroker:
+    def __init__(self, maxQueue: int = MAX_QUEUE):
+        """
+        :param maxQueue: inbox size of clients created by client()
+        """
+        self.maxQueue = maxQueue
+        self.__root = _TopicNode()
+        self.__lock = threading.Lock()
+        self.__clients: dict[str, 'FakeMqttClient'] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def client(self, client_id: str = '', userdata=None, maxQueue: Optional[int] = None) -> 'FakeMqttClient':
+        """
+        A new client connected to this broker, drop-in for a connected paho.Client
+        """
+        client = FakeMqttClient(self, client_id, userdata, self.maxQueue if maxQueue is None else maxQueue)
+        with self.__lock:
+            self.__clients[client_id or str(id(client))] = client
+        return client
+
+    def subscribe(self, client: 'FakeMqttClient', pattern: str, qos: int = 0):
+        with self.__lock:
+            node = self.__root
+            for level in pattern.split('/'):
+                node = node.children.setdefault(level, _TopicNode())
+            node.subscribers[client] = qos
+
+    def unsubscribe(self, client: 'FakeMqttClient', pattern: str):
+        with self.__lock:
+            node = self.__root
+            for level in pattern.split('/'):
+                node = node.children.get(level)
+                if node is None:
+                    return
+            node.subscribers.pop(client, None)
+
+    def disconnect(self, client: 'FakeMqttClient'):
+        with self.__lock:
+            stack = [self.__root]
+            while stack:
+                node = stack.pop()
+                node.subscribers.pop(client, None)
+                stack.extend(node.children.values())
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        """
+        Puts the message in the inbox of every client with a matching subscription, once per client
+        """
+        if '+' in topic or '#' in topic:
+            raise ValueError('Publish topic cannot contain wildcards.')
+        with self.__lock:
+            self.published += 1
+            subscribers = self.__match(topic.split('/'), topic.startswith('$'))
+        delivered = sum(client._deliver(FakeMessage(topic, payload, min(qos, grantedQos)))
+                        for client, grantedQos in subscribers.items())
+        with self.__lock:
+            self.delivered += delivered
+            self.dropped += len(subscribers) - delivered
+
+    def __match(self, levels: list[str], system: bool) -> dict['FakeMqttClient', int]:
+        matched: dict[FakeMqttClient, int] = {}
+
+        def add(node):
+            for client, qos in node.subscribers.items():
+                matched[client] = max(qos, matched.get(client, 0))
+
+        nodes = [self.__root]
+        for depth, level in enumerate(levels):
+            nextNodes = []
+            for node in nodes:
+                # Wildcards at the first level do not match $SYS style topics
+                wildcards = not (depth == 0 and system)
+                hashNode = node.children.get('#')
+                if hashNode is not None and wildcards:
+                    add(hashNode)
+                child = node.children.get(level)
+                if child is not None:
+                    nextNodes.append(child)
+                plusNode = node.children.get('+')
+                if plusNode is not None and wildcards:
+                    nextNodes.append(plusNode)
+            nodes = nextNodes
+        for node in nodes:
+            add(node)
+            # a/# also matches a
+            hashNode = node.children.get('#')
+            if hashNode is not None:
+                add(hashNode)
+        return matched
+
+    def stats(self) -> dict:
+        """
+        Broker totals and the current and highest inbox depth of every client
+        """
+        with self.__lock:
+            clients = dict(self.__clients)
+        return {'published': self.published, 'delivered': self.delivered, 'dropped': self.dropped,
+                'clients': {clientId: {'queued': client.queueDepth, 'maxQueued': client.maxQueueDepth,
+                                       'dropped': client.dropped}
+                            for clientId, client in clients.items()}}
+
+
+def local_server(broker: FakeBroker, client_id: str = 'GameClient2') -> 'FakeMqttClient':
+    """
+    Runs the game server in this process on the broker
+    :return: the server's client, with its loop started
+    """
+    # GameClient pulls in the whole game, only needed when a script asks for a local server
+    import GameClient
+
+    server = broker.client(client_id)
+    GameClient.setup_server(server)
+    server.loop_start()
+    return server
+
+
+class FakeMqttClient:
+    """
+    The part of paho.mqtt.client.Client the server and bots use. Callbacks use the VERSION1 signatures.
+    """
+    def __init__(self, broker: FakeBroker, client_id: str = '', userdata=None, maxQueue: int = MAX_QUEUE):
+        assert isinstance(maxQueue, int) and maxQueue > 0
+        self.__broker = broker
+        self._client_id = client_id
+        self._userdata = userdata
+        self.maxQueue = maxQueue
+        self.__inbox: deque = deque()
+        self.__condition = threading.Condition()
+        self.__mid = 0
+        self.__thread: Optional[threading.Thread] = None
+        self.__running = False
+        self.maxQueueDepth = 0
+        self.dropped = 0
+
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_publish = None
+        self.on_subscribe = None
+
+    @property
+    def queueDepth(self) -> int:
+        return len(self.__inbox)
+
+    def __nextMid(self) -> int:
+        self.__mid += 1
+        return self.__mid
+
+    # Connection setup is accepted and ignored, the broker is always there
+    def tls_set(self, *args, **kwargs):
+        pass
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def user_data_set(self, userdata):
+        self._userdata = userdata
+
+    def connect(self, host: str = '', port: int = 1883, keepalive: int = 60, *args, **kwargs) -> int:
+        if self.on_connect is not None:
+            self.on_connect(self, self._userdata, {}, 0, None)
+        return 0
+
+    def reconnect(self) -> int:
+        return self.connect()
+
+    def disconnect(self, *args, **kwargs) -> int:
+        self.__broker.disconnect(self)
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, self._userdata, 0)
+        return 0
+
+    def is_connected(self) -> bool:
+        return True
+
+    def subscribe(self, topic, qos: int = 0, *args, **kwargs) -> tuple[int, int]:
+        """
+        :param topic: a topic filter, or a list of (topic filter, qos) pairs like paho accepts
+        """
+        filters = topic if isinstance(topic, list) else [(topic, qos)]
+        for pattern, patternQos in filters:
+            self.__broker.subscribe(self, pattern, patternQos)
+        mid = self.__nextMid()
+        if self.on_subscribe is not None:
+            self.on_subscribe(self, self._userdata, mid, tuple(patternQos for _, patternQos in filters), None)
+        return 0, mid
+
+    def unsubscribe(self, topic, *args, **kwargs) -> tuple[int, int]:
+        for pattern in topic if isinstance(topic, list) else [topic]:
+            self.__broker.unsubscribe(self, pattern)
+        return 0, self.__nextMid()
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False, properties=None) -> FakeMessageInfo:
+        mid = self.__nextMid()
+        self.__broker.publish(topic, _toBytes(payload), qos, retain)
+        if self.on_publish is not None:
+            self.on_publish(self, self._userdata, mid, None)
+        return FakeMessageInfo(mid)
+
+    def _deliver(self, message: FakeMessage) -> bool:
+        """
+        Called by the broker, False if the inbox is full and the message was dropped
+        """
+        with self.__condition:
+            if len(self.__inbox) >= self.maxQueue:
+                self.dropped += 1
+                return False
+            self.__inbox.append(message)
+            self.maxQueueDepth = max(self.maxQueueDepth, len(self.__inbox))
+            self.__condition.notify()
+        return True
+
+    def loop(self, timeout: float = 1.0, max_messages: Optional[int] = None) -> int:
+        """
+        Delivers the messages waiting now, waiting up to timeout for the first one
+        """
+        with self.__condition:
+            if not self.__inbox:
+                self.__condition.wait(timeout)
+            count = len(self.__inbox) if max_messages is None else min(max_messages, len(self.__inbox))
+            messages = [self.__inbox.popleft() for _ in range(count)]
+        for message in messages:
+            self.__handle(message)
+        return 0
+
+    def __handle(self, message: FakeMessage):
+        if self.on_message is not None:
+            self.on_message(self, self._userdata, message)
+
+    def loop_forever(self, *args, **kwargs) -> int:
+        """
+        Delivers messages on the calling thread until disconnect()
+        """
+        self.__running = True
+        return self.__serve()
+
+    def __serve(self) -> int:
+        while True:
+            with self.__condition:
+                while self.__running and not self.__inbox:
+                    self.__condition.wait()
+                if not self.__running:
+                    return 0
+                message = self.__inbox.popleft()
+            self.__handle(message)
+
+    def loop_start(self) -> int:
+        if self.__thread is not None:
+            return 1
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__serve, name=f'fake-mqtt-{self._client_id}', daemon=True)
+        self.__thread.start()
+        return 0
+
+    def loop_stop(self, force: bool = False) -> int:
+        if self.__thread is None:
+            return 1
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        if self.__thread is not threading.current_thread():
+            self.__thread.join()
+        self.__thread = None
+        return 0
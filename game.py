@@ -2,25 +2,49 @@
 Author: Charles Lee
 """
 
-from map import Map
+from map import Map, EMPTY, WALL, COIN1, COIN2, COIN3, PLAYER
 from moveset import Moveset
 from player import Player
 from team import Team
-from gameItems import *
+import checkpoint
+from checkpoint import GameState
 import random
+from bisect import bisect_left, bisect_right
+import numpy as np
+from typing import Optional
+
+# gameData key for each non-player cell code
+ITEM_KEYS = {COIN1: 'coin1', COIN2: 'coin2', COIN3: 'coin3', WALL: 'walls'}
+# getAllGameData slices every window on its own once the windows hold more occupied cells than this per player
+BATCH_CELLS_PER_PLAYER = 16
 
 class Game:
-    def __init__(self, playerNames: dict[str,list[str]], width: int = 10, height: int = 10):
+    def __init__(self, playerNames: dict[str,list[str]], width: int = 10, height: int = 10,
+                 coinRespawnInterval: int = 0, seed: Optional[int] = None, rng: Optional[random.Random] = None):
         """
         :param playerNames: Dictionary for each team name with a list of player names
+        :param coinRespawnInterval: Coin respawn mode, drop a new coin every this many ticks (0 disables)
+        :param seed: Seed of this game's own random number generator, drawn from the random module if None
+        :param rng: Generator to use instead of seeding a new one, seed is then only informational
         """
+        assert isinstance(coinRespawnInterval, int) and coinRespawnInterval >= 0
+        if rng is None:
+            seed = random.getrandbits(32) if seed is None else seed
+            rng = random.Random(seed)
+        self.seed = seed
+        self.rng = rng
         self.numTeams = len(playerNames)
 
         self.teams, self.all_players = self.__initializePlayers(playerNames)
 
         self.__height = height
         self.__width = width
-        self.map = Map(height, width, list(self.all_players.values()))
+        self.map = Map(height, width, list(self.all_players.values()), rng=self.rng)
+
+        self.ticks = 0
+        self.coinRespawnInterval = coinRespawnInterval
+        # Respawning never pushes the board past its starting coin count
+        self.__maxCoins = self.map.numCoins
 
     def __initializePlayers(self, playerNames: dict[str,list[str]]):
         teams = {}
@@ -43,18 +67,88 @@ class Game:
         if not (0 <= new_loc[0] < self.__height) or not (0 <= new_loc[1] < self.__width):
             return
 
-        cell = self.map.get(new_loc)
-        if isinstance(cell, Player) or isinstance(cell, Wall):
+        code = self.map.getCode(new_loc)
+        if code == PLAYER or code == WALL:
             return
 
-        if isinstance(cell, Coin):
-            player.team.increaseScore(cell.value)
+        if code != EMPTY:
+            player.team.increaseScore(self.map.get(new_loc).value)
             self.map.decreaseCoin()
 
-        self.map.set(player.loc, None)
-        self.map.set(new_loc, player)
+        self.map.move(player.loc, new_loc)
         player.loc = new_loc
 
+    def applyMoves(self, moves: dict[str, Moveset]) -> list[tuple[str, tuple[int, int], tuple[int, int], int]]:
+        """
+        Resolves one tick with every player moving at the same time, independent of move order.
+        A move is cancelled when it leaves the board, hits a wall, targets the same cell as another
+        move, swaps places with another player or runs into a player that is not moving away.
+        Chains and rotations of three or more players all go through.
+        :param moves: {playerName: Moveset}, players without a move stay put
+        :return: [(playerName, oldLoc, newLoc, coinValue), ...] for every player that moved, in roster order
+        """
+        targets: dict[str, tuple[int, int]] = {}
+        for playerName, move in moves.items():
+            assert isinstance(move, Moveset)
+            x, y = self.getPlayer(playerName).loc
+            dx, dy = move.value
+            new_loc = x+dx, y+dy
+            if not (0 <= new_loc[0] < self.__height) or not (0 <= new_loc[1] < self.__width):
+                continue
+            if self.map.getCode(new_loc) == WALL:
+                continue
+            targets[playerName] = new_loc
+
+        # Two or more players heading for the same cell all stay
+        claims: dict[tuple[int, int], list[str]] = {}
+        for playerName, new_loc in targets.items():
+            claims.setdefault(new_loc, []).append(playerName)
+        for claimants in claims.values():
+            if len(claimants) > 1:
+                for playerName in claimants:
+                    del targets[playerName]
+
+        # Head-on swaps are blocked
+        occupants = {player.loc: playerName for playerName, player in self.all_players.items()}
+        for playerName, new_loc in list(targets.items()):
+            other = occupants.get(new_loc)
+            if other is not None and targets.get(other) == self.all_players[playerName].loc:
+                targets.pop(playerName, None)
+                targets.pop(other, None)
+
+        # Moving into a player that stays blocks the move, which can in turn block whoever follows
+        blocked = True
+        while blocked:
+            blocked = False
+            for playerName, new_loc in list(targets.items()):
+                other = occupants.get(new_loc)
+                if other is not None and other not in targets:
+                    del targets[playerName]
+                    blocked = True
+
+        # Applied in roster order: map writes reorder the free-cell index that coin respawns sample from
+        changes = []
+        for playerName in self.all_players:
+            new_loc = targets.get(playerName)
+            if new_loc is None:
+                continue
+            coinValue = 0
+            if self.map.getCode(new_loc) not in (EMPTY, PLAYER):
+                coinValue = self.map.get(new_loc).value
+            changes.append((playerName, self.all_players[playerName].loc, new_loc, coinValue))
+
+        for playerName, old_loc, _, _ in changes:
+            self.map.set(old_loc, None)
+        for playerName, _, new_loc, coinValue in changes:
+            player = self.all_players[playerName]
+            if coinValue:
+                player.team.increaseScore(coinValue)
+                self.map.decreaseCoin()
+            self.map.set(new_loc, player)
+            player.loc = new_loc
+
+        return changes
+
     def getPlayer(self, playerName: str) -> Player:
         assert isinstance(playerName, str)
         try:
@@ -80,6 +174,73 @@ class Game:
         assert isinstance(playerName, str)
         assert isinstance(visionRadius, int)
         player = self.getPlayer(playerName)
+        return self.__collectGameData(player, visionRadius, self.map.grid, self.map.playerGrid, self.map.players)
+
+    def takeDirtyCells(self) -> Optional[list[tuple[int, int]]]:
+        """
+        Cells whose content changed since the previous call, call once per tick to get that tick's changes
+        :return: None if the whole board may have changed (new game or restore)
+        """
+        return self.map.takeDirty()
+
+    def getAllGameData(self, visionRadius: int = 2) -> dict[str, dict]:
+        """
+        getGameData for every player from one pass over the board. The occupied cells inside any vision
+        window are pulled out of the grid with a single nonzero and bucketed by row, then each window only
+        walks its rows, instead of every player paying for its own round of NumPy calls
+        :param visionRadius:
+        :return: {playerName: gameData, ...} with the same gameData as getGameData
+        """
+        assert isinstance(visionRadius, int)
+        grid, playerGrid, players = self.map.grid, self.map.playerGrid, self.map.players
+        visible = np.zeros(grid.shape, dtype=bool)
+        for player in self.all_players.values():
+            x, y = player.loc
+            visible[max(x - visionRadius, 0):x + visionRadius + 1, max(y - visionRadius, 0):y + visionRadius + 1] = True
+        xs, ys = np.nonzero(visible & (grid != EMPTY))
+        if len(xs) > BATCH_CELLS_PER_PLAYER * len(self.all_players):
+            # Big windows: bucketing that many cells in Python costs more than slicing each window
+            return {name: self.__collectGameData(player, visionRadius, grid, playerGrid, players)
+                    for name, player in self.all_players.items()}
+
+        # Row -> ([y, ...], [(loc, gameData key or None for a player, player or None), ...]) in column order
+        rows: dict[int, tuple[list, list]] = {}
+        for x, y, code, playerId in zip(xs.tolist(), ys.tolist(), grid[xs, ys].tolist(), playerGrid[xs, ys].tolist()):
+            rowYs, cells = rows.setdefault(x, ([], []))
+            rowYs.append(y)
+            if code == PLAYER:
+                cells.append(((x, y), None, players[playerId]))
+            else:
+                cells.append(((x, y), ITEM_KEYS[code], None))
+
+        allData = {}
+        for name, player in self.all_players.items():
+            centerX, centerY = player.loc
+            minY = max(centerY - visionRadius, 0)
+            maxY = centerY + visionRadius
+            gameData = {'teammateNames': [],
+                        'teammatePositions': [],
+                        'enemyPositions': [],
+                        'currentPosition': player.loc,
+                        'coin1': [],
+                        'coin2': [],
+                        'coin3': [],
+                        'walls': []}
+            for x in range(max(centerX - visionRadius, 0), centerX + visionRadius + 1):
+                row = rows.get(x)
+                if row is None:
+                    continue
+                rowYs, cells = row
+                for loc, key, cell in cells[bisect_left(rowYs, minY):bisect_right(rowYs, maxY)]:
+                    if key is not None:
+                        gameData[key].append(loc)
+                    else:
+                        self.__addPlayerData(gameData, cell, loc, player)
+            allData[name] = gameData
+        return allData
+
+    def __collectGameData(self, player: Player, visionRadius: int, grid: np.ndarray, playerGrid: np.ndarray,
+                          players: list[Player]) -> dict:
         centerX, centerY = player.loc
         minX = max(centerX - visionRadius, 0)
         maxX = min(centerX + visionRadius, self.__height-1)
@@ -94,29 +255,117 @@ class Game:
                     'coin3': [],
                     'walls': []}
 
-        for x in range(minX, maxX+1):
-            for y in range(minY, maxY+1):
-                cell = self.map.get((x,y))
-                self.__addGameData(gameData, cell, (x,y), player)
+        # Only occupied cells of the window are visited, in the same row-major order as a full scan
+        window = grid[minX:maxX+1, minY:maxY+1]
+        xs, ys = np.nonzero(window)
+        codes = window[xs, ys].tolist()
+        xs = (xs + minX).tolist()
+        ys = (ys + minY).tolist()
+        for x, y, code in zip(xs, ys, codes):
+            loc = (x, y)
+            if code == PLAYER:
+                self.__addPlayerData(gameData, players[playerGrid[x, y]], loc, player)
+            else:
+                gameData[ITEM_KEYS[code]].append(loc)
 
         return gameData
 
-    def __addGameData(self, gameData: dict, cell: object, loc: tuple[int, int], player: Player):
-        if isinstance(cell, Player):
-            if cell.team is player.team and cell is not player:
-                gameData['teammateNames'].append(cell.name)
-                gameData['teammatePositions'].append(loc)
-            elif cell.team is not player.team:
-                gameData['enemyPositions'].append(loc)
-        elif isinstance(cell, Coin1):
-            gameData['coin1'].append(loc)
-        elif isinstance(cell, Coin2):
-            gameData['coin2'].append(loc)
-        elif isinstance(cell, Coin3):
-            gameData['coin3'].append(loc)
-        elif isinstance(cell, Wall):
-            gameData['walls'].append(loc)
-    
+    def __addPlayerData(self, gameData: dict, cell: Player, loc: tuple[int, int], player: Player):
+        if cell.team is player.team and cell is not player:
+            gameData['teammateNames'].append(cell.name)
+            gameData['teammatePositions'].append(loc)
+        elif cell.team is not player.team:
+            gameData['enemyPositions'].append(loc)
+
+    def enemiesInRange(self, playerName: str, radius: int) -> list[str]:
+        """
+        Names of players from other teams within the square window of radius around the player
+        """
+        assert isinstance(radius, int)
+        player = self.getPlayer(playerName)
+        enemies = []
+        for loc in self.map.inRange(PLAYER, player.loc, radius):
+            other = self.map.get(loc)
+            if other.team is not player.team:
+                enemies.append(other.name)
+        return enemies
+
+    def nearestCoin(self, playerName: str) -> Optional[tuple[int, int]]:
+        """
+        Location of the closest coin of any value by Manhattan distance, None once no coins are left
+        """
+        return self.map.nearest((COIN1, COIN2, COIN3), self.getPlayer(playerName).loc)
+
+    def endTick(self) -> list[tuple[int, int]]:
+        """
+        Call once after every player's move for a turn has been applied
+        :return: locations of coins spawned this tick
+        """
+        self.ticks += 1
+        spawned = []
+        if self.coinRespawnInterval and self.ticks % self.coinRespawnInterval == 0:
+            if self.map.numCoins < self.__maxCoins and self.map.numFree > 0:
+                spawned.append(self.map.spawnCoin())
+        return spawned
+
+    def snapshot(self, includeRng: bool = True) -> bytes:
+        """
+        Compact binary checkpoint of the whole game, see checkpoint.py for the layout
+        :param includeRng: also save the random number generator state so play continues identically
+        """
+        teams = {teamName: (teamName, team.score, []) for teamName, team in self.teams.items()}
+        for playerName, player in self.all_players.items():
+            teams[player.team.name][2].append((playerName, player.loc))
+        state = GameState(self.__height, self.__width, self.map.numCoins, self.ticks, self.coinRespawnInterval,
+                          self.__maxCoins, list(teams.values()), self.map.grid, self.map.freeCells,
+                          self.rng.getstate() if includeRng else None)
+        return checkpoint.encode(state)
+
+    def restore(self, data: bytes):
+        """
+        Rewinds or advances this game to a checkpoint taken from a game with the same teams and players
+        """
+        state = checkpoint.decode(data)
+        roster = {teamName: [playerName for playerName, _ in players] for teamName, _, players in state.teams}
+        if roster != {teamName: [name for name, player in self.all_players.items() if player.team is team]
+                      for teamName, team in self.teams.items()}:
+            raise ValueError('Checkpoint was taken from a game with different players')
+        self.__load(state)
+
+    @classmethod
+    def fromSnapshot(cls, data: bytes) -> 'Game':
+        """
+        New game from a checkpoint, e.g. to fork a running game
+        """
+        state = checkpoint.decode(data)
+        game = cls.__new__(cls)
+        playerNames = {teamName: [playerName for playerName, _ in players] for teamName, _, players in state.teams}
+        game.numTeams = len(playerNames)
+        game.teams, game.all_players = game.__initializePlayers(playerNames)
+        game.__height = state.height
+        game.__width = state.width
+        game.seed = None
+        game.rng = random.Random()
+        game.map = None
+        game.__load(state)
+        return game
+
+    def __load(self, state: GameState):
+        for teamName, score, players in state.teams:
+            self.teams[teamName].score = score
+            for playerName, loc in players:
+                self.all_players[playerName].loc = loc
+        players = list(self.all_players.values())
+        if self.map is None:
+            self.map = Map.fromGrid(state.grid, players, state.numCoins, state.freeCells, self.rng)
+        else:
+            self.map.load(state.grid, players, state.numCoins, state.freeCells)
+        self.ticks = state.ticks
+        self.coinRespawnInterval = state.coinRespawnInterval
+        self.__maxCoins = state.maxCoins
+        if state.rngState is not None:
+            self.rng.setstate(state.rngState)
+
     def gameOver(self):
         return self.map.numCoins <= 0
 
@@ -128,8 +377,7 @@ class Game:
 
 
 if __name__ == '__main__':
-    random.seed(1)
-    g = Game({'TeamA': ['Charles', 'Girish'], 'TeamB': ['James']})
+    g = Game({'TeamA': ['Charles', 'Girish'], 'TeamB': ['James']}, seed=1)
     print(g.map)
     print(g.getScores())
     multiMove = lambda name, moves: [g.movePlayer(name, move) for move in moves]
@@ -2,27 +2,36 @@
 Author: Charles Lee
 """
 
-from abc import abstractmethod
 
-class Wall:
-    pass
+class Flyweight:
+    """
+    Items without state: every call to the class returns the same shared instance
+    """
+    __slots__ = ()
 
-class Coin:
-    @abstractmethod
-    def value(self):
-        ...
+    def __new__(cls):
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+
+
+class Wall(Flyweight):
+    __slots__ = ()
+
+class Coin(Flyweight):
+    __slots__ = ()
+    value: int
 
 class Coin1(Coin):
-    @property
-    def value(self):
-        return 1
+    __slots__ = ()
+    value = 1
 
 class Coin2(Coin):
-    @property
-    def value(self):
-        return 2
+    __slots__ = ()
+    value = 2
 
 class Coin3(Coin):
-    @property
-    def value(self):
-        return 3
\ No newline at end of file
+    __slots__ = ()
+    value = 3
@@ -0,0 +1,242 @@
+"""
+Load generator: many lobbies of bot players against the real GameClient dispatch code
+
+    python loadgen.py --lobbies 200 --teams 2 --players 2 --duration 30
+    python loadgen.py --broker mqtt --no-server --lobbies 20     # against a server on the credentials.env broker
+
+Bots register through new_game, send START, and answer every game_state with a move from a
+strategies.py strategy. A lobby whose game ends is registered and started again. Reports
+move -> game_state latency percentiles, throughput and CPU time.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import threading
+import time
+from typing import Optional
+
+import GameClient
+import wireFormat
+from fakeBroker import FakeBroker
+from strategies import STRATEGIES
+
+
+class LoadStats:
+    def __init__(self):
+        # Only recorded while measuring, i.e. after the warmup
+        self.measuring = False
+        self.latencies: list[float] = []
+        self.moves = 0
+        self.states = 0
+        self.games = 0
+        self.bot_cpu = 0.0
+        # Bot hosts record from their own network threads
+        self.lock = threading.Lock()
+
+    def percentiles(self) -> dict:
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+
+        def at(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+        return {'p50_ms': at(0.5) * 1e3, 'p90_ms': at(0.9) * 1e3, 'p99_ms': at(0.99) * 1e3,
+                'max_ms': ordered[-1] * 1e3, 'mean_ms': statistics.fmean(ordered) * 1e3}
+
+
+class BotHost:
+    """
+    Plays every player of its lobbies over one MQTT connection, like PlayerClient2 does for TestLobby
+    """
+    def __init__(self, client, lobbies: dict[str, dict[str, list[str]]], strategy, wire_format: str, stats: LoadStats):
+        """
+        :param lobbies: {lobby_name: {team_name: [player_name, ...]}}
+        """
+        self.client = client
+        self.lobbies = lobbies
+        self.strategy = strategy
+        self.wire_format = wire_format
+        self.stats = stats
+        self.running = True
+        # (lobby, player) -> when its last move was sent
+        self.sent: dict[tuple[str, str], float] = {}
+        self.team_of = {(lobby_name, player_name): team_name for lobby_name, teams in lobbies.items()
+                        for team_name, players in teams.items() for player_name in players}
+        # (lobby, team) -> strategy, classes get a new instance per team for every game
+        self.strategies: dict[tuple[str, str], object] = {}
+        client.on_message = self.on_message
+
+    def start(self):
+        for lobby_name in self.lobbies:
+            self.client.subscribe(f'games/{lobby_name}/lobby')
+            self.client.subscribe(f'games/{lobby_name}/+/game_state')
+            self.join(lobby_name)
+
+    def join(self, lobby_name):
+        for team_name, players in self.lobbies[lobby_name].items():
+            # Boards are the server's default size
+            self.strategies[(lobby_name, team_name)] = self.strategy() if isinstance(self.strategy, type) else self.strategy
+            for player_name in players:
+                self.client.publish('new_game', json.dumps({'lobby_name': lobby_name, 'team_name': team_name,
+                                                            'player_name': player_name, 'format': self.wire_format}))
+        self.client.publish(f'games/{lobby_name}/start', 'START')
+
+    def on_message(self, client, userdata, msg):
+        received = time.perf_counter()
+        start_cpu = time.thread_time()
+        topic_list = msg.topic.split('/')
+        lobby_name = topic_list[1]
+        if topic_list[-1] == 'game_state':
+            self.play(lobby_name, topic_list[2], msg.payload, received)
+        elif topic_list[-1] == 'lobby' and msg.payload.startswith(b'Game Over'):
+            if self.stats.measuring:
+                with self.stats.lock:
+                    self.stats.games += 1
+            if self.running:
+                self.join(lobby_name)
+        if self.stats.measuring:
+            with self.stats.lock:
+                self.stats.bot_cpu += time.thread_time() - start_cpu
+
+    def play(self, lobby_name, player_name, payload, received):
+        sent = self.sent.pop((lobby_name, player_name), None)
+        if self.stats.measuring:
+            with self.stats.lock:
+                self.stats.states += 1
+                if sent is not None:
+                    self.stats.latencies.append(received - sent)
+        if not self.running:
+            return
+        if self.wire_format == wireFormat.PACKED:
+            game_state = wireFormat.decodeGameState(payload)
+        else:
+            game_state = json.loads(payload)
+        move = self.strategies[(lobby_name, self.team_of[(lobby_name, player_name)])](game_state)
+        # A bot boxed in by walls sits the tick out, the server's tick deadline moves the lobby on
+        if move is None:
+            return
+        self.sent[(lobby_name, player_name)] = time.perf_counter()
+        self.client.publish(f'games/{lobby_name}/{player_name}/move',
+                            wireFormat.encodeMove(move) if self.wire_format == wireFormat.PACKED else move)
+        if self.stats.measuring:
+            with self.stats.lock:
+                self.stats.moves += 1
+
+
+def make_lobbies(num_lobbies: int, num_teams: int, players_per_team: int, prefix: str) -> dict:
+    return {f'{prefix}{i}': {f'T{t}': [f'L{i}T{t}P{p}' for p in range(players_per_team)] for t in range(num_teams)}
+            for i in range(num_lobbies)}
+
+
+def dispatch_cpu(server) -> float:
+    return sum(cpu for _, _, cpu in GameClient.dispatch_totals(server).values())
+
+
+def run(args) -> dict:
+    if args.tick_timeout is not None:
+        os.environ['TICK_TIMEOUT'] = str(args.tick_timeout)
+
+    broker: Optional[FakeBroker] = None
+    if args.broker == 'fake':
+        broker = FakeBroker(maxQueue=args.max_queue)
+        connect = broker.client
+    else:
+        connect = GameClient.connect_client
+
+    server = None
+    if not args.no_server:
+        server = connect(f'{args.prefix}Server')
+        GameClient.setup_server(server)
+        server.loop_start()
+
+    stats = LoadStats()
+    lobbies = make_lobbies(args.lobbies, args.teams, args.players, args.prefix)
+    names = list(lobbies)
+    hosts = []
+    for i in range(args.bot_clients):
+        host_lobbies = {name: lobbies[name] for name in names[i::args.bot_clients]}
+        if host_lobbies:
+            hosts.append(BotHost(connect(f'{args.prefix}Bots{i}'), host_lobbies, STRATEGIES[args.strategy],
+                                 args.format, stats))
+    for host in hosts:
+        host.client.loop_start()
+        host.start()
+
+    time.sleep(args.warmup)
+    stats.measuring = True
+    start, start_cpu = time.perf_counter(), time.process_time()
+    start_server_cpu = dispatch_cpu(server) if server is not None else 0.0
+    time.sleep(args.duration)
+    stats.measuring = False
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    server_cpu = dispatch_cpu(server) - start_server_cpu if server is not None else None
+
+    for host in hosts:
+        host.running = False
+        host.client.loop_stop()
+        host.client.disconnect()
+    if server is not None:
+        server.loop_stop()
+        server.executor.shutdown()
+        if server.scheduler is not None:
+            server.scheduler.stop()
+
+    result = {
+        'lobbies': args.lobbies, 'players': args.lobbies * args.teams * args.players, 'seconds': elapsed,
+        'moves': stats.moves, 'game_states': stats.states, 'games_finished': stats.games,
+        'moves_per_sec': stats.moves / elapsed, 'game_states_per_sec': stats.states / elapsed,
+        'latency': stats.percentiles(),
+        'process_cpu_sec': cpu, 'server_dispatch_cpu_sec': server_cpu, 'bot_cpu_sec': stats.bot_cpu,
+    }
+    if broker is not None:
+        broker_stats = broker.stats()
+        result['broker'] = {'published': broker_stats['published'], 'delivered': broker_stats['delivered'],
+                            'dropped': broker_stats['dropped'],
+                            'max_queued': max(client['maxQueued'] for client in broker_stats['clients'].values())}
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drive GameClient with many bot players and measure it')
+    parser.add_argument('--lobbies', type=int, default=50)
+    parser.add_argument('--teams', type=int, default=2, help='teams per lobby')
+    parser.add_argument('--players', type=int, default=2, help='players per team')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to measure')
+    parser.add_argument('--warmup', type=float, default=1.0, help='seconds to run before measuring')
+    parser.add_argument('--strategy', choices=STRATEGIES.keys(), default='greedy')
+    parser.add_argument('--format', choices=wireFormat.FORMATS, default=wireFormat.JSON, help='game_state wire format')
+    parser.add_argument('--broker', choices=('fake', 'mqtt'), default='fake',
+                        help='in-process fake broker, or the broker in credentials.env')
+    parser.add_argument('--no-server', action='store_true', help='do not start a server, one is already running')
+    parser.add_argument('--bot-clients', type=int, default=4, help='MQTT connections the lobbies are spread over')
+    parser.add_argument('--tick-timeout', type=float, default=1.0,
+                        help='server TICK_TIMEOUT so lobbies with a stuck bot keep going')
+    parser.add_argument('--max-queue', type=int, default=100000, help='fake broker inbox size per client')
+    parser.add_argument('--prefix', default='Load', help='lobby name prefix')
+    parser.add_argument('--output', help='also write the result as JSON to this file')
+    args = parser.parse_args()
+
+    # GameClient prints every message and board, which is part of its cost but would bury the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = run(args)
+
+    latency = result['latency']
+    print(f"{result['lobbies']} lobbies, {result['players']} players, {result['seconds']:.1f}s measured")
+    print(f"{result['moves_per_sec']:.0f} moves/s, {result['game_states_per_sec']:.0f} game_states/s, "
+          f"{result['games_finished']} games finished")
+    if latency:
+        print(f"move -> game_state latency ms: p50 {latency['p50_ms']:.2f} p90 {latency['p90_ms']:.2f} "
+              f"p99 {latency['p99_ms']:.2f} max {latency['max_ms']:.2f}")
+    server_cpu = result['server_dispatch_cpu_sec']
+    print(f"CPU s: process {result['process_cpu_sec']:.2f}, "
+          f"server dispatch {'n/a' if server_cpu is None else f'{server_cpu:.2f}'}, bots {result['bot_cpu_sec']:.2f}")
+    if 'broker' in result:
+        print(f"broker: {result['broker']['delivered']} delivered, {result['broker']['dropped']} dropped, "
+              f"max inbox {result['broker']['max_queued']}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
@@ -0,0 +1,78 @@
+"""
+Runs server work off the network thread, one serialized queue per lobby
+"""
+
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class LobbyExecutor:
+    """
+    Messages of one lobby are handled one at a time in arrival order, different lobbies run on a thread pool.
+    A lobby with a long backlog gives up its thread after BATCH_SIZE messages so other lobbies get a turn.
+    """
+    BATCH_SIZE = 32
+
+    def __init__(self, handler: Callable, max_workers: int = 4, batchSize: int = BATCH_SIZE):
+        """
+        :param handler: called with the arguments given to submit
+        """
+        assert isinstance(batchSize, int) and batchSize > 0
+        self.__handler = handler
+        self.__batchSize = batchSize
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lobby')
+        self.__lock = threading.Lock()
+        # Only lobbies with queued or running work have an entry
+        self.__queues: dict[str, deque] = {}
+        self.__pending = 0
+
+    @property
+    def pending(self) -> int:
+        """
+        Messages waiting across all lobbies, not counting ones being handled
+        """
+        return self.__pending
+
+    @property
+    def activeLobbies(self) -> int:
+        return len(self.__queues)
+
+    def submit(self, lobby: str, *args):
+        """
+        Queues handler(*args) behind the lobby's earlier messages; cheap enough for the network thread
+        """
+        with self.__lock:
+            queue = self.__queues.get(lobby)
+            schedule = queue is None
+            if schedule:
+                queue = self.__queues[lobby] = deque()
+            queue.append(args)
+            self.__pending += 1
+        if schedule:
+            self.__pool.submit(self.__drain, lobby)
+
+    def __drain(self, lobby: str):
+        for _ in range(self.__batchSize):
+            with self.__lock:
+                queue = self.__queues[lobby]
+                if not queue:
+                    del self.__queues[lobby]
+                    return
+                args = queue.popleft()
+                self.__pending -= 1
+            try:
+                self.__handler(*args)
+            except Exception:
+                traceback.print_exc()
+        # Back of the line, behind lobbies that are already waiting
+        try:
+            self.__pool.submit(self.__drain, lobby)
+        except RuntimeError:
+            # Shut down while this lobby still had a backlog, which is dropped
+            pass
+
+    def shutdown(self, wait: bool = True):
+        self.__pool.shutdown(wait=wait)
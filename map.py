@@ -2,11 +2,46 @@
 Author: Charles Lee
 """
 
-from copy import deepcopy
 from player import Player
 import random
 from gameItems import *
 from typing import Optional
+import numpy as np
+from cellIndex import FreeCellIndex, SpatialIndex
+
+# Cell codes stored in the grid layer
+EMPTY = 0
+WALL = 1
+COIN1 = 2
+COIN2 = 3
+COIN3 = 4
+PLAYER = 5
+
+# Value stored in the player layer for cells without a player
+NO_PLAYER = -1
+
+CODE_TO_ITEM = {WALL: Wall, COIN1: Coin1, COIN2: Coin2, COIN3: Coin3}
+ITEM_TO_CODE = {item: code for code, item in CODE_TO_ITEM.items()}
+# Items are flyweights, so these are the only instances there are
+CODE_TO_INSTANCE = {code: item() for code, item in CODE_TO_ITEM.items()}
+
+
+def formatBoard(grid: np.ndarray, playerGrid: np.ndarray, players: list[Player]) -> str:
+    result = []
+    for x, row in enumerate(grid.tolist()):
+        row_str = []
+        for y, code in enumerate(row):
+            if code == EMPTY:
+                cellName = 'None'
+            elif code == PLAYER:
+                cellName = players[playerGrid[x, y]].name
+            else:
+                cellName = CODE_TO_ITEM[code].__name__
+            row_str.append(cellName)
+        result.append('\t'.join(row_str))
+
+    return '\n'.join(result)
+
 
 def getDefaultWallChoices():
     wall = []
@@ -26,30 +61,153 @@ class Map:
     WALL_MIN_RATIO = 0.1
     WALL_MAX_RATIO = 0.3
 
-    def __init__(self, height: int, width: int, playersList: list[Player], wallChoices: list[tuple[int]] = None):
+    def __init__(self, height: int, width: int, playersList: list[Player], wallChoices: list[tuple[int]] = None,
+                 rng: Optional[random.Random] = None):
+        """
+        :param rng: the only source of randomness this map uses, a new one seeded from the random module if None
+        """
         assert isinstance(width, int) and isinstance(height, int)
         assert isinstance(playersList, list)
         self.__height = height
         self.__width = width
-        self.__map: list[list[object]] = [[None for _ in range(width)] for _ in range(height)]
+        self.__rng = random.Random(random.getrandbits(32)) if rng is None else rng
+        self.__clear()
 
         self.__numCoins = 0
+        # Bumped on every board change so holders of a snapshot can tell whether it is stale
+        self.__version = 0
 
         self.wallChoices = getDefaultWallChoices() if wallChoices is None else wallChoices
 
         self.__fillMap(playersList)
 
+    @classmethod
+    def fromGrid(cls, grid: np.ndarray, players: list[Player], numCoins: int,
+                 freeCells: Optional[np.ndarray] = None, rng: Optional[random.Random] = None) -> 'Map':
+        """
+        Builds a map from a saved cell code layer instead of filling it randomly
+        :param players: every player on the board, with loc set
+        """
+        newMap = cls.__new__(cls)
+        newMap.__height, newMap.__width = grid.shape
+        newMap.__version = 0
+        newMap.__rng = random.Random() if rng is None else rng
+        newMap.wallChoices = getDefaultWallChoices()
+        newMap.load(grid, players, numCoins, freeCells)
+        return newMap
+
+    def __clear(self):
+        # The board is two layers: cell codes and the id of the player standing on each cell
+        self.__grid = np.zeros((self.__height, self.__width), dtype=np.int8)
+        self.__playerGrid = np.full((self.__height, self.__width), NO_PLAYER, dtype=np.int16)
+        self.__viewLayers()
+        self.__free = FreeCellIndex(self.__height, self.__width, full=True)
+        # Spatial indexes by the codes tuple given to nearest, only built once it is asked for
+        self.__indexes: dict[tuple[int, ...], SpatialIndex] = {}
+        self.__players: list[Player] = []
+        self.__playerIds: dict[str, int] = {}
+        # True while a snapshot shares the layers, the next write copies them first
+        self.__shared = False
+        # Cells written since the last takeDirty, None when the whole board counts as changed
+        self.__dirty: Optional[list[tuple[int, int]]] = None
+
+    def load(self, grid: np.ndarray, players: list[Player], numCoins: int, freeCells: Optional[np.ndarray] = None):
+        """
+        Replaces the whole board with a saved cell code layer, rebuilding the player layer and indexes
+        :param players: every player on the board, with loc set; their order fixes the player ids
+        :param freeCells: saved freeCells order, without it later random placements differ from the original
+        """
+        assert grid.shape == (self.__height, self.__width)
+        self.__clear()
+        self.__grid[:] = grid
+        for player in players:
+            self.__playerGrid[player.loc] = self.__playerId(player)
+        if freeCells is None:
+            self.__free = FreeCellIndex.fromMask(self.__grid == EMPTY)
+        else:
+            self.__free = FreeCellIndex.fromCells(self.__height, self.__width, freeCells)
+        self.__numCoins = numCoins
+        self.__version += 1
+
 
     @property
     def numCoins(self):
         return self.__numCoins
-    
+
     def decreaseCoin(self):
         self.__numCoins -= 1
+        self.__version += 1
+
+    @property
+    def numFree(self) -> int:
+        return len(self.__free)
 
     @property
-    def map(self):
-        return deepcopy(self.__map)
+    def freeCells(self) -> np.ndarray:
+        """
+        Flat indexes (x*width + y) of the empty cells in the order random placement samples them from
+        """
+        return self.__free.cells
+
+    def spawnCoin(self) -> tuple[int, int]:
+        """
+        Drops a random coin into a random free cell
+        :return: location of the new coin
+        """
+        coin = CODE_TO_INSTANCE[self.__rng.choices((COIN1, COIN2, COIN3), (6,3,1))[0]]
+        loc = self.__placeRandom(coin)
+        self.__numCoins += 1
+        return loc
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    def takeDirty(self) -> Optional[list[tuple[int, int]]]:
+        """
+        Cells written since the previous call, possibly with repeats, and starts a new list
+        :return: None if the board was built or replaced since, i.e. every cell may have changed
+        """
+        dirty = self.__dirty
+        self.__dirty = []
+        return dirty
+
+    @property
+    def map(self) -> 'MapSnapshot':
+        return self.snapshot()
+
+    def snapshot(self) -> 'MapSnapshot':
+        """
+        O(1) read-only copy of the board. The layers are shared with the map until its next write,
+        which copies them (copy-on-write), so the snapshot stays valid while the game keeps moving.
+        """
+        self.__shared = True
+        return MapSnapshot(self.__grid, self.__playerGrid, self.__players, self.__numCoins, self.__version)
+
+    @property
+    def grid(self) -> np.ndarray:
+        """
+        Read-only view of the cell code layer
+        """
+        view = self.__grid.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def playerGrid(self) -> np.ndarray:
+        """
+        Read-only view of the player id layer, NO_PLAYER where no player stands
+        """
+        view = self.__playerGrid.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def players(self) -> list[Player]:
+        """
+        Players indexed by the ids stored in playerGrid
+        """
+        return list(self.__players)
 
     @property
     def height(self):
@@ -60,46 +218,156 @@ class Map:
         return self.__width
 
     def __repr__(self):
-        result = []
-        for row in self.__map:
-            row_str = []
-            for cell in row:
-                if cell is None:
-                    cellName = 'None'
-                elif isinstance(cell, Player):
-                    cellName = cell.name
-                else:
-                    cellName = cell.__class__.__name__
-                row_str.append(cellName)
-            result.append('\t'.join(row_str))
-
-        output = '\n'.join(result)
-
-        return output
+        return formatBoard(self.__grid, self.__playerGrid, self.__players)
 
     def set(self, loc: tuple[int, int], item: object):
         assert isinstance(loc, tuple) and len(loc) == 2 and isinstance(loc[0], int) and isinstance(loc[1], int)
-        self.__map[loc[0]][loc[1]] = item
+        if self.__shared:
+            self.__grid = self.__grid.copy()
+            self.__playerGrid = self.__playerGrid.copy()
+            self.__viewLayers()
+            self.__shared = False
+        self.__version += 1
+        if self.__dirty is not None:
+            self.__dirty.append(loc)
+            # Nobody is taking them, stop growing once it says no more than "everything"
+            if len(self.__dirty) > self.__height * self.__width:
+                self.__dirty = None
+        if self.__indexes:
+            oldCode = self.__cells[loc]
+            for index in self.__indexes.values():
+                if oldCode in index.codes:
+                    index.remove(loc)
+        if item is None:
+            self.__cells[loc] = EMPTY
+            self.__playerCells[loc] = NO_PLAYER
+            self.__free.add(loc)
+            return
+        self.__free.remove(loc)
+        if isinstance(item, Player):
+            code = PLAYER
+            self.__playerCells[loc] = self.__playerId(item)
+        else:
+            code = ITEM_TO_CODE[type(item)]
+            self.__playerCells[loc] = NO_PLAYER
+        self.__cells[loc] = code
+        for index in self.__indexes.values():
+            if code in index.codes:
+                index.add(loc)
+
+    def move(self, loc: tuple[int, int], newLoc: tuple[int, int]):
+        """
+        Moves the player at loc onto newLoc, which must hold no player or wall. Same as set(loc, None)
+        followed by set(newLoc, player), but counts as one write.
+        """
+        assert isinstance(newLoc, tuple) and len(newLoc) == 2 and isinstance(newLoc[0], int) and isinstance(newLoc[1], int)
+        assert self.__cells[loc] == PLAYER
+        if self.__shared:
+            self.__grid = self.__grid.copy()
+            self.__playerGrid = self.__playerGrid.copy()
+            self.__viewLayers()
+            self.__shared = False
+        self.__version += 1
+        if self.__dirty is not None:
+            self.__dirty += (loc, newLoc)
+            if len(self.__dirty) > self.__height * self.__width:
+                self.__dirty = None
+        if self.__indexes:
+            oldCode = self.__cells[newLoc]
+            for index in self.__indexes.values():
+                codes = index.codes
+                if PLAYER in codes:
+                    index.remove(loc)
+                if EMPTY in codes:
+                    index.add(loc)
+                if oldCode in codes:
+                    index.remove(newLoc)
+                if PLAYER in codes:
+                    index.add(newLoc)
+        # Same free-cell order as the two set calls, so coin respawns sample the same cells
+        self.__free.add(loc)
+        self.__free.remove(newLoc)
+        playerCells = self.__playerCells
+        playerCells[newLoc] = playerCells[loc]
+        playerCells[loc] = NO_PLAYER
+        self.__cells[loc] = EMPTY
+        self.__cells[newLoc] = PLAYER
+
+    def locations(self, code: int) -> list[tuple[int, int]]:
+        """
+        Every location holding the given cell code, in row-major order
+        """
+        xs, ys = np.nonzero(self.__grid == code)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def inRange(self, code: int, center: tuple[int, int], radius: int) -> list[tuple[int, int]]:
+        """
+        Locations of the given cell code inside the square window of radius around center, row-major
+        """
+        cx, cy = center
+        top, left = max(cx - radius, 0), max(cy - radius, 0)
+        rows = self.__grid[top:cx + radius + 1, left:cy + radius + 1].tolist()
+        return [(top + i, left + j) for i, row in enumerate(rows) for j, cell in enumerate(row) if cell == code]
+
+    def nearest(self, codes: tuple[int, ...], loc: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """
+        Closest location by Manhattan distance holding any of the given cell codes, None if there is none
+        """
+        index = self.__indexes.get(codes)
+        if index is None:
+            index = self.__indexes[codes] = SpatialIndex(self.__grid, codes)
+        return index.nearest(self.__grid, loc)
 
     def get(self, loc: tuple[int, int]):
         assert isinstance(loc, tuple) and len(loc) == 2 and isinstance(loc[0], int) and isinstance(loc[1], int)
-        return self.__map[loc[0]][loc[1]]
+        return self.__item(loc)
+
+    def getCode(self, loc: tuple[int, int]) -> int:
+        """
+        Cell code at loc, cheaper than get when the item itself is not needed
+        """
+        return self.__cells[loc]
+
+    def __item(self, loc: tuple[int, int]):
+        code = self.__cells[loc]
+        if code == EMPTY:
+            return None
+        if code == PLAYER:
+            return self.__players[self.__playerCells[loc]]
+        return CODE_TO_INSTANCE[code]
+
+    def __viewLayers(self):
+        # Indexing a memoryview with an (x, y) tuple reads and writes plain ints,
+        # several times faster than numpy scalar indexing for one cell at a time
+        self.__cells = memoryview(self.__grid)
+        self.__playerCells = memoryview(self.__playerGrid)
+
+    def __playerId(self, player: Player) -> int:
+        playerId = self.__playerIds.get(player.name)
+        if playerId is None:
+            playerId = len(self.__players)
+            self.__players.append(player)
+            self.__playerIds[player.name] = playerId
+        return playerId
 
     def __fillMap(self, players: list[Player]):
         assert isinstance(players, list)
 
         empty = self.__width*self.__height
 
+        # Drop duplicate and off-board choices so every pick can actually be placed
+        wallChoices = [loc for loc in dict.fromkeys(self.wallChoices)
+                       if 0 <= loc[0] < self.__height and 0 <= loc[1] < self.__width]
+
         maxWalls = int(Map.WALL_MAX_RATIO * empty)
-        maxWalls = maxWalls if self.wallChoices is None else len(self.wallChoices)
+        maxWalls = maxWalls if self.wallChoices is None else len(wallChoices)
 
         minWalls = int(Map.WALL_MIN_RATIO * empty)
         minWalls = 0 if maxWalls < minWalls else minWalls
 
-        numWalls = random.randint(minWalls, maxWalls)
-        wallChoices = deepcopy(self.wallChoices)
+        numWalls = self.__rng.randint(minWalls, maxWalls)
         for _ in range(numWalls):
-            self.__placeRandom(Wall(), wallChoices)
+            self.__placeRandom(CODE_TO_INSTANCE[WALL], wallChoices)
 
         # Fill players
         for player in players:
@@ -108,24 +376,85 @@ class Map:
         numPlayers = len(players)
         empty = empty - numWalls - numPlayers
 
-        self.__numCoins = random.randint(int(Map.COIN_MIN_RATIO * empty), int(Map.COIN_MAX_RATIO * empty))
+        self.__numCoins = self.__rng.randint(int(Map.COIN_MIN_RATIO * empty), int(Map.COIN_MAX_RATIO * empty))
         for _ in range(self.__numCoins):
-            coin = random.choices((Coin1, Coin2, Coin3), (6,3,1))[0]()
+            coin = CODE_TO_INSTANCE[self.__rng.choices((COIN1, COIN2, COIN3), (6,3,1))[0]]
             self.__placeRandom(coin)
 
     def __placeRandom(self, obj, choice: Optional[list] = None):
         while True:
             if choice is None:
-                x, y = random.randint(0, self.__height - 1), random.randint(0, self.__width - 1)
+                x, y = self.__free.sample(self.__rng)
             else:
-                x, y = random.choice(choice)
-                choice.remove((x,y))
-            if self.__map[x][y] is None:
-                self.__map[x][y] = obj
+                # Swap the pick to the end so it can be popped in O(1)
+                i = self.__rng.randrange(len(choice))
+                choice[i], choice[-1] = choice[-1], choice[i]
+                x, y = choice.pop()
+            if self.__grid[x, y] == EMPTY:
+                self.set((x, y), obj)
                 return x, y
 
 
+class MapSnapshot:
+    """
+    Frozen view of a Map at one version. Indexing works like the old list of lists: snapshot[x][y]
+    """
+    def __init__(self, grid: np.ndarray, playerGrid: np.ndarray, players: list[Player], numCoins: int, version: int):
+        self.__grid = grid.view()
+        self.__grid.flags.writeable = False
+        self.__playerGrid = playerGrid.view()
+        self.__playerGrid.flags.writeable = False
+        # Players are only ever appended, so ids taken now stay valid in the shared list
+        self.__players = players
+        self.__numCoins = numCoins
+        self.__version = version
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def numCoins(self) -> int:
+        return self.__numCoins
+
+    @property
+    def grid(self) -> np.ndarray:
+        return self.__grid
+
+    @property
+    def playerGrid(self) -> np.ndarray:
+        return self.__playerGrid
+
+    @property
+    def height(self) -> int:
+        return self.__grid.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.__grid.shape[1]
+
+    def get(self, loc: tuple[int, int]):
+        code = self.__grid[loc[0], loc[1]]
+        if code == EMPTY:
+            return None
+        if code == PLAYER:
+            return self.__players[self.__playerGrid[loc[0], loc[1]]]
+        return CODE_TO_INSTANCE[code]
+
+    def __getitem__(self, x: int) -> list:
+        return [self.get((x, y)) for y in range(self.width)]
+
+    def __iter__(self):
+        return (self[x] for x in range(self.height))
+
+    def __len__(self):
+        return self.height
+
+    def __repr__(self):
+        return formatBoard(self.__grid, self.__playerGrid, self.__players)
+
+
 if __name__ == '__main__':
     m = Map(10, 10, [Player('Charles', None), Player('James', None)])
     print(m)
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,273 @@
+"""
+Minimal metrics registry with Prometheus text exposition over HTTP and to a file
+
+    registry = Registry()
+    messages = registry.counter('messages_total', 'Messages received', ('route',))
+    messages.inc('move')
+    registry.serve(9100)   # GET http://localhost:9100/metrics
+    registry.dump('metrics.prom')
+"""
+
+import bisect
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+# Seconds, from a tenth of a millisecond to a few seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, help: str, labelNames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelNames = tuple(labelNames)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """
+        (name suffix, label string, value) for every series
+        """
+        ...
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.TYPE}']
+        lines.extend(f'{self.name}{suffix}{labels} {_number(value)}' for suffix, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def __init__(self, name: str, help: str, labelNames: tuple = ()):
+        super().__init__(name, help, labelNames)
+        self.__values: dict[tuple, float] = {}
+
+    def inc(self, *labelValues, amount: float = 1):
+        assert len(labelValues) == len(self.labelNames)
+        with self._lock:
+            self.__values[labelValues] = self.__values.get(labelValues, 0) + amount
+
+    def value(self, *labelValues) -> float:
+        return self.__values.get(labelValues, 0)
+
+    def remove(self, *labelValues):
+        """
+        Drops a series, e.g. the counters of a lobby that closed
+        """
+        with self._lock:
+            self.__values.pop(labelValues, None)
+
+    def samples(self):
+        with self._lock:
+            values = list(self.__values.items())
+        for labelValues, value in values:
+            yield '', _labels(self.labelNames, labelValues), value
+
+
+class Gauge(Metric):
+    """
+    Read when rendered: function returns a number, or {labelValues tuple: number} for labelled gauges
+    """
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, help: str, function: Callable, labelNames: tuple = ()):
+        super().__init__(name, help, labelNames)
+        self.__function = function
+
+    def samples(self):
+        value = self.__function()
+        if not self.labelNames:
+            yield '', '', value
+            return
+        for labelValues, labelledValue in value.items():
+            yield '', _labels(self.labelNames, labelValues), labelledValue
+
+
+class Histogram(Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, help: str, labelNames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelNames)
+        assert list(buckets) == sorted(buckets)
+        self.buckets = tuple(buckets)
+        # labelValues -> [per bucket counts with a last +Inf bucket, sum]
+        self.__series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelValues):
+        assert len(labelValues) == len(self.labelNames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.__series.get(labelValues)
+            if series is None:
+                series = self.__series[labelValues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, *labelValues) -> int:
+        series = self.__series.get(labelValues)
+        return sum(series[0]) if series else 0
+
+    def sum(self, *labelValues) -> float:
+        series = self.__series.get(labelValues)
+        return series[1] if series else 0.0
+
+    def labelValues(self) -> list[tuple]:
+        return list(self.__series)
+
+    def samples(self):
+        with self._lock:
+            series = [(labelValues, list(counts), total) for labelValues, (counts, total) in self.__series.items()]
+        for labelValues, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', _labels(self.labelNames, labelValues, f'le="{_number(float(bound))}"'), cumulative
+            yield '_sum', _labels(self.labelNames, labelValues), total
+            yield '_count', _labels(self.labelNames, labelValues), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.__metrics: list[Metric] = []
+        self.__server: Optional[ThreadingHTTPServer] = None
+
+    def register(self, metric: Metric) -> Metric:
+        assert all(existing.name != metric.name for existing in self.__metrics)
+        self.__metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelNames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labelNames))
+
+    def gauge(self, name: str, help: str, function: Callable, labelNames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, help, function, labelNames))
+
+    def histogram(self, name: str, help: str, labelNames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelNames, buckets))
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format
+        """
+        return ''.join(metric.render() + '\n' for metric in self.__metrics)
+
+    def dump(self, path: str):
+        """
+        Writes render() to path, replacing it atomically so a reader never sees half a dump
+        """
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as file:
+            file.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """
+        Serves render() at http://host:port/metrics from a daemon thread
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        self.__server.daemon_threads = True
+        threading.Thread(target=self.__server.serve_forever, name='metrics-http', daemon=True).start()
+        return self.__server
+
+    def dumpEvery(self, path: str, interval: float):
+        """
+        Dumps to path every interval seconds from a daemon thread
+        """
+        assert interval > 0
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.dump(path)
+
+        threading.Thread(target=run, name='metrics-dump', daemon=True).start()
+        return stop
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+
+def estimateSize(obj, seen: Optional[set] = None) -> int:
+    """
+    Rough deep size in bytes of obj: sys.getsizeof of everything reachable through containers,
+    instance attributes and slots, with NumPy arrays counted by their buffers. Shared objects count once.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, type):
+            continue
+        seen.add(id(current))
+        if isinstance(current, np.ndarray):
+            # Includes the buffer when the array owns it, a view leads on to the array that does
+            size += sys.getsizeof(current)
+            if current.base is not None:
+                stack.append(current.base)
+            continue
+        size += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool)) or current is None:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            stack.extend(getattr(current, '__dict__', {}).values())
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    # Private slot names are stored mangled
+                    if slot.startswith('__') and not slot.endswith('__'):
+                        slot = f'_{cls.__name__.lstrip("_")}{slot}'
+                    value = getattr(current, slot, None)
+                    if value is not None:
+                        stack.append(value)
+    return size
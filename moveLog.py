@@ -0,0 +1,213 @@
+"""
+Append-only per-lobby move log and deterministic replay
+
+A log is a sequence of records: record type (uint8), payload length (uint32), payload.
+    HEADER    JSON {'lobby', 'seed', 'teams', 'snapshotInterval'}, always first
+    SNAPSHOT  tick (uint32) + Game.snapshot() bytes, written at tick 0 and every snapshotInterval ticks
+    MOVES     tick (uint32) + per move: player index in roster order (uint16), move index in Moveset (uint8)
+    END       empty, written when the lobby closes the log
+The moves of tick t take the game from t to t+1 ticks.
+"""
+
+import atexit
+import bisect
+import json
+import queue
+import struct
+import threading
+import traceback
+from typing import BinaryIO, Optional
+
+from game import Game
+from moveset import MOVE_INDEX, MOVES_BY_INDEX, Moveset
+
+HEADER = 1
+SNAPSHOT = 2
+MOVES = 3
+END = 4
+
+RECORD = struct.Struct('<BI')
+TICK = struct.Struct('<I')
+MOVE = struct.Struct('<HB')
+
+
+class LogWriter:
+    """
+    Background thread that does the file writes for every MoveLog, so the game loop only appends to memory
+    """
+    def __init__(self):
+        self.__queue: queue.Queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__run, name='move-log-writer', daemon=True)
+        self.__thread.start()
+
+    def write(self, file: BinaryIO, data: bytes, close: bool = False):
+        self.__queue.put((file, data, close))
+
+    def join(self):
+        """
+        Blocks until everything queued so far is on disk
+        """
+        self.__queue.join()
+
+    def __run(self):
+        while True:
+            file, data, close = self.__queue.get()
+            try:
+                if data:
+                    file.write(data)
+                file.flush()
+            except Exception:
+                # One broken log must not stop the others, or the join at exit would wait forever
+                traceback.print_exc()
+            finally:
+                try:
+                    if close:
+                        file.close()
+                except Exception:
+                    traceback.print_exc()
+                self.__queue.task_done()
+
+
+_defaultWriter: Optional[LogWriter] = None
+
+
+def defaultWriter() -> LogWriter:
+    global _defaultWriter
+    if _defaultWriter is None:
+        _defaultWriter = LogWriter()
+        atexit.register(_defaultWriter.join)
+    return _defaultWriter
+
+
+class MoveLog:
+    SNAPSHOT_INTERVAL = 100
+    # Buffered bytes handed to the writer thread at once
+    FLUSH_SIZE = 64 * 1024
+    # Ticks between flushes, bounding what a crash loses; snapshots are flushed right away
+    FLUSH_INTERVAL = 10
+
+    def __init__(self, path: str, lobby: str, game: Game, seed: Optional[int] = None,
+                 snapshotInterval: int = SNAPSHOT_INTERVAL, writer: Optional[LogWriter] = None,
+                 flushInterval: int = FLUSH_INTERVAL):
+        """
+        Opens a new log and records the header and the starting state of game
+        """
+        assert isinstance(snapshotInterval, int) and snapshotInterval > 0
+        assert isinstance(flushInterval, int) and flushInterval > 0
+        self.snapshotInterval = snapshotInterval
+        self.flushInterval = flushInterval
+        self.__writer = defaultWriter() if writer is None else writer
+        self.__file = open(path, 'wb')
+        self.__buffer = bytearray()
+        self.__playerIndex = {name: i for i, name in enumerate(game.all_players)}
+
+        teams = {teamName: [name for name, player in game.all_players.items() if player.team is team]
+                 for teamName, team in game.teams.items()}
+        header = {'lobby': lobby, 'seed': seed, 'teams': teams, 'snapshotInterval': snapshotInterval}
+        self.__record(HEADER, json.dumps(header).encode())
+        self.logSnapshot(game)
+
+    def __record(self, recordType: int, payload: bytes):
+        self.__buffer += RECORD.pack(recordType, len(payload))
+        self.__buffer += payload
+        if len(self.__buffer) >= MoveLog.FLUSH_SIZE:
+            self.flush()
+
+    def logMoves(self, tick: int, moves: dict[str, Moveset]):
+        """
+        Records the moves applied to go from tick to tick+1
+        """
+        payload = bytearray(TICK.pack(tick))
+        for playerName, move in moves.items():
+            payload += MOVE.pack(self.__playerIndex[playerName], MOVE_INDEX[move])
+        self.__record(MOVES, bytes(payload))
+
+    def logSnapshot(self, game: Game):
+        self.__record(SNAPSHOT, TICK.pack(game.ticks) + game.snapshot())
+        self.flush()
+
+    def endTick(self, game: Game):
+        """
+        Call after the game finished a tick, embeds a snapshot every snapshotInterval ticks and hands
+        the buffer to the writer every flushInterval ticks
+        """
+        if game.ticks % self.snapshotInterval == 0:
+            self.logSnapshot(game)
+        elif game.ticks % self.flushInterval == 0:
+            self.flush()
+
+    def flush(self):
+        if self.__buffer:
+            self.__writer.write(self.__file, bytes(self.__buffer))
+            self.__buffer.clear()
+
+    def close(self):
+        self.__record(END, b'')
+        self.__writer.write(self.__file, bytes(self.__buffer), close=True)
+        self.__buffer.clear()
+
+
+class Replay:
+    """
+    Reads a move log and rebuilds the game at any tick from the closest snapshot before it
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            data = file.read()
+        self.header: dict = {}
+        self.__snapshots: list[tuple[int, bytes]] = []
+        self.__moves: dict[int, list[tuple[int, int]]] = {}
+        self.complete = False
+
+        view = memoryview(data)
+        offset = 0
+        # A log cut short by a crash ends in a partial record, which is ignored
+        while offset + RECORD.size <= len(data):
+            recordType, length = RECORD.unpack_from(view, offset)
+            offset += RECORD.size
+            if offset + length > len(data):
+                break
+            payload = view[offset:offset + length]
+            offset += length
+            if recordType == HEADER:
+                self.header = json.loads(bytes(payload))
+            elif recordType == SNAPSHOT:
+                tick, = TICK.unpack_from(payload, 0)
+                self.__snapshots.append((tick, bytes(payload[TICK.size:])))
+            elif recordType == MOVES:
+                tick, = TICK.unpack_from(payload, 0)
+                self.__moves[tick] = list(MOVE.iter_unpack(payload[TICK.size:]))
+            elif recordType == END:
+                self.complete = True
+
+        if not self.header or not self.__snapshots:
+            raise ValueError(f'{path} is not a move log')
+        self.players = [name for names in self.header['teams'].values() for name in names]
+
+    @property
+    def lastTick(self) -> int:
+        """
+        Latest tick the log has enough information to rebuild
+        """
+        tick = self.__snapshots[-1][0]
+        while tick in self.__moves:
+            tick += 1
+        return tick
+
+    def moves(self, tick: int) -> dict[str, Moveset]:
+        return {self.players[player]: MOVES_BY_INDEX[move] for player, move in self.__moves.get(tick, ())}
+
+    def gameAt(self, tick: int) -> Game:
+        """
+        The game as it was after tick ticks
+        """
+        if not 0 <= tick <= self.lastTick:
+            raise ValueError(f'Tick {tick} is not in this log (0 to {self.lastTick})')
+        # Snapshots are logged in tick order
+        i = bisect.bisect_right(self.__snapshots, tick, key=lambda snapshot: snapshot[0]) - 1
+        start, data = self.__snapshots[i]
+        game = Game.fromSnapshot(data)
+        for t in range(start, tick):
+            game.applyMoves(self.moves(t))
+            game.endTick()
+        return game
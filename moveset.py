@@ -9,4 +9,9 @@ class Moveset(Enum):
     UP = (-1, 0)
     DOWN = (1, 0)
     LEFT = (0, -1)
-    RIGHT = (0, 1)
\ No newline at end of file
+    RIGHT = (0, 1)
+
+
+# Moves by their index in Moveset order, the one byte form used by the binary formats
+MOVES_BY_INDEX = list(Moveset)
+MOVE_INDEX = {move: i for i, move in enumerate(MOVES_BY_INDEX)}
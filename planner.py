@@ -0,0 +1,191 @@
+"""
+Wall-aware path planning for bots
+
+Walls never move, so the BFS distance field towards a target stays valid until a wall is discovered
+that the field could reach. Fields are cached per target and only the ones a new wall touches are
+dropped; everything else is reused tick after tick. Cells a bot has not seen count as open.
+"""
+
+import heapq
+from collections import OrderedDict, deque
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Moves in Moveset order with their (dx, dy)
+MOVES = (('UP', -1, 0), ('DOWN', 1, 0), ('LEFT', 0, -1), ('RIGHT', 0, 1))
+UNREACHABLE = -1
+
+
+class Planner:
+    # Distance fields kept, least recently used ones are dropped first
+    MAX_FIELDS = 256
+
+    def __init__(self, height: int = 10, width: int = 10, maxFields: int = MAX_FIELDS):
+        """
+        :param height: board size, cells outside it are treated as walls
+        """
+        assert isinstance(height, int) and isinstance(width, int) and height > 0 and width > 0
+        self.height = height
+        self.width = width
+        self.maxFields = maxFields
+        self.__walls = np.zeros(height * width, dtype=bool)
+        # Flat index -> [(move name, flat index of the cell it leads to), ...] for moves staying on the board
+        self.__neighbors: list[list[tuple[str, int]]] = [
+            [(name, (x + dx) * width + y + dy) for name, dx, dy in MOVES if 0 <= x + dx < height and 0 <= y + dy < width]
+            for x in range(height) for y in range(width)]
+        # Flat target index -> distance of every cell to it, UNREACHABLE through known walls
+        self.__fields: OrderedDict[int, np.ndarray] = OrderedDict()
+
+    @property
+    def walls(self) -> np.ndarray:
+        """
+        Read-only view of the known walls
+        """
+        view = self.__walls.reshape(self.height, self.width)
+        view.flags.writeable = False
+        return view
+
+    @property
+    def cachedFields(self) -> int:
+        return len(self.__fields)
+
+    def __index(self, loc) -> Optional[int]:
+        x, y = loc
+        if 0 <= x < self.height and 0 <= y < self.width:
+            return x * self.width + y
+        return None
+
+    def addWalls(self, locs: Iterable) -> int:
+        """
+        Records walls, dropping the cached fields in which any new one was reachable
+        :return: number of walls that were not known yet
+        """
+        new = [i for i in (self.__index(loc) for loc in locs) if i is not None and not self.__walls[i]]
+        if not new:
+            return 0
+        new = np.unique(new)
+        self.__walls[new] = True
+        # A wall the field never reached cannot be on any of its paths
+        stale = [target for target, field in self.__fields.items() if (field[new] != UNREACHABLE).any()]
+        for target in stale:
+            del self.__fields[target]
+        return len(new)
+
+    def isOpen(self, loc) -> bool:
+        i = self.__index(loc)
+        return i is not None and not self.__walls[i]
+
+    def __field(self, target: int) -> np.ndarray:
+        field = self.__fields.get(target)
+        if field is not None:
+            self.__fields.move_to_end(target)
+            return field
+        # Plain lists, element access on NumPy arrays is slow in a Python loop
+        distances = [UNREACHABLE] * (self.height * self.width)
+        walls = self.__walls.tolist()
+        if not walls[target]:
+            distances[target] = 0
+            queue = deque((target,))
+            neighbors = self.__neighbors
+            while queue:
+                cell = queue.popleft()
+                distance = distances[cell] + 1
+                for _, neighbor in neighbors[cell]:
+                    if distances[neighbor] == UNREACHABLE and not walls[neighbor]:
+                        distances[neighbor] = distance
+                        queue.append(neighbor)
+        field = np.array(distances, dtype=np.int32)
+        self.__fields[target] = field
+        if len(self.__fields) > self.maxFields:
+            self.__fields.popitem(last=False)
+        return field
+
+    def distances(self, target) -> np.ndarray:
+        """
+        Steps from every cell to target around the known walls, UNREACHABLE where there is no way
+        """
+        i = self.__index(target)
+        assert i is not None, f'{target} is off the board'
+        view = self.__field(i).reshape(self.height, self.width)
+        view.flags.writeable = False
+        return view
+
+    def distance(self, start, target) -> Optional[int]:
+        """
+        :return: shortest number of steps, None if the known walls cut start off from target
+        """
+        i, j = self.__index(start), self.__index(target)
+        if i is None or j is None:
+            return None
+        distance = int(self.__field(j)[i])
+        return None if distance == UNREACHABLE else distance
+
+    def nextMove(self, start, target) -> Optional[str]:
+        """
+        First move of a shortest path from start to target, None if already there or unreachable
+        """
+        i, j = self.__index(start), self.__index(target)
+        if i is None or j is None:
+            return None
+        field = self.__field(j)
+        if field[i] <= 0:
+            return None
+        for name, neighbor in self.__neighbors[i]:
+            if field[neighbor] == field[i] - 1:
+                return name
+        return None
+
+    def nearest(self, start, targets: Iterable) -> Optional[tuple[tuple[int, int], int]]:
+        """
+        :return: (target, distance) of the closest reachable target, None if none is reachable
+        """
+        best = None
+        for target in targets:
+            distance = self.distance(start, target)
+            if distance is not None and (best is None or distance < best[1]):
+                best = (tuple(target), distance)
+        return best
+
+    def path(self, start, target) -> Optional[list[tuple[int, int]]]:
+        """
+        A* for one-off queries that should not build and cache a whole field
+        :return: cells from start to target inclusive, None if unreachable
+        """
+        i, j = self.__index(start), self.__index(target)
+        if i is None or j is None or self.__walls[i] or self.__walls[j]:
+            return None
+        tx, ty = divmod(j, self.width)
+
+        def heuristic(cell):
+            x, y = divmod(cell, self.width)
+            return abs(x - tx) + abs(y - ty)
+
+        cost = {i: 0}
+        parent = {i: None}
+        frontier = [(heuristic(i), 0, i)]
+        while frontier:
+            _, steps, cell = heapq.heappop(frontier)
+            if cell == j:
+                path = []
+                while cell is not None:
+                    path.append(divmod(cell, self.width))
+                    cell = parent[cell]
+                return path[::-1]
+            if steps > cost[cell]:
+                continue
+            for _, neighbor in self.__neighbors[cell]:
+                if not self.__walls[neighbor] and steps + 1 < cost.get(neighbor, steps + 2):
+                    cost[neighbor] = steps + 1
+                    parent[neighbor] = cell
+                    heapq.heappush(frontier, (steps + 1 + heuristic(neighbor), steps + 1, neighbor))
+        return None
+
+    def openMoves(self, start) -> list[str]:
+        """
+        Moves from start that stay on the board and do not walk into a known wall
+        """
+        i = self.__index(start)
+        if i is None:
+            return []
+        return [name for name, neighbor in self.__neighbors[i] if not self.__walls[neighbor]]
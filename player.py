@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Player:
+    __slots__ = ('__name', '__team', '__loc')
+
     def __init__(self, playerName: str, team: Team):
         assert isinstance(playerName, str)
 
@@ -0,0 +1,122 @@
+"""
+Sampling profiler for a running server
+
+Every interval a background thread reads the current stack of every other thread. When the window
+ends it writes:
+    path        collapsed stacks, one "thread;outer;...;inner count" line per distinct stack,
+                the input format of flamegraph.pl and speedscope
+    path.txt    the functions with the most samples, by own time and including callees
+Unlike cProfile this sees every thread, including the lobby workers, and costs the same no matter
+how many calls the profiled code makes.
+"""
+
+import sys
+import threading
+import traceback
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+
+def _frameName(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    INTERVAL = 0.005
+    TOP = 30
+
+    def __init__(self, interval: float = INTERVAL):
+        assert interval > 0
+        self.interval = interval
+        self.__lock = threading.Lock()
+        self.__thread: Optional[threading.Thread] = None
+        self.__stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self, seconds: float, path: str, report: Optional[Callable[[], str]] = None,
+              onDone: Optional[Callable[[str], None]] = None,
+              onError: Optional[Callable[[Exception], None]] = None) -> bool:
+        """
+        Samples for seconds, or until stop(), then writes the results to path
+        :param report: called when the window ends, its text is appended to the summary
+        :param onDone: called with path once the files are written
+        :param onError: called with the exception if they could not be written
+        :return: False if a window is already open
+        """
+        assert seconds > 0
+        with self.__lock:
+            if self.running:
+                return False
+            self.__stop.clear()
+            self.__thread = threading.Thread(target=self.__run, args=(seconds, path, report, onDone, onError),
+                                             name='sampling-profiler', daemon=True)
+            self.__thread.start()
+            return True
+
+    def stop(self):
+        """
+        Ends the window early, the results are still written
+        """
+        self.__stop.set()
+        thread = self.__thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def __run(self, seconds: float, path: str, report, onDone, onError):
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while not self.__stop.wait(self.interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frameName(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+        elapsed = time.perf_counter() - start
+
+        try:
+            with open(path, 'w') as file:
+                for stack, count in stacks.most_common():
+                    file.write(f"{';'.join(name.replace(';', ':') for name in stack)} {count}\n")
+            with open(f'{path}.txt', 'w') as file:
+                file.write(self.summary(stacks, samples, elapsed))
+                if report is not None:
+                    file.write('\n' + report())
+        except OSError as error:
+            if onError is None:
+                traceback.print_exc()
+            else:
+                onError(error)
+            return
+        if onDone is not None:
+            onDone(path)
+
+    @staticmethod
+    def summary(stacks: Counter, samples: int, elapsed: float) -> str:
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in stacks.items():
+            # stack[0] is the thread name
+            own[stack[-1]] += count
+            for name in set(stack[1:]):
+                inclusive[name] += count
+        total = sum(stacks.values()) or 1
+        lines = [f'{samples} samples over {elapsed:.1f}s, {total} thread stacks', '',
+                 'Own samples', *(f'{count:8d} {100 * count / total:5.1f}%  {name}'
+                                  for name, count in own.most_common(SamplingProfiler.TOP)),
+                 '', 'Including callees', *(f'{count:8d} {100 * count / total:5.1f}%  {name}'
+                                            for name, count in inclusive.most_common(SamplingProfiler.TOP))]
+        return '\n'.join(lines) + '\n'
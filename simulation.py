@@ -0,0 +1,143 @@
+"""
+Headless game runner: plays games in-process without the MQTT broker
+
+    python simulation.py --games 10000 --workers 8 --strategy greedy
+"""
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Union
+
+from game import Game
+from moveset import Moveset
+from strategies import STRATEGIES
+
+# A strategy maps a game_state dict (as a client decodes it from JSON) to a move name or None.
+# A class of strategies is instantiated with (height, width) for every team of every game.
+Strategy = Callable[[dict], Optional[str]]
+
+DEFAULT_TEAMS = {'ATeam': ['Player1', 'Player2'], 'BTeam': ['Player3', 'Player4']}
+
+
+def to_client_state(game_data: dict) -> dict:
+    """
+    Converts Game.getGameData output to what a client sees after json.loads (tuples become lists)
+    """
+    client_state = {}
+    for key, value in game_data.items():
+        if key in ('teammateNames', 'currentPosition'):
+            client_state[key] = list(value)
+        else:
+            client_state[key] = [list(loc) for loc in value]
+    return client_state
+
+
+def play_game(seed: int, strategies: Union[Strategy, dict[str, Strategy]], teams: dict[str, list[str]] = None,
+              width: int = 10, height: int = 10, vision_radius: int = 2, max_ticks: int = 1000) -> dict:
+    """
+    Plays one game to completion or max_ticks
+    :param strategies: one strategy for every player or {team_name: strategy}
+    :return: {'seed', 'ticks', 'scores', 'coins_left'}
+    """
+    teams = DEFAULT_TEAMS if teams is None else teams
+    # The game has its own generator, the random module is left to the strategies
+    random.seed(seed)
+    game = Game(teams, width, height, seed=seed)
+    team_of = {player: team for team, players in teams.items() for player in players}
+    if not isinstance(strategies, dict):
+        strategies = {team: strategies for team in teams}
+    strategies = {team: strategy(height, width) if isinstance(strategy, type) else strategy
+                  for team, strategy in strategies.items()}
+
+    while not game.gameOver() and game.ticks < max_ticks:
+        moves = {}
+        for player, game_data in game.getAllGameData(vision_radius).items():
+            move = strategies[team_of[player]](to_client_state(game_data))
+            if move is not None:
+                moves[player] = Moveset[move]
+        game.applyMoves(moves)
+        game.endTick()
+
+    return {'seed': seed, 'ticks': game.ticks, 'scores': game.getScores(), 'coins_left': game.map.numCoins}
+
+
+def _play_game(args: tuple) -> dict:
+    seed, kwargs = args
+    return play_game(seed, **kwargs)
+
+
+def run(num_games: int, strategies: Union[Strategy, dict[str, Strategy]], workers: Optional[int] = None,
+        first_seed: int = 0, **game_kwargs) -> dict:
+    """
+    Plays num_games games with consecutive seeds across a process pool and summarizes them
+    :param workers: pool size, None uses every core and 0 runs in this process
+    :param game_kwargs: forwarded to play_game
+    """
+    kwargs = dict(game_kwargs, strategies=strategies)
+    jobs = [(seed, kwargs) for seed in range(first_seed, first_seed + num_games)]
+
+    start = time.perf_counter()
+    if workers == 0:
+        results = [_play_game(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_play_game, jobs, chunksize=max(1, num_games // 64)))
+    elapsed = time.perf_counter() - start
+
+    return summarize(results, elapsed)
+
+
+def summarize(results: list[dict], elapsed: float) -> dict:
+    summary = {
+        'games': len(results),
+        'seconds': elapsed,
+        'games_per_sec': len(results) / elapsed if elapsed > 0 else float('inf'),
+        'mean_ticks': statistics.fmean(result['ticks'] for result in results),
+        'unfinished': sum(1 for result in results if result['coins_left'] > 0),
+        'teams': {},
+    }
+    for team in results[0]['scores']:
+        scores = [result['scores'][team] for result in results]
+        wins = sum(1 for result in results if result['scores'][team] > max(
+            (score for other, score in result['scores'].items() if other != team), default=-1))
+        summary['teams'][team] = {
+            'mean': statistics.fmean(scores),
+            'stdev': statistics.pstdev(scores),
+            'min': min(scores),
+            'max': max(scores),
+            'win_rate': wins / len(results),
+        }
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play games headless and report score statistics')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None, help='process pool size, 0 runs in-process')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--strategy', choices=STRATEGIES.keys(), default='greedy',
+                        help='strategy for every team')
+    parser.add_argument('--team-strategy', action='append', default=[], metavar='TEAM=STRATEGY',
+                        help='override the strategy of one team, may be repeated')
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=10)
+    parser.add_argument('--vision', type=int, default=2)
+    parser.add_argument('--max-ticks', type=int, default=1000)
+    args = parser.parse_args()
+
+    strategies = {team: STRATEGIES[args.strategy] for team in DEFAULT_TEAMS}
+    for override in args.team_strategy:
+        team, name = override.split('=')
+        strategies[team] = STRATEGIES[name]
+
+    summary = run(args.games, strategies, args.workers, args.seed, width=args.width, height=args.height,
+                  vision_radius=args.vision, max_ticks=args.max_ticks)
+
+    print(f"{summary['games']} games in {summary['seconds']:.2f}s ({summary['games_per_sec']:.1f} games/sec)")
+    print(f"mean ticks: {summary['mean_ticks']:.1f}, unfinished: {summary['unfinished']}")
+    for team, stats in summary['teams'].items():
+        print(f"{team}: mean {stats['mean']:.2f} stdev {stats['stdev']:.2f} "
+              f"min {stats['min']} max {stats['max']} win rate {stats['win_rate']:.1%}")
@@ -0,0 +1,61 @@
+"""
+Per-player cache of game_state data and encoded payloads, invalidated by the cells that changed
+"""
+
+from typing import Callable, Hashable
+
+from game import Game
+
+
+class StateCache:
+    """
+    A player's gameData only depends on its position and the cells in its vision window, so after a
+    tick it is rebuilt only if the player moved or one of the tick's dirty cells is inside the window.
+    Encoded payloads are kept next to the data until it changes.
+    """
+    def __init__(self, game: Game, visionRadius: int = 2):
+        assert isinstance(visionRadius, int)
+        self.__game = game
+        self.__visionRadius = visionRadius
+        # playerName -> (location the data was built at, gameData)
+        self.__data: dict[str, tuple[tuple[int, int], dict]] = {}
+        # playerName -> {format key: encoded payload}
+        self.__payloads: dict[str, dict[Hashable, object]] = {}
+
+    def refresh(self) -> set[str]:
+        """
+        Catches up with the game, call once per tick after it is resolved
+        :return: names of the players whose gameData changed
+        """
+        dirty = self.__game.takeDirtyCells()
+        if dirty is None or not self.__data:
+            allGameData = self.__game.getAllGameData(self.__visionRadius)
+            self.__data = {name: (self.__game.all_players[name].loc, data) for name, data in allGameData.items()}
+            self.__payloads.clear()
+            return set(self.__data)
+
+        radius = self.__visionRadius
+        changed = set()
+        for name, player in self.__game.all_players.items():
+            loc, _ = self.__data[name]
+            if loc == player.loc:
+                cx, cy = loc
+                if not any(abs(x - cx) <= radius and abs(y - cy) <= radius for x, y in dirty):
+                    continue
+            self.__data[name] = (player.loc, self.__game.getGameData(name, radius))
+            self.__payloads.pop(name, None)
+            changed.add(name)
+        return changed
+
+    def gameData(self, playerName: str) -> dict:
+        return self.__data[playerName][1]
+
+    def payload(self, playerName: str, encode: Callable[[dict], object], key: Hashable = None):
+        """
+        encode(gameData), computed once until the player's gameData changes
+        :param key: tells apart payloads of different encodings for the same player
+        """
+        payloads = self.__payloads.setdefault(playerName, {})
+        if key not in payloads:
+            payloads[key] = encode(self.gameData(playerName))
+        return payloads[key]
@@ -0,0 +1,108 @@
+"""
+Delta encoding for game_state messages
+
+Keyframe: {'seq': n, 'keyframe': True, 'state': gameData}
+Delta:    {'seq': n, 'keyframe': False, 'currentPosition': (x,y),
+           'added': {key: [...], ...}, 'removed': {key: [...], ...}}
+
+A delta is relative to the message with seq n-1. A client that sees a gap publishes
+anything to games/{lobby}/{player}/resync and the next message is a keyframe.
+"""
+
+from typing import Optional
+
+# gameData keys holding plain position lists
+POSITION_KEYS = ('enemyPositions', 'coin1', 'coin2', 'coin3', 'walls')
+# Teammates are diffed as (name, position) pairs
+TEAMMATES = 'teammates'
+
+
+def _toSets(gameData: dict) -> dict[str, set]:
+    sets = {key: {tuple(loc) for loc in gameData[key]} for key in POSITION_KEYS}
+    sets[TEAMMATES] = {(name, tuple(loc)) for name, loc in zip(gameData['teammateNames'], gameData['teammatePositions'])}
+    return sets
+
+
+class DeltaEncoder:
+    """
+    Server side, one per player that opted in to deltas
+    """
+    KEYFRAME_INTERVAL = 20
+
+    def __init__(self, keyframeInterval: int = KEYFRAME_INTERVAL):
+        assert isinstance(keyframeInterval, int) and keyframeInterval > 0
+        self.keyframeInterval = keyframeInterval
+        self.seq = 0
+        self.__last: Optional[dict[str, set]] = None
+
+    def requestKeyframe(self):
+        self.__last = None
+
+    def encode(self, gameData: dict) -> dict:
+        current = _toSets(gameData)
+        self.seq += 1
+        if self.__last is None or self.seq % self.keyframeInterval == 0:
+            message = {'seq': self.seq, 'keyframe': True, 'state': gameData}
+        else:
+            added, removed = {}, {}
+            for key, locs in current.items():
+                new = locs - self.__last[key]
+                old = self.__last[key] - locs
+                if new:
+                    added[key] = sorted(new)
+                if old:
+                    removed[key] = sorted(old)
+            message = {'seq': self.seq, 'keyframe': False, 'currentPosition': gameData['currentPosition'],
+                       'added': added, 'removed': removed}
+        self.__last = current
+        return message
+
+
+class DeltaDecoder:
+    """
+    Client side, rebuilds the full gameData (as decoded from JSON) from keyframes and deltas
+    """
+    def __init__(self):
+        self.seq = 0
+        self.__state: Optional[dict[str, set]] = None
+        self.__position = None
+
+    def update(self, message: dict) -> Optional[dict]:
+        """
+        :param message: decoded game_state message
+        :return: the full gameData, or None if a message was missed and a resync is needed
+        """
+        if message['keyframe']:
+            self.__state = _toSets(message['state'])
+            self.__position = message['state']['currentPosition']
+        elif self.__state is None or message['seq'] != self.seq + 1:
+            self.__state = None
+            return None
+        else:
+            for key, locs in message['removed'].items():
+                self.__state[key].difference_update(self.__key(key, locs))
+            for key, locs in message['added'].items():
+                self.__state[key].update(self.__key(key, locs))
+            self.__position = message['currentPosition']
+        self.seq = message['seq']
+        return self.state
+
+    @property
+    def state(self) -> Optional[dict]:
+        if self.__state is None:
+            return None
+        # Positions are listed row-major, matching the order of Game.getGameData
+        teammates = sorted(self.__state[TEAMMATES], key=lambda teammate: teammate[1])
+        gameData = {'teammateNames': [name for name, _ in teammates],
+                    'teammatePositions': [list(loc) for _, loc in teammates],
+                    'enemyPositions': [],
+                    'currentPosition': list(self.__position)}
+        for key in POSITION_KEYS:
+            gameData[key] = [list(loc) for loc in sorted(self.__state[key])]
+        return gameData
+
+    @staticmethod
+    def __key(key: str, locs: list) -> set:
+        if key == TEAMMATES:
+            return {(name, tuple(loc)) for name, loc in locs}
+        return {tuple(loc) for loc in locs}
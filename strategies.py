@@ -0,0 +1,174 @@
+"""
+Bot decision logic shared by the player clients and the headless simulation runner.
+Strategies take a game_state dict as decoded from JSON and return a move name.
+Stateful strategies are classes, instantiated with the board size once per team and game.
+"""
+
+import random
+
+from planner import Planner
+from worldModel import WorldModel
+
+
+def is_coordinate_in_list(coord_list, target_coord):
+    for coord in coord_list:
+        if coord == target_coord:
+            return True
+    return False
+
+
+def find_coin(position, coins, walls):
+    nearest_coin = None
+    min_distance = float('inf')
+    for coin in coins:
+        dist = abs(coin[0] - position[0]) + abs(coin[1] - position[1])
+        if dist < min_distance:
+            nearest_coin = coin
+            min_distance = dist
+
+    # Calculate move direction towards the nearest coin
+    if nearest_coin:
+        y_diff = nearest_coin[0] - position[0]
+        x_diff = nearest_coin[1] - position[1]
+
+        if x_diff != 0:
+            if x_diff > 0:
+                if not is_coordinate_in_list(walls, [position[0], position[1] + 1]):
+                    return "RIGHT"  # Move right if not blocked and the coin is to the right in x-coordinate
+            elif x_diff < 0:
+                if not is_coordinate_in_list(walls, [position[0], position[1] - 1]):
+                    return "LEFT"
+            else:
+                if not is_coordinate_in_list(walls, [position[0] + 1, position[1]]):
+                    return "DOWN"  # Move down if not blocked and the coin is lower in y-coordinate
+                elif y_diff < 0:
+                    if not is_coordinate_in_list(walls, [position[0] - 1, position[1]]):
+                        return "UP"
+        if y_diff != 0:
+            if y_diff > 0:
+                if not is_coordinate_in_list(walls, [position[0] + 1, position[1]]):
+                    return "DOWN"  # Move down if not blocked and the coin is lower in y-coordinate
+            elif y_diff < 0:
+                if not is_coordinate_in_list(walls, [position[0] - 1, position[1]]):
+                    return "UP"
+            else:
+                if x_diff > 0:
+                    if not is_coordinate_in_list(walls, [position[0], position[1] + 1]):
+                        return "RIGHT"  # Move right if not blocked and the coin is to the right in x-coordinate
+                elif x_diff < 0:
+                    if not is_coordinate_in_list(walls, [position[0], position[1] - 1]):
+                        return "LEFT"
+
+        directions = [
+            ("DOWN", [position[0] + 1, position[1]]),
+            ("UP", [position[0] - 1, position[1]]),
+            ("RIGHT", [position[0], position[1] + 1]),
+            ("LEFT", [position[0], position[1] - 1])
+        ]
+
+        # Shuffle the list to randomize the order of direction checking
+        random.shuffle(directions)
+
+        # Check each direction in the shuffled list
+        for direction, new_position in directions:
+            if not is_coordinate_in_list(walls, new_position):
+                return direction
+
+def move_random(position, walls):
+    directions = [
+        ("DOWN", [position[0] + 1, position[1]]),
+        ("UP", [position[0] - 1, position[1]]),
+        ("RIGHT", [position[0], position[1] + 1]),
+        ("LEFT", [position[0], position[1] - 1])
+    ]
+
+    # Shuffle the list to randomize the order of direction checking
+    random.shuffle(directions)
+
+    # Check each direction in the shuffled list
+    for direction, new_position in directions:
+        if not is_coordinate_in_list(walls, new_position):
+            return direction
+
+
+def greedy_strategy(game_state):
+    """
+    Decision logic of PlayerClient2: head for a coin of the lowest value in sight, otherwise wander
+    """
+    walls = game_state.get("walls", [])
+    coins = [game_state.get(f"coin{i + 1}", []) for i in range(3) if game_state.get(f"coin{i + 1}", [])]
+    position = game_state["currentPosition"]
+    if len(coins) != 0:
+        coins = coins[0]
+        next_move = find_coin(position, coins, walls)
+    else:
+        next_move = move_random(position, walls)
+    return next_move
+
+
+def random_strategy(game_state):
+    """
+    Random step that avoids walls in sight
+    """
+    return move_random(game_state["currentPosition"], game_state.get("walls", []))
+
+
+class PlannerStrategy:
+    """
+    Walks shortest paths around every wall its team has seen, to the coin worth the most per step
+    """
+    COIN_VALUES = (('coin1', 1), ('coin2', 2), ('coin3', 3))
+
+    def __init__(self, height=10, width=10):
+        self.planner = Planner(height, width)
+
+    def __call__(self, game_state):
+        self.planner.addWalls(game_state.get("walls", []))
+        position = game_state["currentPosition"]
+        best, best_score = None, 0
+        for key, value in self.COIN_VALUES:
+            for coin in game_state.get(key, []):
+                distance = self.planner.distance(position, coin)
+                if distance and value / distance > best_score:
+                    best, best_score = coin, value / distance
+        if best is not None:
+            return self.planner.nextMove(position, best)
+        moves = self.planner.openMoves(position)
+        return random.choice(moves) if moves else None
+
+
+class MemoryStrategy:
+    """
+    PlannerStrategy that remembers coins out of sight, trusting them less the longer ago they were
+    seen, and explores the least recently seen part of the board when it knows of none
+    """
+    MIN_CONFIDENCE = 0.1
+
+    def __init__(self, height=10, width=10):
+        self.model = WorldModel(height, width)
+        self.planner = Planner(height, width)
+
+    def __call__(self, game_state):
+        self.planner.addWalls(self.model.update(game_state))
+        position = game_state["currentPosition"]
+        best, best_score = None, 0
+        for coin, value, confidence in self.model.coins(self.MIN_CONFIDENCE):
+            distance = self.planner.distance(position, coin)
+            if distance and value * confidence / distance > best_score:
+                best, best_score = coin, value * confidence / distance
+        if best is None:
+            best = self.model.explorationTarget(self.planner.distances(position))
+        move = self.planner.nextMove(position, best) if best is not None else None
+        if move is None:
+            moves = self.planner.openMoves(position)
+            move = random.choice(moves) if moves else None
+        return move
+
+
+# Strategies by the name the runners and bot hosts take on the command line
+STRATEGIES = {
+    'greedy': greedy_strategy,
+    'random': random_strategy,
+    'planner': PlannerStrategy,
+    'memory': MemoryStrategy,
+}
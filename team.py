@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Team:
+    __slots__ = ('__name', 'players', '__score')
+
     def __init__(self, teamName: str):
         assert isinstance(teamName, str)
         self.__name = teamName
@@ -23,6 +25,11 @@ class Team:
     def score(self):
         return self.__score
 
+    @score.setter
+    def score(self, value: int):
+        assert isinstance(value, int)
+        self.__score = value
+
     def addPlayer(self, player: Player):
         assert isinstance(player, Player)
         self.players.append(player)
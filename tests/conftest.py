@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def teams():
+    return {'ATeam': ['Player1', 'Player2'], 'BTeam': ['Player3', 'Player4']}
+
+
+class RecordingClient:
+    """
+    Stands in for the paho client the server functions are called with, keeps what they publish
+    """
+    def __init__(self):
+        self.published = []
+        self.subscribed = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append(topic)
+
+    def payloads(self, topic):
+        return [payload for published, payload in self.published if published == topic]
+
+
+@pytest.fixture
+def recording_client():
+    return RecordingClient()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import threading
+import time
+
+import botRuntime
+from botRuntime import BotRuntime
+from fakeBroker import FakeBroker
+
+STATE = json.dumps({'currentPosition': [1, 1], 'walls': [[0, 1]]})
+
+
+def test_slow_team_does_not_starve_fast_team(teams, monkeypatch):
+    release = threading.Event()
+    calls = {'slow': 0, 'fast': 0}
+
+    def slow(game_state):
+        calls['slow'] += 1
+        release.wait(10)
+        return 'UP'
+
+    def fast(game_state):
+        calls['fast'] += 1
+        return 'DOWN'
+
+    monkeypatch.setitem(botRuntime.STRATEGIES, 'slow', slow)
+    monkeypatch.setitem(botRuntime.STRATEGIES, 'fast', fast)
+    lobbies = [{'lobby_name': 'Slow', 'strategy': 'slow', 'teams': teams},
+               {'lobby_name': 'Fast', 'strategy': 'fast', 'teams': teams}]
+    broker = FakeBroker()
+    # Each stuck slow team holds one thread, the fast teams share the last one
+    runtime = BotRuntime(broker.client('Bots'), lobbies, move_deadline=0.05, max_workers=len(teams) + 1)
+    server = broker.client('Server')
+    moves = {'Slow': [], 'Fast': []}
+
+    def on_move(client, userdata, msg):
+        _, lobby_name, player, _ = msg.topic.split('/')
+        moves[lobby_name].append((player, msg.payload))
+
+    server.on_message = on_move
+    server.subscribe('games/+/+/move')
+    server.loop_start()
+
+    stop = threading.Event()
+
+    def publishStates():
+        while not stop.wait(0.01):
+            for lobby in lobbies:
+                for players in teams.values():
+                    for player in players:
+                        server.publish(f"games/{lobby['lobby_name']}/{player}/game_state", STATE)
+
+    publisher = threading.Thread(target=publishStates, daemon=True)
+    publisher.start()
+    try:
+        asyncio.run(runtime.run(0.6))
+    finally:
+        stop.set()
+        release.set()
+        publisher.join()
+        server.loop_stop()
+
+    # One decision per team ever ran in the slow lobby, its bots kept moving on fallbacks
+    assert calls['slow'] == len(teams)
+    assert calls['fast'] > 20
+    assert runtime.missed_deadlines > 0
+    players = [player for players in teams.values() for player in players]
+    for lobby_name in ('Slow', 'Fast'):
+        assert {player for player, _ in moves[lobby_name]} == set(players)
+    assert sum(move == b'DOWN' for _, move in moves['Fast']) > 20
@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+import pytest
+
+from cellIndex import FreeCellIndex
+
+
+def test_matches_a_set():
+    rng = random.Random(0)
+    height, width = 7, 5
+    index, model = FreeCellIndex(height, width), set()
+    cells = [(x, y) for x in range(height) for y in range(width)]
+    for _ in range(2000):
+        loc = rng.choice(cells)
+        if rng.random() < 0.5:
+            index.add(loc)
+            model.add(loc)
+        else:
+            index.remove(loc)
+            model.discard(loc)
+        assert len(index) == len(model)
+        if model:
+            assert index.sample(rng) in model
+    assert {loc for loc in cells if loc in index} == model
+
+
+def test_full_index_holds_every_cell():
+    index = FreeCellIndex(3, 4, full=True)
+    assert len(index) == 12
+    assert all((x, y) in index for x in range(3) for y in range(4))
+
+
+def test_sample_reaches_every_cell():
+    rng = random.Random(1)
+    index = FreeCellIndex(4, 4, full=True)
+    for loc in ((0, 0), (1, 2), (3, 3)):
+        index.remove(loc)
+    seen = {index.sample(rng) for _ in range(1000)}
+    assert seen == {(x, y) for x in range(4) for y in range(4)} - {(0, 0), (1, 2), (3, 3)}
+
+
+def test_sample_empty_raises():
+    with pytest.raises(ValueError):
+        FreeCellIndex(2, 2).sample()
+
+
+def test_cells_round_trip_keeps_sampling_order():
+    rng = random.Random(2)
+    index = FreeCellIndex(6, 6, full=True)
+    for _ in range(20):
+        index.remove((rng.randrange(6), rng.randrange(6)))
+    copy = FreeCellIndex.fromCells(6, 6, index.cells)
+    assert copy.cells.tolist() == index.cells.tolist()
+    first, second = random.Random(3), random.Random(3)
+    assert [copy.sample(first) for _ in range(20)] == [index.sample(second) for _ in range(20)]
+
+    mask = np.zeros((6, 6), dtype=bool)
+    mask[2, 3] = mask[5, 0] = True
+    assert sorted(FreeCellIndex.fromMask(mask).cells.tolist()) == [2 * 6 + 3, 5 * 6]
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from game import Game
+from moveset import Moveset
+
+
+def play(game, rng, ticks):
+    for _ in range(ticks):
+        game.applyMoves({name: rng.choice(list(Moveset)) for name in game.all_players})
+        game.endTick()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_restore_continues_identically(teams, seed):
+    game = Game(teams, coinRespawnInterval=3, seed=seed)
+    play(game, random.Random(seed), 20)
+    data = game.snapshot()
+
+    fork = Game.fromSnapshot(data)
+    assert fork.snapshot() == data
+    assert fork.getScores() == game.getScores()
+    play(game, random.Random(seed + 1), 50)
+    play(fork, random.Random(seed + 1), 50)
+    assert fork.snapshot() == game.snapshot()
+
+
+def test_restore_rewinds(teams):
+    game = Game(teams, coinRespawnInterval=2, seed=1)
+    data = game.snapshot()
+    board = repr(game.map)
+    play(game, random.Random(1), 30)
+    game.restore(data)
+    assert game.snapshot() == data
+    assert repr(game.map) == board
+    assert game.ticks == 0
+
+
+def test_restore_rejects_other_roster(teams):
+    data = Game(teams, seed=2).snapshot()
+    with pytest.raises(ValueError):
+        Game({'ATeam': ['Player1'], 'BTeam': ['Player3']}, seed=2).restore(data)
+
+
+def test_snapshot_without_rng_keeps_board(teams):
+    game = Game(teams, seed=3)
+    play(game, random.Random(3), 10)
+    assert Game.fromSnapshot(game.snapshot(includeRng=False)).snapshot(includeRng=False) == \
+           game.snapshot(includeRng=False)
@@ -0,0 +1,95 @@
+import itertools
+import json
+import time
+
+import paho.mqtt.client as paho
+import pytest
+
+from fakeBroker import FakeBroker, local_server
+
+FILTERS = ['#', '+', 'games/#', 'games/+', 'games/+/+', 'games/+/lobby', 'games/Lobby1/#', 'games/+/+/game_state',
+           '+/+/+/move', 'games/Lobby1/Player1/move', '$SYS/#', '+/broker', 'admin/profile', 'admin/#', 'a/+/#']
+TOPICS = ['games', 'games/Lobby1', 'games/Lobby1/lobby', 'games/Lobby1/Player1/move',
+          'games/Lobby2/Player3/game_state', 'games/Lobby1/Player1/game_state/extra', '$SYS/broker',
+          'admin/profile', 'admin', 'a/b', 'a/b/c', 'a', 'new_game', '']
+
+
+@pytest.mark.parametrize('pattern', FILTERS)
+def test_matching_agrees_with_paho(pattern):
+    broker = FakeBroker()
+    client = broker.client('test')
+    received = []
+    client.on_message = lambda client, userdata, msg: received.append(msg.topic)
+    client.subscribe(pattern)
+    for topic in TOPICS:
+        client.publish(topic, b'x')
+    client.loop(timeout=0)
+    assert received == [topic for topic in TOPICS if paho.topic_matches_sub(pattern, topic)]
+
+
+def test_overlapping_filters_deliver_once():
+    broker = FakeBroker()
+    client = broker.client('test')
+    received = []
+    client.on_message = lambda client, userdata, msg: received.append(msg.topic)
+    for pattern in ('games/#', 'games/+/lobby', 'games/Lobby1/lobby'):
+        client.subscribe(pattern)
+    client.publish('games/Lobby1/lobby', 'START')
+    client.loop(timeout=0)
+    assert received == ['games/Lobby1/lobby']
+
+
+def test_full_inbox_drops():
+    broker = FakeBroker()
+    client = broker.client('slow', maxQueue=3)
+    client.subscribe('t')
+    publisher = broker.client('publisher')
+    for i in range(5):
+        publisher.publish('t', i)
+    stats = broker.stats()
+    assert (stats['delivered'], stats['dropped']) == (3, 2)
+    assert stats['clients']['slow']['maxQueued'] == 3
+    received = []
+    client.on_message = lambda client, userdata, msg: received.append(msg.payload)
+    client.loop(timeout=0)
+    assert received == [b'0', b'1', b'2']
+
+
+def test_unsubscribe_and_wildcard_publish():
+    broker = FakeBroker()
+    client = broker.client('test')
+    client.subscribe([('a/+', 0), ('b/#', 1)])
+    client.unsubscribe('a/+')
+    received = []
+    client.on_message = lambda client, userdata, msg: received.append((msg.topic, msg.qos))
+    for topic, qos in itertools.product(('a/x', 'b/x'), (0, 1, 2)):
+        client.publish(topic, b'', qos)
+    client.loop(timeout=0)
+    assert received == [('b/x', 0), ('b/x', 1), ('b/x', 1)]
+    with pytest.raises(ValueError):
+        client.publish('a/+', b'')
+
+
+def test_local_server_plays_a_game(teams):
+    broker = FakeBroker()
+    server = local_server(broker)
+    bot = broker.client('Bots')
+    states = []
+    bot.on_message = lambda client, userdata, msg: states.append(msg.topic.split('/')[2])
+    bot.subscribe('games/Local/+/game_state')
+    try:
+        for team, players in teams.items():
+            for player in players:
+                bot.publish('new_game', json.dumps({'lobby_name': 'Local', 'team_name': team, 'player_name': player}))
+        bot.publish('games/Local/start', 'START')
+        players = [player for players in teams.values() for player in players]
+        for tick in range(1, 4):
+            deadline = time.monotonic() + 5
+            while len(states) < tick * len(players) and time.monotonic() < deadline:
+                bot.loop(timeout=0.1)
+            assert sorted(states[-len(players):]) == sorted(players)
+            for player in players:
+                bot.publish(f'games/Local/{player}/move', 'UP')
+    finally:
+        server.loop_stop()
+        server.executor.shutdown()
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from game import Game
+from gameItems import Wall
+from map import EMPTY
+from moveset import Moveset
+
+
+def place(game, locs):
+    """
+    Moves players to the given cells on a board with everything else cleared
+    """
+    for x in range(game.map.height):
+        for y in range(game.map.width):
+            if game.map.getCode((x, y)) != EMPTY:
+                game.map.set((x, y), None)
+    for name, loc in locs.items():
+        player = game.getPlayer(name)
+        player.loc = loc
+        game.map.set(loc, player)
+
+
+@pytest.fixture
+def game(teams):
+    return Game(teams, seed=0)
+
+
+def test_same_target_blocks_both(game):
+    place(game, {'Player1': (0, 0), 'Player3': (0, 2), 'Player2': (5, 5), 'Player4': (9, 9)})
+    changes = game.applyMoves({'Player1': Moveset.RIGHT, 'Player3': Moveset.LEFT})
+    assert changes == []
+    assert game.getPlayer('Player1').loc == (0, 0)
+
+
+def test_swap_is_blocked(game):
+    place(game, {'Player1': (0, 0), 'Player3': (0, 1), 'Player2': (5, 5), 'Player4': (9, 9)})
+    assert game.applyMoves({'Player1': Moveset.RIGHT, 'Player3': Moveset.LEFT}) == []
+
+
+def test_chain_and_rotation_go_through(game):
+    place(game, {'Player1': (0, 0), 'Player2': (0, 1), 'Player3': (1, 1), 'Player4': (1, 0)})
+    game.applyMoves({'Player1': Moveset.RIGHT, 'Player2': Moveset.DOWN,
+                     'Player3': Moveset.LEFT, 'Player4': Moveset.UP})
+    assert [game.getPlayer(name).loc for name in ('Player1', 'Player2', 'Player3', 'Player4')] == \
+           [(0, 1), (1, 1), (1, 0), (0, 0)]
+
+
+def test_blocked_by_player_that_stays(game):
+    place(game, {'Player1': (0, 0), 'Player2': (0, 1), 'Player3': (0, 2), 'Player4': (9, 9)})
+    game.map.set((0, 3), Wall())
+    # Player3 walks into the wall, so Player2 and then Player1 are blocked behind it
+    assert game.applyMoves({'Player1': Moveset.RIGHT, 'Player2': Moveset.RIGHT, 'Player3': Moveset.RIGHT}) == []
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_apply_moves_independent_of_dict_order(teams, seed):
+    forward = Game(teams, coinRespawnInterval=1, seed=seed)
+    backward = Game(teams, coinRespawnInterval=1, seed=seed)
+    rng = random.Random(seed)
+    for _ in range(100):
+        moves = {name: rng.choice(list(Moveset)) for name in forward.all_players}
+        assert forward.applyMoves(moves) == backward.applyMoves(dict(reversed(list(moves.items()))))
+        forward.endTick()
+        backward.endTick()
+        assert forward.snapshot() == backward.snapshot()
+
+
+@pytest.mark.parametrize('size', (5, 10, 30))
+def test_all_game_data_matches_get_game_data(size):
+    game = Game({'ATeam': ['Player1', 'Player2', 'Player3'], 'BTeam': ['Player4', 'Player5'], 'CTeam': ['Player6']},
+                size, size, seed=size)
+    rng = random.Random(size)
+    for _ in range(30):
+        for radius in (0, 1, 2, 5, size):
+            allGameData = game.getAllGameData(radius)
+            for name in game.all_players:
+                assert allGameData[name] == game.getGameData(name, radius)
+        for name in game.all_players:
+            game.movePlayer(name, rng.choice(list(Moveset)))
+
+
+def test_seed_alone_decides_the_game(teams):
+    rng = random.Random(0)
+    moves = [{name: rng.choice(list(Moveset)) for name in teams['ATeam'] + teams['BTeam']} for _ in range(50)]
+    first, second = Game(teams, coinRespawnInterval=1, seed=5), Game(teams, coinRespawnInterval=1, seed=5)
+    assert repr(first.map) == repr(second.map)
+    # Interleaving two games and using the random module in between does not change either one
+    for tick in moves:
+        random.random()
+        first.applyMoves(tick)
+        first.endTick()
+    for tick in moves:
+        second.applyMoves(tick)
+        second.endTick()
+    assert repr(first.map) == repr(second.map)
+    assert first.getScores() == second.getScores()
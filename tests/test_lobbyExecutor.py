@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+
+from lobbyExecutor import LobbyExecutor
+
+
+def wait_idle(executor, timeout=5):
+    deadline = time.monotonic() + timeout
+    while executor.activeLobbies and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert executor.activeLobbies == 0
+
+
+def test_lobby_messages_run_in_order_one_at_a_time():
+    lock = threading.Lock()
+    handled = {lobby: [] for lobby in ('Lobby1', 'Lobby2', 'Lobby3')}
+    running = set()
+    overlaps = []
+    rng = random.Random(0)
+    delays = [rng.random() * 0.0005 for _ in range(600)]
+
+    def handler(lobby, i):
+        with lock:
+            if lobby in running:
+                overlaps.append(lobby)
+            running.add(lobby)
+        time.sleep(delays[i])
+        with lock:
+            running.discard(lobby)
+            handled[lobby].append(i)
+
+    executor = LobbyExecutor(handler, max_workers=4, batchSize=5)
+    for i in range(600):
+        lobby = rng.choice(list(handled))
+        executor.submit(lobby, lobby, i)
+    wait_idle(executor)
+    executor.shutdown()
+
+    assert overlaps == []
+    assert sorted(i for values in handled.values() for i in values) == list(range(600))
+    for values in handled.values():
+        assert values == sorted(values)
+    assert executor.pending == 0
+
+
+def test_long_backlog_gives_other_lobbies_a_turn():
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def handler(lobby, i):
+        if not order:
+            started.set()
+            release.wait(5)
+        order.append((lobby, i))
+
+    executor = LobbyExecutor(handler, max_workers=1, batchSize=2)
+    for i in range(6):
+        executor.submit('Busy', 'Busy', i)
+    started.wait(5)
+    executor.submit('Quiet', 'Quiet', 0)
+    release.set()
+    wait_idle(executor)
+    executor.shutdown()
+    assert order == [('Busy', 0), ('Busy', 1), ('Quiet', 0), ('Busy', 2), ('Busy', 3), ('Busy', 4), ('Busy', 5)]
+
+
+def test_handler_errors_do_not_stop_the_lobby(capsys):
+    handled = []
+
+    def handler(i):
+        if i == 1:
+            raise RuntimeError('bad message')
+        handled.append(i)
+
+    executor = LobbyExecutor(handler)
+    for i in range(4):
+        executor.submit('Lobby', i)
+    wait_idle(executor)
+    executor.shutdown()
+    assert handled == [0, 2, 3]
+    assert 'bad message' in capsys.readouterr().err
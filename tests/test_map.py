@@ -0,0 +1,187 @@
+import random
+
+import numpy as np
+import pytest
+
+from game import Game
+from gameItems import Coin2
+from map import COIN1, COIN2, COIN3, EMPTY, PLAYER, WALL
+from moveset import Moveset
+
+
+@pytest.fixture
+def game(teams):
+    return Game(teams, seed=0)
+
+
+def itemCell(map):
+    """
+    First cell holding a wall or a coin
+    """
+    return next((x, y) for x in range(map.height) for y in range(map.width)
+                if map.getCode((x, y)) not in (EMPTY, PLAYER))
+
+
+def test_snapshot_keeps_its_board(game):
+    snapshot = game.map.snapshot()
+    board = repr(snapshot)
+    assert board == repr(game.map)
+    loc = itemCell(game.map)
+    item = game.map.get(loc)
+
+    game.map.set(loc, None)
+    assert repr(snapshot) == board
+    assert snapshot.get(loc) is item
+    assert snapshot[loc[0]][loc[1]] is item
+    assert game.map.get(loc) is None
+    assert repr(game.map.snapshot()) != board
+
+
+def test_snapshot_shares_layers_until_write(game):
+    first = game.map.snapshot()
+    second = game.map.snapshot()
+    assert np.shares_memory(first.grid, second.grid)
+    assert np.shares_memory(first.grid, game.map.grid)
+    with pytest.raises(ValueError):
+        first.grid[0, 0] = EMPTY
+
+    game.map.set(itemCell(game.map), None)
+    assert not np.shares_memory(first.grid, game.map.grid)
+    assert np.shares_memory(first.grid, second.grid)
+
+
+def test_version_counts_writes(game):
+    version = game.map.version
+    game.map.snapshot()
+    game.map.get((0, 0))
+    assert game.map.version == version
+
+    game.map.set(itemCell(game.map), None)
+    assert game.map.version == version + 1
+    game.map.decreaseCoin()
+    assert game.map.version == version + 2
+    assert game.map.snapshot().version == game.map.version
+
+
+@pytest.mark.parametrize('seed', range(64))
+def test_every_wall_choice_can_be_placed(teams, seed):
+    game = Game(teams, seed=seed)
+    walls = {(x, y) for x in range(game.map.height) for y in range(game.map.width)
+             if game.map.getCode((x, y)) == WALL}
+    assert walls <= set(game.map.wallChoices)
+
+
+def cellsWith(map, *codes):
+    grid = map.grid.tolist()
+    return {(x, y) for x in range(map.height) for y in range(map.width) if grid[x][y] in codes}
+
+
+def test_spawn_coin_fills_a_free_cell(game):
+    assert game.map.numFree == len(cellsWith(game.map, EMPTY))
+    for _ in range(10):
+        free, numCoins = cellsWith(game.map, EMPTY), game.map.numCoins
+        loc = game.map.spawnCoin()
+        assert loc in free
+        assert game.map.getCode(loc) in (COIN1, COIN2, COIN3)
+        assert game.map.numCoins == numCoins + 1
+        assert game.map.numFree == len(free) - 1
+
+
+def test_respawn_keeps_starting_coin_count(teams):
+    game = Game(teams, coinRespawnInterval=3, seed=1)
+    startCoins = game.map.numCoins
+    for loc in sorted(cellsWith(game.map, COIN1, COIN2, COIN3))[:2]:
+        game.map.set(loc, None)
+        game.map.decreaseCoin()
+
+    spawned = [game.endTick() for _ in range(9)]
+    assert [len(locs) for locs in spawned] == [0, 0, 1, 0, 0, 1, 0, 0, 0]
+    assert game.map.numCoins == startCoins
+    assert game.ticks == 9
+
+
+def bruteInRange(map, code, center, radius):
+    return sorted(loc for loc in cellsWith(map, code)
+                  if abs(loc[0] - center[0]) <= radius and abs(loc[1] - center[1]) <= radius)
+
+
+def bruteNearest(map, codes, loc):
+    cells = cellsWith(map, *codes)
+    return min(cells, key=lambda cell: (abs(cell[0] - loc[0]) + abs(cell[1] - loc[1]), cell)) if cells else None
+
+
+def checkQueries(game, rng):
+    for _ in range(5):
+        loc = (rng.randrange(game.map.height), rng.randrange(game.map.width))
+        for code in (WALL, COIN1, PLAYER):
+            radius = rng.choice((0, 1, 2, 5, 20))
+            assert game.map.inRange(code, loc, radius) == bruteInRange(game.map, code, loc, radius)
+        for codes in ((COIN1, COIN2, COIN3), (WALL,), (PLAYER,)):
+            assert game.map.nearest(codes, loc) == bruteNearest(game.map, codes, loc)
+    for code in (WALL, COIN2, PLAYER):
+        assert game.map.locations(code) == sorted(cellsWith(game.map, code))
+    for name, player in game.all_players.items():
+        enemies = [game.map.get(loc).name for loc in bruteInRange(game.map, PLAYER, player.loc, 3)
+                   if game.map.get(loc).team is not player.team]
+        assert game.enemiesInRange(name, 3) == enemies
+        assert game.nearestCoin(name) == bruteNearest(game.map, (COIN1, COIN2, COIN3), player.loc)
+
+
+@pytest.mark.parametrize('size', (10, 37))
+def test_queries_match_brute_force(size):
+    teams = {'ATeam': ['Player1', 'Player2', 'Player3'], 'BTeam': ['Player4', 'Player5', 'Player6']}
+    game = Game(teams, size, size, coinRespawnInterval=2, seed=size)
+    rng = random.Random(size)
+    checkQueries(game, rng)
+    start = game.snapshot()
+    for _ in range(40):
+        game.applyMoves({name: rng.choice(list(Moveset)) for name in game.all_players})
+        game.endTick()
+        checkQueries(game, rng)
+
+    middle = game.snapshot()
+    game.restore(start)
+    checkQueries(game, rng)
+    fork = Game.fromSnapshot(middle)
+    checkQueries(fork, rng)
+    for _ in range(20):
+        fork.applyMoves({name: rng.choice(list(Moveset)) for name in fork.all_players})
+        fork.endTick()
+        checkQueries(fork, rng)
+
+
+def test_nearest_on_empty_board(game):
+    for loc in cellsWith(game.map, COIN1, COIN2, COIN3):
+        game.map.set(loc, None)
+    assert game.map.nearest((COIN1, COIN2, COIN3), (0, 0)) is None
+    game.map.set((9, 9), Coin2())
+    assert game.map.nearest((COIN1, COIN2, COIN3), (0, 0)) == (9, 9)
+
+
+def test_move_matches_two_sets(teams):
+    moved, set = Game(teams, seed=3), Game(teams, seed=3)
+    rng = random.Random(3)
+    checkQueries(moved, rng)
+    snapshot = moved.map.snapshot()
+    board = repr(snapshot)
+    for _ in range(200):
+        name, move = rng.choice(list(moved.all_players)), rng.choice(list(Moveset))
+        version, numCoins = moved.map.version, moved.map.numCoins
+        loc = moved.getPlayer(name).loc
+        moved.movePlayer(name, move)
+        newLoc = moved.getPlayer(name).loc
+        if newLoc != loc:
+            # One write for the move, plus one for the coin if it picked one up
+            assert moved.map.version == version + 1 + numCoins - moved.map.numCoins
+            player = set.getPlayer(name)
+            if set.map.getCode(newLoc) != EMPTY:
+                set.map.decreaseCoin()
+            set.map.set(loc, None)
+            set.map.set(newLoc, player)
+            player.loc = newLoc
+        assert np.array_equal(moved.map.grid, set.map.grid)
+        assert np.array_equal(moved.map.playerGrid, set.map.playerGrid)
+        assert np.array_equal(moved.map.freeCells, set.map.freeCells)
+    assert repr(snapshot) == board
+    assert moved.map.numCoins == set.map.numCoins
+    checkQueries(moved, rng)
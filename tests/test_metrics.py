@@ -0,0 +1,74 @@
+import urllib.request
+
+import numpy as np
+import pytest
+
+from metrics import Metric, Registry, estimateSize
+
+
+def test_exposition_format():
+    registry = Registry()
+    messages = registry.counter('messages_total', 'Messages received', ('route',))
+    messages.inc('move')
+    messages.inc('move', amount=2)
+    messages.inc('lo"bby\n')
+    registry.gauge('lobbies', 'Open lobbies', lambda: 3)
+    registry.gauge('players', 'Players per lobby', lambda: {('Lobby1',): 4}, ('lobby',))
+    ticks = registry.histogram('tick_seconds', 'Tick time', buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 2.0):
+        ticks.observe(value)
+
+    assert messages.value('move') == 3
+    assert ticks.count() == 4
+    assert registry.render() == '\n'.join([
+        '# HELP messages_total Messages received',
+        '# TYPE messages_total counter',
+        'messages_total{route="move"} 3',
+        'messages_total{route="lo\\"bby\\n"} 1',
+        '# HELP lobbies Open lobbies',
+        '# TYPE lobbies gauge',
+        'lobbies 3',
+        '# HELP players Players per lobby',
+        '# TYPE players gauge',
+        'players{lobby="Lobby1"} 4',
+        '# HELP tick_seconds Tick time',
+        '# TYPE tick_seconds histogram',
+        'tick_seconds_bucket{le="0.01"} 1',
+        'tick_seconds_bucket{le="0.1"} 3',
+        'tick_seconds_bucket{le="+Inf"} 4',
+        'tick_seconds_sum 2.105',
+        'tick_seconds_count 4',
+    ]) + '\n'
+
+    messages.remove('move')
+    assert 'route="move"' not in registry.render()
+
+
+def test_serve_and_dump(tmp_path):
+    registry = Registry()
+    registry.counter('hits_total', 'Hits').inc()
+    server = registry.serve(0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+            assert response.read().decode() == registry.render()
+    finally:
+        registry.stop()
+
+    path = tmp_path / 'metrics.prom'
+    registry.dump(str(path))
+    assert path.read_text() == registry.render()
+
+
+def test_estimate_size_counts_buffers_once():
+    array = np.zeros(10000, dtype=np.int8)
+    single = estimateSize(array)
+    assert single >= 10000
+    assert estimateSize([array, array, array.view()]) < 2 * single
+
+
+def test_metric_needs_samples():
+    class Incomplete(Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete('incomplete', 'Has no samples')
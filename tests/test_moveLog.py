@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from game import Game
+from moveLog import LogWriter, MoveLog, Replay
+from moveset import Moveset
+
+
+@pytest.mark.parametrize('respawn', (0, 2))
+def test_replay_matches_live_game(tmp_path, teams, respawn):
+    path = str(tmp_path / 'lobby.log')
+    writer = LogWriter()
+    game = Game(teams, coinRespawnInterval=respawn, seed=7)
+    log = MoveLog(path, 'Lobby', game, seed=7, snapshotInterval=16, writer=writer)
+    rng = random.Random(7)
+    snapshots = [game.snapshot()]
+    for tick in range(60):
+        # Only some players move each tick
+        moves = {name: rng.choice(list(Moveset)) for name in game.all_players if rng.random() < 0.8}
+        log.logMoves(game.ticks, moves)
+        game.applyMoves(moves)
+        game.endTick()
+        log.endTick(game)
+        snapshots.append(game.snapshot())
+    log.close()
+    writer.join()
+
+    replay = Replay(path)
+    assert replay.complete
+    assert replay.header['seed'] == 7
+    assert replay.lastTick == 60
+    for tick, data in enumerate(snapshots):
+        assert replay.gameAt(tick).snapshot() == data
+    with pytest.raises(ValueError):
+        replay.gameAt(61)
+
+
+def test_not_a_log(tmp_path):
+    path = tmp_path / 'empty.log'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        Replay(str(path))
+
+
+def test_unclosed_log_is_readable(tmp_path, teams):
+    path = str(tmp_path / 'crashed.log')
+    writer = LogWriter()
+    game = Game(teams, seed=8)
+    log = MoveLog(path, 'Lobby', game, seed=8, snapshotInterval=50, writer=writer, flushInterval=10)
+    writer.join()
+    # Header and starting snapshot are on disk before the first tick
+    assert Replay(path).lastTick == 0
+
+    rng = random.Random(8)
+    snapshots = [game.snapshot()]
+    for _ in range(25):
+        moves = {name: rng.choice(list(Moveset)) for name in game.all_players}
+        log.logMoves(game.ticks, moves)
+        game.applyMoves(moves)
+        game.endTick()
+        log.endTick(game)
+        snapshots.append(game.snapshot())
+    writer.join()
+
+    replay = Replay(path)
+    assert not replay.complete
+    assert replay.lastTick == 20
+    assert replay.gameAt(20).snapshot() == snapshots[20]
+
+
+class BrokenFile:
+    def write(self, data):
+        raise OSError('disk full')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_writer_survives_write_errors(tmp_path, capsys):
+    writer = LogWriter()
+    writer.write(BrokenFile(), b'lost')
+    path = tmp_path / 'fine.log'
+    file = open(path, 'wb')
+    writer.write(file, b'kept', close=True)
+    writer.join()
+    assert path.read_bytes() == b'kept'
+    assert 'disk full' in capsys.readouterr().err
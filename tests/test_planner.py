@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pytest
+
+from planner import UNREACHABLE, Planner
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_cached_fields_match_fresh_planner(seed):
+    rng = random.Random(seed)
+    height, width = 12, 9
+    cells = [(x, y) for x in range(height) for y in range(width)]
+    planner = Planner(height, width)
+    walls = []
+    for _ in range(15):
+        # Warm the cache, then add walls that may or may not cut through the cached fields
+        for target in rng.sample(cells, 10):
+            planner.distances(target)
+        newWalls = rng.sample(cells, 3)
+        walls.extend(newWalls)
+        planner.addWalls(newWalls)
+
+        fresh = Planner(height, width)
+        fresh.addWalls(walls)
+        for target in rng.sample(cells, 10):
+            assert np.array_equal(planner.distances(target), fresh.distances(target))
+
+
+def test_path_agrees_with_distance():
+    rng = random.Random(0)
+    planner = Planner(10, 10)
+    planner.addWalls(rng.sample([(x, y) for x in range(10) for y in range(10)], 25))
+    for _ in range(200):
+        start, target = (rng.randrange(10), rng.randrange(10)), (rng.randrange(10), rng.randrange(10))
+        path = planner.path(start, target)
+        distance = planner.distance(start, target)
+        if path is None:
+            assert distance is None or not planner.isOpen(start)
+        else:
+            assert len(path) - 1 == distance
+            assert all(planner.isOpen(cell) for cell in path)
+            if distance:
+                name = planner.nextMove(start, target)
+                assert planner.distance(path[1], target) == distance - 1
+                assert name is not None
+
+
+def test_walled_off_target():
+    planner = Planner(3, 3)
+    planner.addWalls([(0, 1), (1, 0), (1, 1)])
+    assert planner.distance((2, 2), (0, 0)) is None
+    assert planner.nextMove((2, 2), (0, 0)) is None
+    assert planner.distances((0, 0))[2, 2] == UNREACHABLE
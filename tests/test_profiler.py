@@ -0,0 +1,105 @@
+import shutil
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import GameClient
+
+
+def send(client, topic, payload):
+    GameClient.on_message(client, None, SimpleNamespace(topic=topic, payload=payload, qos=0))
+
+
+def statuses(client):
+    return client.payloads('admin/profile/status')
+
+
+def wait_for_status(client, prefix, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for status in statuses(client):
+            if status.startswith(prefix):
+                return status
+        time.sleep(0.01)
+    pytest.fail(f'no status starting with {prefix!r} in {statuses(client)}')
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, recording_client):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    client = recording_client
+    GameClient.init_server_state(client)
+    yield client
+    client.profiler.stop()
+
+
+def test_profile_writes_stacks_and_dispatch_report(client, tmp_path, capsys):
+    send(client, 'admin/profile', b'0.2')
+    assert wait_for_status(client, 'Profiling for 0.2s into ')
+    send(client, 'new_game', b'not json')
+    path = wait_for_status(client, 'Profile written to ').removeprefix('Profile written to ')
+    assert path.startswith(str(tmp_path))
+
+    with open(path) as file:
+        lines = file.read().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0 and stack
+    with open(f'{path}.txt') as file:
+        summary = file.read()
+    assert 'Own samples' in summary and 'Including callees' in summary
+    assert 'Dispatch handlers during the window' in summary
+
+
+def test_one_profile_at_a_time_and_stop(client):
+    send(client, 'admin/profile', b'60')
+    send(client, 'admin/profile', b'1')
+    assert statuses(client)[-1] == 'Error: a profile is already running'
+    start = time.monotonic()
+    send(client, 'admin/profile', b'STOP')
+    assert wait_for_status(client, 'Profile written to ')
+    assert time.monotonic() - start < 5
+
+
+def test_bad_duration_is_reported(client):
+    send(client, 'admin/profile', b'soon')
+    assert statuses(client) == ['Error: soon is not a number of seconds']
+    assert not client.profiler.running
+
+
+@pytest.mark.parametrize('payload', (b'nan', b'inf', b'-inf'))
+def test_non_finite_duration_is_reported(client, payload):
+    send(client, 'admin/profile', payload)
+    assert statuses(client) == [f'Error: {payload.decode()} is not a number of seconds']
+    assert not client.profiler.running
+
+
+def test_missing_directory_is_reported(client, tmp_path):
+    client.profile_dir = str(tmp_path / 'missing')
+    send(client, 'admin/profile', b'1')
+    assert statuses(client) == [f'Error: profile directory {client.profile_dir} does not exist']
+
+
+def test_write_failure_is_reported(client, tmp_path):
+    client.profile_dir = str(tmp_path / 'profiles')
+    (tmp_path / 'profiles').mkdir()
+    send(client, 'admin/profile', b'0.1')
+    shutil.rmtree(client.profile_dir)
+    assert wait_for_status(client, 'Error: could not write the profile: ')
+
+
+def test_profiling_is_off_without_profile_dir(monkeypatch, recording_client):
+    monkeypatch.delenv('PROFILE_DIR', raising=False)
+    client = recording_client
+    GameClient.init_server_state(client)
+    GameClient.subscribe_server_topics(client)
+    assert 'admin/profile' not in client.subscribed
+    send(client, 'admin/profile', b'1')
+    assert statuses(client) == []
+    assert not client.profiler.running
+
+    monkeypatch.setenv('PROFILE_DIR', '.')
+    GameClient.subscribe_server_topics(client)
+    assert 'admin/profile' in client.subscribed
@@ -0,0 +1,104 @@
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import GameClient
+from game import Game
+from gameItems import Coin1
+from moveset import Moveset
+from stateCache import StateCache
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_cache_matches_fresh_game_data(teams, seed):
+    game = Game(teams, coinRespawnInterval=3, seed=seed)
+    cache = StateCache(game)
+    assert cache.refresh() == set(game.all_players)
+    rng = random.Random(seed)
+    for _ in range(100):
+        before = {name: cache.gameData(name) for name in game.all_players}
+        game.applyMoves({name: rng.choice(list(Moveset)) for name in game.all_players})
+        game.endTick()
+        changed = cache.refresh()
+        for name in game.all_players:
+            assert cache.gameData(name) == game.getGameData(name)
+            if name not in changed:
+                assert cache.gameData(name) is before[name]
+
+
+def test_payload_cached_until_change(teams):
+    game = Game(teams, seed=0)
+    cache = StateCache(game)
+    cache.refresh()
+    calls = []
+
+    def encode(gameData):
+        calls.append(gameData)
+        return repr(gameData)
+
+    assert cache.payload('Player1', encode, 'repr') == cache.payload('Player1', encode, 'repr')
+    assert len(calls) == 1
+    game.restore(game.snapshot())
+    assert cache.refresh() == set(game.all_players)
+    cache.payload('Player1', encode, 'repr')
+    assert len(calls) == 2
+
+
+def send(client, topic, payload):
+    GameClient.on_message(client, None, SimpleNamespace(topic=topic, payload=payload, qos=0))
+
+
+@pytest.fixture
+def suppressing_server(monkeypatch, recording_client, teams):
+    """
+    Server with SUPPRESS_UNCHANGED=1 and no tick deadlines, running one game where every player is stuck
+    in a corner and the only coin is out of everyone's sight
+    """
+    monkeypatch.setenv('SUPPRESS_UNCHANGED', '1')
+    monkeypatch.delenv('TICK_TIMEOUT', raising=False)
+    client = recording_client
+    GameClient.init_server_state(client)
+    for team, players in teams.items():
+        for player in players:
+            send(client, 'new_game', json.dumps({'lobby_name': 'Lobby', 'team_name': team, 'player_name': player}))
+    send(client, 'games/Lobby/start', b'START')
+
+    game = client.game_dict['Lobby']
+    for x in range(game.map.height):
+        for y in range(game.map.width):
+            game.map.set((x, y), None)
+    for name, loc in zip(game.all_players, ((0, 0), (0, 9), (9, 0), (9, 9))):
+        player = game.getPlayer(name)
+        player.loc = loc
+        game.map.set(loc, player)
+    game.map.set((5, 5), Coin1())
+    client.cache_dict['Lobby'].refresh()
+    client.published.clear()
+    return client
+
+
+STUCK = {'Player1': b'UP', 'Player2': b'RIGHT', 'Player3': b'LEFT', 'Player4': b'DOWN'}
+
+
+def test_players_that_moved_always_get_a_state(suppressing_server):
+    client = suppressing_server
+    for _ in range(3):
+        client.published.clear()
+        for player, move in STUCK.items():
+            send(client, f'games/Lobby/{player}/move', move)
+        # Nothing changed, but every player is waiting for its next state
+        for player in STUCK:
+            assert len(client.payloads(f'games/Lobby/{player}/game_state')) == 1
+    assert client.game_dict['Lobby'].ticks == 3
+
+
+def test_unchanged_players_that_did_not_move_are_skipped(suppressing_server):
+    client = suppressing_server
+    send(client, 'games/Lobby/Player1/move', b'UP')
+    send(client, 'games/Lobby/tick', b'0')
+    assert client.game_dict['Lobby'].ticks == 1
+    assert len(client.payloads('games/Lobby/Player1/game_state')) == 1
+    for player in ('Player2', 'Player3', 'Player4'):
+        assert client.payloads(f'games/Lobby/{player}/game_state') == []
@@ -0,0 +1,45 @@
+import json
+import random
+
+import pytest
+
+from game import Game
+from moveset import Moveset
+from stateDelta import DeltaDecoder, DeltaEncoder
+
+
+def game_states(teams, seed, ticks=80):
+    """
+    Every player's gameData, tick after tick, as the server builds them
+    """
+    game = Game(teams, coinRespawnInterval=2, seed=seed)
+    rng = random.Random(seed)
+    for _ in range(ticks):
+        yield game.getAllGameData()
+        for name in game.all_players:
+            game.movePlayer(name, rng.choice(list(Moveset)))
+        game.endTick()
+
+
+def wire(message):
+    return json.loads(json.dumps(message))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_decoder_matches_json(teams, seed):
+    names = [name for players in teams.values() for name in players]
+    encoders = {name: DeltaEncoder(keyframeInterval=7) for name in names}
+    decoders = {name: DeltaDecoder() for name in names}
+    for allGameData in game_states(teams, seed):
+        for name, gameData in allGameData.items():
+            assert decoders[name].update(wire(encoders[name].encode(gameData))) == wire(gameData)
+
+
+def test_gap_needs_resync(teams):
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    states = [allGameData['Player1'] for allGameData in game_states(teams, 0, 4)]
+    decoder.update(wire(encoder.encode(states[0])))
+    encoder.encode(states[1])
+    assert decoder.update(wire(encoder.encode(states[2]))) is None
+    encoder.requestKeyframe()
+    assert decoder.update(wire(encoder.encode(states[3]))) == wire(states[3])
@@ -0,0 +1,90 @@
+import queue
+import time
+
+import pytest
+
+import GameClient
+from tickScheduler import TickScheduler
+
+
+@pytest.fixture
+def fired():
+    return queue.Queue()
+
+
+@pytest.fixture
+def scheduler(fired):
+    scheduler = TickScheduler(lambda lobby, tick: fired.put((lobby, tick, time.monotonic())))
+    yield scheduler
+    scheduler.stop()
+
+
+def test_deadlines_fire_in_time_order(scheduler, fired):
+    start = time.monotonic()
+    scheduler.schedule('Late', 1, 0.06)
+    scheduler.schedule('Early', 4, 0.02)
+    assert len(scheduler) == 2
+    early = fired.get(timeout=2)
+    late = fired.get(timeout=2)
+    assert (early[:2], late[:2]) == (('Early', 4), ('Late', 1))
+    assert early[2] - start >= 0.02
+    assert late[2] - start >= 0.06
+    assert len(scheduler) == 0
+
+
+def test_cancelled_deadline_never_fires(scheduler, fired):
+    scheduler.schedule('Lobby1', 1, 0.02)
+    scheduler.schedule('Lobby2', 1, 0.04)
+    scheduler.cancel('Lobby1')
+    assert fired.get(timeout=2)[:2] == ('Lobby2', 1)
+    time.sleep(0.05)
+    assert fired.empty()
+
+
+def test_reschedule_replaces_the_deadline(scheduler, fired):
+    start = time.monotonic()
+    scheduler.schedule('Lobby', 1, 0.02)
+    # The lobby moved on before its deadline, only the new tick may fire
+    scheduler.schedule('Lobby', 2, 0.06)
+    assert len(scheduler) == 1
+    lobby, tick, when = fired.get(timeout=2)
+    assert (lobby, tick) == ('Lobby', 2)
+    assert when - start >= 0.06
+    time.sleep(0.03)
+    assert fired.empty()
+
+
+def test_earlier_deadline_wakes_the_scheduler(scheduler, fired):
+    start = time.monotonic()
+    scheduler.schedule('Slow', 1, 5)
+    scheduler.schedule('Fast', 1, 0.02)
+    assert fired.get(timeout=1)[:2] == ('Fast', 1)
+    assert time.monotonic() - start < 1
+
+
+def test_only_the_last_of_many_reschedules_fires(scheduler, fired):
+    for tick in range(1000):
+        scheduler.schedule('Lobby', tick, 10)
+    scheduler.schedule('Lobby', 1000, 0)
+    assert fired.get(timeout=2)[:2] == ('Lobby', 1000)
+    assert len(scheduler) == 0
+
+
+@pytest.mark.parametrize('env, expected', [
+    ({}, (0.0, False)),
+    ({'TICK_TIMEOUT': '0.5'}, (0.5, False)),
+    ({'TICK_TIMEOUT': '0.5', 'FIXED_TICK_RATE': '1'}, (0.5, True)),
+])
+def test_tick_settings(monkeypatch, env, expected):
+    for name in ('TICK_TIMEOUT', 'FIXED_TICK_RATE'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert GameClient.tick_settings() == expected
+
+
+def test_fixed_tick_rate_needs_a_timeout(monkeypatch):
+    monkeypatch.delenv('TICK_TIMEOUT', raising=False)
+    monkeypatch.setenv('FIXED_TICK_RATE', '1')
+    with pytest.raises(ValueError):
+        GameClient.tick_settings()
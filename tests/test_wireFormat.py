@@ -0,0 +1,28 @@
+import json
+import random
+
+import pytest
+
+import wireFormat
+from game import Game
+from moveset import Moveset
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_packed_game_state_matches_json(teams, seed):
+    game = Game(teams, coinRespawnInterval=2, seed=seed)
+    rng = random.Random(seed)
+    for _ in range(80):
+        for gameData in game.getAllGameData().values():
+            assert wireFormat.decodeGameState(wireFormat.encodeGameState(gameData)) == \
+                   json.loads(json.dumps(gameData))
+        game.applyMoves({name: rng.choice(list(Moveset)) for name in game.all_players})
+        game.endTick()
+
+
+def test_scores_and_moves():
+    scores = {'ATeam': 12, 'BTeam': 0, 'Ä team': -3}
+    assert wireFormat.decodeScores(wireFormat.encodeScores(scores)) == scores
+    for move in Moveset:
+        assert wireFormat.decodeMove(wireFormat.encodeMove(move.name)) is move
+        assert wireFormat.decodeMove(move.name.encode()) is move
@@ -0,0 +1,99 @@
+import random
+
+import numpy as np
+import pytest
+
+from game import Game
+from map import COIN1, COIN2, COIN3, WALL
+from moveset import Moveset
+from simulation import to_client_state
+from strategies import MemoryStrategy
+from worldModel import NEVER, WorldModel
+
+
+def window(loc, radius, height, width):
+    x, y = loc
+    return {(i, j) for i in range(max(x - radius, 0), min(x + radius + 1, height))
+            for j in range(max(y - radius, 0), min(y + radius + 1, width))}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_model_agrees_with_the_board(teams, seed):
+    game = Game(teams, seed=seed)
+    model = WorldModel(game.map.height, game.map.width)
+    rng = random.Random(seed)
+    everSeen = set()
+    for _ in range(60):
+        player = game.getPlayer('Player1')
+        model.update(to_client_state(game.getGameData('Player1')))
+        view = window(player.loc, model.visionRadius, game.map.height, game.map.width)
+        everSeen |= view
+
+        walls = {(x, y) for x, y in zip(*np.nonzero(model.walls))}
+        assert all(game.map.getCode(loc) == WALL for loc in walls)
+        assert {loc for loc in view if game.map.getCode(loc) == WALL} <= walls
+        fresh = {loc: value for loc, value, confidence in model.coins() if confidence == 1.0}
+        assert fresh == {loc: game.map.get(loc).value for loc in view
+                         if game.map.getCode(loc) in (COIN1, COIN2, COIN3)}
+        assert set(model.unexplored()) == {(x, y) for x in range(game.map.height) for y in range(game.map.width)
+                                           if (x, y) not in everSeen} - walls
+        game.applyMoves({name: rng.choice(list(Moveset)) for name in game.all_players})
+        game.endTick()
+
+
+def test_remembered_coin_fades_and_clears():
+    model = WorldModel(10, 10, coinDecay=0.5)
+    model.update({'currentPosition': [2, 2], 'coin3': [[4, 4]], 'walls': [[1, 1]]})
+    assert model.coins() == [((4, 4), 3, 1.0)]
+    # Out of view, the coin is remembered with less confidence every update
+    assert model.update({'currentPosition': [7, 7], 'walls': [[1, 1], [8, 8]]}) == [(8, 8)]
+    model.update({'currentPosition': [7, 7]})
+    assert model.coins() == [((4, 4), 3, 0.25)]
+    assert model.coins(minConfidence=0.3) == []
+    # Back in view and not listed, so someone took it
+    model.update({'currentPosition': [5, 5]})
+    assert model.coins() == []
+    assert model.seen[0, 9] == NEVER and model.seen[5, 5] == model.tick
+
+
+def test_enemy_sightings_decay():
+    model = WorldModel(10, 10, enemyDecay=0.5)
+    model.update({'currentPosition': [0, 0], 'enemyPositions': [[1, 2]]})
+    model.update({'currentPosition': [9, 9]})
+    confidence = model.enemyConfidence()
+    assert confidence[1, 2] == 0.5
+    assert confidence.sum() == 0.5
+
+
+def test_exploration_prefers_unseen_then_nearest():
+    model = WorldModel(1, 6, visionRadius=1)
+    model.update({'currentPosition': [0, 1]})
+    distances = np.array([[1, 0, 1, 2, 3, 4]])
+    assert model.explorationTarget(distances) == (0, 3)
+    assert model.explorationTarget(np.array([[-1, 0, -1, -1, -1, -1]])) is None
+
+
+def test_memory_strategy_returns_to_a_remembered_coin():
+    strategy = MemoryStrategy(10, 10)
+    strategy({'currentPosition': [2, 2], 'coin3': [[4, 4]]})
+    assert strategy({'currentPosition': [0, 0]}) in ('DOWN', 'RIGHT')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_memory_strategy_moves_stay_on_open_cells(teams, seed):
+    game = Game(teams, seed=seed)
+    strategies = {name: MemoryStrategy(game.map.height, game.map.width) for name in game.all_players}
+    random.seed(seed)
+    for _ in range(100):
+        moves = {}
+        for name, gameData in game.getAllGameData().items():
+            move = strategies[name](to_client_state(gameData))
+            if move is None:
+                continue
+            x, y = game.getPlayer(name).loc
+            dx, dy = Moveset[move].value
+            assert 0 <= x + dx < game.map.height and 0 <= y + dy < game.map.width
+            assert game.map.getCode((x + dx, y + dy)) != WALL
+            moves[name] = Moveset[move]
+        game.applyMoves(moves)
+        game.endTick()
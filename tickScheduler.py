@@ -0,0 +1,81 @@
+"""
+Deadline scheduler for lobby ticks
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from typing import Callable, Hashable
+
+
+class TickScheduler:
+    """
+    One pending deadline per lobby, kept in a heap. Rescheduling or cancelling a lobby does not touch
+    the heap; the old entry is recognised as stale and skipped when it comes up, so every operation is
+    O(log n) however many lobbies are waiting.
+    Callbacks run on the scheduler's own thread and should only hand the work to the lobby's queue.
+    """
+    def __init__(self, callback: Callable[[Hashable, int], None]):
+        """
+        :param callback: called with (lobby, tick) when the deadline for that tick passes
+        """
+        self.__callback = callback
+        self.__heap: list[tuple[float, int, Hashable, int]] = []
+        # lobby -> sequence number of its live heap entry
+        self.__live: dict[Hashable, int] = {}
+        self.__counter = itertools.count()
+        self.__condition = threading.Condition()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name='tick-scheduler', daemon=True)
+        self.__thread.start()
+
+    def __len__(self):
+        return len(self.__live)
+
+    def schedule(self, lobby: Hashable, tick: int, delay: float):
+        """
+        Replaces the lobby's deadline with one delay seconds from now for the given tick
+        """
+        with self.__condition:
+            seq = next(self.__counter)
+            self.__live[lobby] = seq
+            heapq.heappush(self.__heap, (time.monotonic() + delay, seq, lobby, tick))
+            # Stale entries are only popped lazily, compact once they dominate the heap
+            if len(self.__heap) > 2 * len(self.__live) + 64:
+                self.__heap = [entry for entry in self.__heap if self.__live.get(entry[2]) == entry[1]]
+                heapq.heapify(self.__heap)
+            if self.__heap[0][1] == seq:
+                self.__condition.notify()
+
+    def cancel(self, lobby: Hashable):
+        with self.__condition:
+            self.__live.pop(lobby, None)
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                due = []
+                while self.__running and not due:
+                    now = time.monotonic()
+                    while self.__heap and self.__heap[0][0] <= now:
+                        _, seq, lobby, tick = heapq.heappop(self.__heap)
+                        if self.__live.get(lobby) == seq:
+                            del self.__live[lobby]
+                            due.append((lobby, tick))
+                    if not due:
+                        self.__condition.wait(self.__heap[0][0] - now if self.__heap else None)
+                if not self.__running:
+                    return
+            for lobby, tick in due:
+                try:
+                    self.__callback(lobby, tick)
+                except Exception:
+                    traceback.print_exc()
@@ -0,0 +1,108 @@
+"""
+Compact binary encoding for game_state, scores and moves, negotiated per player at new_game
+with {"format": "packed"}. JSON stays the default.
+
+game_state (little endian):
+    header   format version (uint8), current position (uint16 x, uint16 y), number of teammates,
+             enemies, coin1, coin2, coin3 and walls (uint16 each)
+    names    per teammate: name length (uint8), utf-8 name
+    cells    teammate, enemy, coin1, coin2, coin3 and wall positions in that order, as flat
+             uint16 x, y pairs
+scores:     number of teams (uint8), then per team: name length (uint8), utf-8 name, score (int32)
+move:       a single byte, the index of the move in Moveset (UP, DOWN, LEFT, RIGHT)
+
+Decoding gives the same dicts a JSON client gets from json.loads, so strategies work on either.
+"""
+
+import struct
+
+from checkpoint import packName, unpackName
+from moveset import MOVE_INDEX, MOVES_BY_INDEX, Moveset
+
+JSON = 'json'
+PACKED = 'packed'
+FORMATS = (JSON, PACKED)
+
+FORMAT_VERSION = 1
+
+# Lists in the order their counts and positions are packed, currentPosition is in the header
+CELL_KEYS = ('teammatePositions', 'enemyPositions', 'coin1', 'coin2', 'coin3', 'walls')
+
+STATE_HEADER = struct.Struct(f'<BHH{len(CELL_KEYS)}H')
+SCORE = struct.Struct('<i')
+
+# One byte move payloads, indexed by move name
+MOVE_BYTES = {move.name: bytes((i,)) for move, i in MOVE_INDEX.items()}
+
+
+def encodeGameState(gameData: dict) -> bytes:
+    """
+    :param gameData: as returned by Game.getGameData
+    """
+    lists = [gameData[key] for key in CELL_KEYS]
+    flat = [coord for locs in lists for loc in locs for coord in loc]
+    parts = [STATE_HEADER.pack(FORMAT_VERSION, *gameData['currentPosition'], *map(len, lists))]
+    parts.extend(packName(name) for name in gameData['teammateNames'])
+    parts.append(struct.pack(f'<{len(flat)}H', *flat))
+    return b''.join(parts)
+
+
+def decodeGameState(data: bytes) -> dict:
+    view = memoryview(data)
+    version, x, y, *counts = STATE_HEADER.unpack_from(view, 0)
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Unsupported game_state format version {version}')
+    offset = STATE_HEADER.size
+
+    names = []
+    for _ in range(counts[0]):
+        name, offset = unpackName(view, offset)
+        names.append(name)
+
+    flat = struct.unpack_from(f'<{2 * sum(counts)}H', view, offset)
+    gameData = {'teammateNames': names, 'currentPosition': [x, y]}
+    start = 0
+    for key, count in zip(CELL_KEYS, counts):
+        gameData[key] = [[flat[i], flat[i + 1]] for i in range(start, start + 2 * count, 2)]
+        start += 2 * count
+    return gameData
+
+
+def encodeScores(scores: dict[str, int]) -> bytes:
+    """
+    :param scores: as returned by Game.getScores
+    """
+    assert len(scores) < 256
+    parts = [bytes((len(scores),))]
+    for teamName, score in scores.items():
+        parts.append(packName(teamName))
+        parts.append(SCORE.pack(score))
+    return b''.join(parts)
+
+
+def decodeScores(data: bytes) -> dict[str, int]:
+    view = memoryview(data)
+    offset = 1
+    scores = {}
+    for _ in range(view[0]):
+        teamName, offset = unpackName(view, offset)
+        scores[teamName], = SCORE.unpack_from(view, offset)
+        offset += SCORE.size
+    return scores
+
+
+def encodeMove(move: str) -> bytes:
+    """
+    :param move: move name, e.g. 'UP'
+    """
+    return MOVE_BYTES[move]
+
+
+def decodeMove(payload: bytes) -> Moveset:
+    """
+    Accepts both the one byte packed move and the plain move name, so the server does not need to
+    know which format a player picked to read its moves
+    """
+    if len(payload) == 1 and payload[0] < len(MOVES_BY_INDEX):
+        return MOVES_BY_INDEX[payload[0]]
+    return Moveset[payload.decode()]
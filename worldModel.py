@@ -0,0 +1,128 @@
+"""
+Client-side memory of the board across game_state messages
+
+Each message only covers the vision window around the player. The model keeps what was seen in
+NumPy layers: walls for good, coins and enemy sightings with the time they were last confirmed. An
+observation loses confidence by a decay factor for every update since it was made, so old coins that
+someone else may have taken count for less than fresh ones. Updates only touch the window.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+NEVER = -1
+
+# game_state keys of coins with their values
+COIN_KEYS = (('coin1', 1), ('coin2', 2), ('coin3', 3))
+
+
+class WorldModel:
+    COIN_DECAY = 0.98
+    ENEMY_DECAY = 0.7
+
+    def __init__(self, height: int = 10, width: int = 10, visionRadius: int = 2,
+                 coinDecay: float = COIN_DECAY, enemyDecay: float = ENEMY_DECAY):
+        """
+        :param visionRadius: radius of the windows the server sends, cells in it that are not listed are empty
+        :param coinDecay: confidence kept per update by a coin that has not been seen again
+        :param enemyDecay: the same for enemy sightings
+        """
+        assert isinstance(visionRadius, int) and visionRadius >= 0
+        assert 0 < coinDecay <= 1 and 0 < enemyDecay <= 1
+        self.height = height
+        self.width = width
+        self.visionRadius = visionRadius
+        self.coinDecay = coinDecay
+        self.enemyDecay = enemyDecay
+        # Advances once per update; a model shared by a team ages once per teammate message
+        self.tick = 0
+        self.__walls = np.zeros((height, width), dtype=bool)
+        # Update count at which each cell was last inside a vision window
+        self.__seen = np.full((height, width), NEVER, dtype=np.int32)
+        # Value of the coin last seen on each cell, 0 for none
+        self.__coins = np.zeros((height, width), dtype=np.int8)
+        self.__coinSeen = np.full((height, width), NEVER, dtype=np.int32)
+        self.__enemySeen = np.full((height, width), NEVER, dtype=np.int32)
+
+    def update(self, game_state: dict) -> list[tuple[int, int]]:
+        """
+        Folds one game_state into the model
+        :return: walls that were not known before
+        """
+        self.tick += 1
+        x, y = game_state["currentPosition"]
+        r = self.visionRadius
+        window = (slice(max(x - r, 0), min(x + r + 1, self.height)), slice(max(y - r, 0), min(y + r + 1, self.width)))
+        self.__seen[window] = self.tick
+        # Whatever is not listed inside the window is gone now
+        self.__coins[window] = 0
+        self.__coinSeen[window] = NEVER
+        self.__enemySeen[window] = NEVER
+
+        newWalls = []
+        for wx, wy in game_state.get("walls", []):
+            if not self.__walls[wx, wy]:
+                self.__walls[wx, wy] = True
+                newWalls.append((wx, wy))
+        for key, value in COIN_KEYS:
+            for cx, cy in game_state.get(key, []):
+                self.__coins[cx, cy] = value
+                self.__coinSeen[cx, cy] = self.tick
+        for ex, ey in game_state.get("enemyPositions", []):
+            self.__enemySeen[ex, ey] = self.tick
+        return newWalls
+
+    @property
+    def walls(self) -> np.ndarray:
+        return self.__readOnly(self.__walls)
+
+    @property
+    def seen(self) -> np.ndarray:
+        """
+        Update count at which every cell was last in view, NEVER for unexplored cells
+        """
+        return self.__readOnly(self.__seen)
+
+    @staticmethod
+    def __readOnly(layer: np.ndarray) -> np.ndarray:
+        view = layer.view()
+        view.flags.writeable = False
+        return view
+
+    def __confidence(self, seenAt: np.ndarray, decay: float) -> np.ndarray:
+        return np.where(seenAt == NEVER, 0.0, decay ** (self.tick - seenAt).astype(np.float64))
+
+    def coins(self, minConfidence: float = 0.0) -> list[tuple[tuple[int, int], int, float]]:
+        """
+        :return: [((x, y), value, confidence), ...] of remembered coins above minConfidence
+        """
+        xs, ys = np.nonzero(self.__coins)
+        confidence = self.coinDecay ** (self.tick - self.__coinSeen[xs, ys]).astype(np.float64)
+        return [((x, y), value, c) for x, y, value, c in
+                zip(xs.tolist(), ys.tolist(), self.__coins[xs, ys].tolist(), confidence.tolist()) if c > minConfidence]
+
+    def enemyConfidence(self) -> np.ndarray:
+        """
+        Per cell confidence that an enemy is there, from decayed sightings
+        """
+        return self.__confidence(self.__enemySeen, self.enemyDecay)
+
+    def unexplored(self) -> list[tuple[int, int]]:
+        xs, ys = np.nonzero((self.__seen == NEVER) & ~self.__walls)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def explorationTarget(self, distances: np.ndarray) -> Optional[tuple[int, int]]:
+        """
+        Cell worth walking to when no coin is known: the one seen least recently (never seen first),
+        nearest first among those
+        :param distances: steps from every cell to the player, negative where unreachable, as from
+                          Planner.distances(position)
+        """
+        reachable = distances > 0
+        if not reachable.any():
+            return None
+        # Lexicographic (seen, distance) as one int64 key
+        key = self.__seen.astype(np.int64) * (self.height * self.width + 1) + distances
+        key[~reachable] = np.iinfo(np.int64).max
+        return divmod(int(np.argmin(key)), self.width)